@@ -0,0 +1,120 @@
+"""
+Benchmark catalogue CSV ingestion: the old iterrows() loader vs the vectorized
+parser, serial and on a process pool.
+
+    python bench_catalogue_ingest.py [--csvs 300] [--rows 400] [--workers 0]
+
+Generates a synthetic catalogue in a temp dir and prints rows/sec for each path.
+"""
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import time
+
+import pandas as pd
+
+from catalogue_loader import discover_catalogues, parse_catalogue, parse_catalogues
+
+
+def legacy_parse(csv_path, garment_dir, scope):
+    """The original per-row loader, kept here as the baseline."""
+    df = pd.read_csv(csv_path)
+    products = []
+    def safe_str(val, default=""):
+        return str(val) if pd.notna(val) else default
+    for _, row in df.iterrows():
+        other_images = str(row.get('Other images filename', '')).split('; ') if pd.notna(row.get('Other images filename')) else []
+        products.append({
+            "id": str(row['id']),
+            "name": safe_str(row.get('Name')),
+            "brand": safe_str(row.get('Brand')),
+            "mrp": float(row['MRP']) if 'MRP' in row and pd.notna(row['MRP']) else 0.0,
+            "discount_percent": float(row['Discount %']) if 'Discount %' in row and pd.notna(row['Discount %']) else 0.0,
+            "category": safe_str(row.get('Category')),
+            "sub_category": safe_str(row.get('Sub_Category')),
+            "gender": safe_str(row.get('Gender')),
+            "color": safe_str(row.get('Color')),
+            "description": safe_str(row.get('Description')),
+            "material_care": safe_str(row.get('Material Care')),
+            "sizes": safe_str(row.get('sizes')),
+            "thumbnail_image": safe_str(row.get('Thumbnail Image Filename')),
+            "vton_image": safe_str(row.get('Vton Ready Image Filename'), None),
+            "other_images": other_images,
+            "size_chart": safe_str(row.get('size_chart')),
+            "_base_garment_dir": garment_dir,
+            "_source_csv": csv_path,
+            "_scope": scope
+        })
+    return products
+
+
+def make_catalogue(root, n_csvs, rows_per_csv, seed=1):
+    rng = random.Random(seed)
+    brands = [f"Brand {i}" for i in range(40)]
+    categories = ["Dress", "Top", "Shirt", "Kurta", "Saree", "Jeans"]
+    for c in range(n_csvs):
+        upload_dir = os.path.join(root, f"client_{c % 20}", f"upload_{c}")
+        os.makedirs(os.path.join(upload_dir, "garment"), exist_ok=True)
+        rows = []
+        for r in range(rows_per_csv):
+            pid = c * 100000 + r
+            rows.append({
+                "id": pid,
+                "Name": f"Product {pid}",
+                "Brand": rng.choice(brands),
+                "MRP": rng.choice([499, 999.5, 1499, None]),
+                "Discount %": rng.choice([0, 10, 25, None]),
+                "Category": rng.choice(categories),
+                "Sub_Category": "",
+                "Gender": rng.choice(["Men", "Women", "Unisex"]),
+                "Color": rng.choice(["Red", "Blue", "Black", ""]),
+                "Description": "A garment " * rng.randint(1, 20),
+                "Material Care": "Machine wash",
+                "sizes": "S, M, L",
+                "Thumbnail Image Filename": f"{pid}_1.jpg",
+                "Vton Ready Image Filename": f"{pid}_vton.png" if r % 3 == 0 else None,
+                "Other images filename": f"{pid}_2.jpg; {pid}_3.jpg" if r % 2 else None,
+                "Unused Column": "x" * 30,
+            })
+        pd.DataFrame(rows).to_csv(os.path.join(upload_dir, "catalogue.csv"), index=False)
+
+
+def run(label, total_rows, fn):
+    start = time.perf_counter()
+    products = fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {elapsed:8.2f}s  {total_rows / elapsed:12,.0f} rows/sec")
+    return products
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--csvs", type=int, default=300)
+    parser.add_argument("--rows", type=int, default=400)
+    parser.add_argument("--workers", type=int, default=0, help="process pool size, 0 = one per CPU (max 8)")
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix="vton_bench_")
+    try:
+        make_catalogue(root, args.csvs, args.rows)
+        jobs = [(path, garment_dir, scope) for path, (garment_dir, scope, _) in discover_catalogues(root).items()]
+        total = args.csvs * args.rows
+        print(f"{total:,} rows in {len(jobs)} CSVs")
+
+        legacy = run("iterrows (old)", total,
+                     lambda: [p for job in jobs for p in legacy_parse(*job)])
+        vectorized = run("vectorized, serial", total,
+                         lambda: [p for job in jobs for p in parse_catalogue(*job)])
+        run("vectorized, process pool", total,
+            lambda: [p for _, products, _ in parse_catalogues(jobs, workers=args.workers or None) for p in products])
+
+        mismatches = sum(1 for a, b in zip(legacy, vectorized) if a != b)
+        print(f"Output check: {len(vectorized):,} products, {mismatches} differ from the old loader")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Benchmark batch size / wait time trade-offs against the stub inference server.
+
+    python bench_inference_batching.py [--images 64] [--workers 2] [--overhead-ms 300] [--per-image-ms 100]
+
+Starts stub_inference_server in-process, pushes --images items through the
+InferenceBatcher the same way the queue workers do, and prints throughput and
+per-item latency for each (batch size, max wait) combination.
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import socket
+import statistics
+import tempfile
+import threading
+import time
+
+import uvicorn
+
+from inference import InferenceBatcher
+from stub_inference_server import create_app
+
+PARAMS = {'category': 'dress', 'seed': 42, 'steps': 10, 'cfg': 1.0}
+
+
+def start_stub(overhead_ms, per_image_ms, batch=True):
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    config = uvicorn.Config(create_app(overhead_ms, per_image_ms, batch), host="127.0.0.1", port=port, log_level="warning")
+    server = uvicorn.Server(config)
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, f"http://127.0.0.1:{port}/infer"
+
+
+async def run(url, paths, batch_size, wait_ms, workers):
+    batcher = InferenceBatcher(url, url + "_batch", PARAMS, max_batch=batch_size, max_wait_ms=wait_ms)
+    queue = asyncio.Queue()
+    for path in paths:
+        queue.put_nowait(path)
+    latencies = []
+
+    async def worker():
+        while not queue.empty():
+            path = queue.get_nowait()
+            start = time.perf_counter()
+            output = await batcher.infer(path, os.path.basename(path))
+            assert output is not None
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    # Same sizing as main.py: batch_size workers per inference slot
+    await asyncio.gather(*(worker() for _ in range(workers * batch_size)))
+    elapsed = time.perf_counter() - start
+    return elapsed, latencies, batcher.stats
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--images", type=int, default=64)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--overhead-ms", type=int, default=300)
+    parser.add_argument("--per-image-ms", type=int, default=100)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="vton_infer_bench_")
+    try:
+        paths = []
+        for i in range(args.images):
+            path = os.path.join(tmp, f"img_{i}.png")
+            with open(path, "wb") as f:
+                f.write(os.urandom(200_000))
+            paths.append(path)
+
+        server, url = start_stub(args.overhead_ms, args.per_image_ms)
+        print(f"{args.images} images, {args.workers} workers, stub cost {args.overhead_ms}ms + {args.per_image_ms}ms/image")
+        print(f"{'batch':>5} {'wait':>6} {'total':>8} {'img/s':>7} {'p50':>7} {'p95':>7}  batches")
+        for batch_size, wait_ms in [(1, 0), (4, 20), (8, 20), (8, 100), (16, 50)]:
+            elapsed, latencies, stats = asyncio.run(run(url, paths, batch_size, wait_ms, args.workers))
+            p95 = sorted(latencies)[int(len(latencies) * 0.95) - 1]
+            print(f"{batch_size:>5} {wait_ms:>4}ms {elapsed:>7.2f}s {args.images / elapsed:>7.1f} "
+                  f"{statistics.median(latencies):>6.2f}s {p95:>6.2f}s  {stats['batches']}")
+        server.should_exit = True
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Benchmark catalogue image uploads through the S3 transfer engine.
+
+    python bench_s3_transfer.py [--images 10000] [--size-kb 200] [--workers 1 8 16]
+    python bench_s3_transfer.py --endpoint-url http://localhost:9000 --bucket test   # real S3 stand-in
+
+Writes --images files of --size-kb random bytes, then for each worker count
+uploads them all and reports files/sec, followed by a second unchanged pass to
+show the skip-if-unchanged path. Without --endpoint-url it runs against moto's
+in-process S3 mock (pip install "moto[s3]"), which measures the engine's own
+overhead rather than network throughput.
+"""
+import argparse
+import contextlib
+import os
+import shutil
+import tempfile
+import time
+
+import boto3
+
+from s3_transfer import S3Transfer, summarize
+
+
+def make_files(directory, count, size_kb):
+    paths = []
+    for i in range(count):
+        path = os.path.join(directory, f"img_{i:05d}.png")
+        with open(path, 'wb') as f:
+            f.write(os.urandom(size_kb * 1024))
+        paths.append(path)
+    return paths
+
+
+def run(paths, bucket, prefix, workers, endpoint_url):
+    engine = S3Transfer(workers=workers, endpoint_url=endpoint_url)
+    items = [(p, bucket, f"{prefix}/{os.path.basename(p)}") for p in paths]
+    timings = []
+    for label in ("upload", "unchanged"):
+        start = time.perf_counter()
+        summary = summarize(engine.upload_many(items))
+        elapsed = time.perf_counter() - start
+        timings.append((label, elapsed, summary))
+    engine.shutdown()
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--images", type=int, default=10000)
+    parser.add_argument("--size-kb", type=int, default=200)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 8, 16])
+    parser.add_argument("--endpoint-url")
+    parser.add_argument("--bucket", default="bench-catalogue")
+    args = parser.parse_args()
+
+    if args.endpoint_url:
+        mock = contextlib.nullcontext()
+    else:
+        from moto import mock_aws
+        os.environ.setdefault("AWS_ACCESS_KEY_ID", "bench")
+        os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "bench")
+        os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+        mock = mock_aws()
+
+    workdir = tempfile.mkdtemp(prefix="bench_s3_")
+    try:
+        paths = make_files(workdir, args.images, args.size_kb)
+        print(f"{args.images} files x {args.size_kb} KB")
+        with mock:
+            boto3.client("s3", endpoint_url=args.endpoint_url).create_bucket(Bucket=args.bucket)
+            for workers in args.workers:
+                for label, elapsed, summary in run(paths, args.bucket, f"w{workers}", workers, args.endpoint_url):
+                    print(
+                        f"workers={workers:<3} {label:<9} {elapsed:7.2f}s  {args.images / elapsed:8.1f} files/s  "
+                        f"uploaded={summary['uploaded']} skipped={summary['skipped']} failed={summary['failed']}"
+                    )
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
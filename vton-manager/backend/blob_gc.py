@@ -0,0 +1,155 @@
+import threading
+import time
+
+
+class BlobGC:
+    """
+    Reference-counted cleanup for the files the app derives (crops, processed
+    images, thumbnails).
+
+    A blob is (kind, name). Owners (a queue item, a catalogue) declare the
+    blobs they use with set_refs(); when a blob's last owner lets go it goes on
+    the reclaim list and a background thread deletes it. Nothing is listed
+    during normal operation. reconcile() is the safety net for blobs nothing
+    ever referenced (or that leaked past a crash): it scans every kind and
+    removes unreferenced blobs older than `grace`. It runs every
+    `reconcile_interval` seconds once start() has been called, so call start()
+    only after the owners have registered what they hold.
+
+    Each kind is registered with delete(name, not_after) -> files removed,
+    which must leave alone anything (re)created after not_after, and
+    scan() -> (name, created_at) for everything of that kind that exists.
+    """
+
+    def __init__(self, grace=600, reconcile_interval=3600):
+        self.grace = grace
+        self.reconcile_interval = reconcile_interval
+        self._lock = threading.Lock()
+        self._kinds = {}    # kind -> (delete, scan)
+        self._refs = {}     # blob -> number of owners holding it
+        self._owners = {}   # owner -> frozenset of blobs
+        self._reclaim = {}  # blob -> (due, released_at), oldest first
+        self._wake = threading.Event()
+        self._thread = None
+        self.stats = {"reclaimed": 0, "files_removed": 0, "reconciles": 0, "reconcile_removed": 0, "last_reconcile": None}
+
+    def register(self, kind, delete, scan):
+        self._kinds[kind] = (delete, scan)
+
+    # ─── References ────────────────────────────────────────────────
+    def set_refs(self, owner, blobs):
+        """Make `blobs` the complete set of blobs `owner` holds (empty to release everything)."""
+        blobs = frozenset(blobs)
+        with self._lock:
+            old = self._owners.pop(owner, frozenset())
+            if blobs:
+                self._owners[owner] = blobs
+            for blob in blobs - old:
+                self._refs[blob] = self._refs.get(blob, 0) + 1
+                self._reclaim.pop(blob, None)
+            released = False
+            now = time.time()
+            for blob in old - blobs:
+                count = self._refs.get(blob, 0) - 1
+                if count > 0:
+                    self._refs[blob] = count
+                else:
+                    self._refs.pop(blob, None)
+                    self._reclaim[blob] = (now, now)
+                    released = True
+        if released:
+            self._wake.set()
+
+    def track_new(self, blob):
+        """A file was just created for `blob`; reclaim it after the grace period unless something references it by then."""
+        with self._lock:
+            if blob in self._refs:
+                return
+            due = time.time() + self.grace
+            self._reclaim[blob] = (due, due)
+        # The collector may be asleep until the next reconcile; have it pick up the new deadline
+        self._wake.set()
+
+    def is_referenced(self, blob):
+        return blob in self._refs
+
+    def pending(self):
+        with self._lock:
+            return len(self._reclaim)
+
+    # ─── Deletion ──────────────────────────────────────────────────
+    def _delete(self, kind, name, not_after):
+        try:
+            return self._kinds[kind][0](name, not_after)
+        except Exception as e:
+            print(f"Blob GC failed to remove {kind} {name}: {e}")
+            return 0
+
+    def collect(self):
+        """Delete every blob on the reclaim list that is due and still unreferenced. Returns files removed."""
+        now = time.time()
+        with self._lock:
+            due = [(blob, released_at) for blob, (at, released_at) in self._reclaim.items() if at <= now]
+        removed = 0
+        for blob, released_at in due:
+            kind, name = blob
+            # Checked and deleted under the lock so a new reference can't land in between
+            with self._lock:
+                if self._reclaim.get(blob, (None, None))[1] != released_at:
+                    continue
+                del self._reclaim[blob]
+                if blob in self._refs or kind not in self._kinds:
+                    continue
+                # Anything written after the release belongs to whoever wrote it
+                removed += self._delete(kind, name, released_at)
+                self.stats["reclaimed"] += 1
+        self.stats["files_removed"] += removed
+        return removed
+
+    def reconcile(self):
+        """Full pass over every kind, removing unreferenced blobs older than the grace period."""
+        cutoff = time.time() - self.grace
+        removed = {}
+        for kind, (_, scan) in list(self._kinds.items()):
+            removed[kind] = 0
+            for name, created_at in scan():
+                if created_at > cutoff:
+                    continue
+                with self._lock:
+                    if (kind, name) not in self._refs:
+                        removed[kind] += self._delete(kind, name, cutoff)
+        total = sum(removed.values())
+        self.stats["reconciles"] += 1
+        self.stats["reconcile_removed"] += total
+        self.stats["last_reconcile"] = time.time()
+        if total:
+            print(f"Blob GC reconcile removed {total} unreferenced files: {removed}")
+        return removed
+
+    # ─── Background thread ─────────────────────────────────────────
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True, name="blob-gc")
+            self._thread.start()
+
+    def _next_due(self):
+        with self._lock:
+            return min((at for at, _ in self._reclaim.values()), default=None)
+
+    def _run(self):
+        next_reconcile = time.monotonic()
+        while True:
+            self._wake.clear()
+            try:
+                if time.monotonic() >= next_reconcile:
+                    self.reconcile()
+                    next_reconcile = time.monotonic() + self.reconcile_interval
+                self.collect()
+            except Exception as e:
+                print(f"Blob GC error: {e}")
+            due = self._next_due()
+            timeout = next_reconcile - time.monotonic()
+            if due is not None:
+                timeout = min(timeout, due - time.time())
+            self._wake.wait(max(timeout, 0.05))
+
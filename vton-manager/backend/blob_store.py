@@ -0,0 +1,190 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+CHUNK = 1024 * 1024
+
+
+class BlobStore:
+    """
+    Content-addressed file store with a name index.
+
+    File contents live once under `directory` as <d[:2]>/<d[2:4]>/<d>, where d
+    is the sha256 of the bytes, so identical images stored under different
+    names (e.g. the same crop for several products) take the space of one.
+    Blobs are written to a temp file and renamed into place. A SQLite index
+    (index.db, kept in memory too) maps (namespace, name) -> digest; that is
+    how the existing logical names (processed_<id>_<file>, crop filenames,
+    thumbnails) are resolved. A blob's file is deleted when the last name
+    pointing at it is removed.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(directory, "index.db"), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS names ("
+            " namespace TEXT NOT NULL, name TEXT NOT NULL, digest TEXT NOT NULL,"
+            " size INTEGER NOT NULL, created_at REAL NOT NULL,"
+            " PRIMARY KEY (namespace, name))"
+        )
+        self._conn.commit()
+        self._names = {}  # (namespace, name) -> (digest, size, created_at)
+        self._refs = {}   # digest -> number of names pointing at it
+        for namespace, name, digest, size, created_at in self._conn.execute(
+            "SELECT namespace, name, digest, size, created_at FROM names"
+        ):
+            self._names[(namespace, name)] = (digest, size, created_at)
+            self._refs[digest] = self._refs.get(digest, 0) + 1
+
+    def blob_path(self, digest):
+        return os.path.join(self.directory, digest[:2], digest[2:4], digest)
+
+    # ─── Writing ───────────────────────────────────────────────────
+    def write(self, source):
+        """
+        Store bytes or a readable binary file object as a blob and return its
+        digest. The blob has no name yet; link() it, or it is swept later.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = os.path.join(self.directory, f"{os.getpid()}.{threading.get_ident()}.tmp")
+        h = hashlib.sha256()
+        try:
+            with open(tmp_path, "wb") as f:
+                if isinstance(source, (bytes, bytearray, memoryview)):
+                    h.update(source)
+                    f.write(source)
+                else:
+                    for chunk in iter(lambda: source.read(CHUNK), b""):
+                        h.update(chunk)
+                        f.write(chunk)
+            digest = h.hexdigest()
+            path = self.blob_path(digest)
+            if os.path.exists(path):
+                # Already stored: keep the existing file, but refresh its mtime so a
+                # sweep doesn't take it for an old orphan before it's linked
+                os.utime(path)
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return digest
+
+    def link(self, namespace, name, digest):
+        """Point (namespace, name) at a stored blob, replacing whatever it pointed at before."""
+        path = self.blob_path(digest)
+        with self._lock:
+            # The blob may have been swept or released since it was written
+            size = os.path.getsize(path)
+            now = time.time()
+            old = self._names.get((namespace, name))
+            with self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO names (namespace, name, digest, size, created_at) VALUES (?, ?, ?, ?, ?)",
+                    (namespace, name, digest, size, now),
+                )
+            self._names[(namespace, name)] = (digest, size, now)
+            self._refs[digest] = self._refs.get(digest, 0) + 1
+            if old is not None:
+                self._release(old[0])
+        return digest
+
+    def put(self, namespace, name, source):
+        """write() then link(). Returns the digest."""
+        try:
+            return self.link(namespace, name, self.write(source))
+        except FileNotFoundError:
+            # The identical blob we reused lost its last name in between; write it again
+            if not isinstance(source, (bytes, bytearray, memoryview)):
+                source.seek(0)
+            return self.link(namespace, name, self.write(source))
+
+    def put_file(self, namespace, name, path):
+        with open(path, "rb") as f:
+            return self.put(namespace, name, f)
+
+    # ─── Reading ───────────────────────────────────────────────────
+    def digest(self, namespace, name):
+        entry = self._names.get((namespace, name))
+        return entry[0] if entry else None
+
+    def path(self, namespace, name):
+        """Path of the file behind (namespace, name), or None if there is no such name."""
+        entry = self._names.get((namespace, name))
+        return self.blob_path(entry[0]) if entry else None
+
+    def exists(self, namespace, name):
+        return (namespace, name) in self._names
+
+    def names(self, namespace):
+        """(name, created_at) for every name in a namespace."""
+        with self._lock:
+            return [(name, entry[2]) for (ns, name), entry in self._names.items() if ns == namespace]
+
+    # ─── Removal ───────────────────────────────────────────────────
+    def _release(self, digest):
+        count = self._refs.get(digest, 0) - 1
+        if count > 0:
+            self._refs[digest] = count
+            return False
+        self._refs.pop(digest, None)
+        try:
+            os.remove(self.blob_path(digest))
+            return True
+        except FileNotFoundError:
+            return False
+
+    def remove(self, namespace, name, not_after=None):
+        """
+        Drop a name, deleting its blob if nothing else points at it. A name
+        (re)created after `not_after` is left alone. Returns the number of
+        files deleted (0 or 1).
+        """
+        with self._lock:
+            entry = self._names.get((namespace, name))
+            if entry is None or (not_after is not None and entry[2] > not_after):
+                return 0
+            with self._conn:
+                self._conn.execute("DELETE FROM names WHERE namespace = ? AND name = ?", (namespace, name))
+            del self._names[(namespace, name)]
+            return int(self._release(entry[0]))
+
+    def orphans(self):
+        """(relative path, mtime) for blob files (and leftover temp files) no name points at."""
+        for dirpath, _, filenames in os.walk(self.directory):
+            for filename in filenames:
+                if filename.startswith("index.db") or filename in self._refs:
+                    continue
+                path = os.path.join(dirpath, filename)
+                try:
+                    yield os.path.relpath(path, self.directory), os.stat(path).st_mtime
+                except FileNotFoundError:
+                    continue
+
+    def remove_orphan(self, rel_path, not_after=None):
+        """Delete an unreferenced file found by orphans(), unless it was written after `not_after`."""
+        path = os.path.join(self.directory, rel_path)
+        with self._lock:
+            if os.path.basename(path) in self._refs:
+                return 0
+            try:
+                if not_after is not None and os.stat(path).st_mtime > not_after:
+                    return 0
+                os.remove(path)
+                return 1
+            except FileNotFoundError:
+                return 0
+
+    def stats(self):
+        with self._lock:
+            logical = sum(entry[1] for entry in self._names.values())
+            stored = sum({entry[0]: entry[1] for entry in self._names.values()}.values())
+            return {"names": len(self._names), "blobs": len(self._refs), "logical_bytes": logical, "stored_bytes": stored}
@@ -0,0 +1,292 @@
+import gc
+import os
+import threading
+import time
+
+import pandas as pd
+
+CATALOGUE_FILENAMES = ("catalogue.csv", "catalogue - Sheet1.csv")
+GARMENT_DIRNAMES = ("garment", "garments")
+
+
+def find_garment_dir(root):
+    # Check for "garment" or "garments" folder
+    garment_dir = os.path.join(root, "garment")
+    if not os.path.exists(garment_dir) and os.path.exists(os.path.join(root, "garments")):
+        garment_dir = os.path.join(root, "garments")
+    return garment_dir
+
+
+# CSV column -> product field, for plain text fields (NaN -> "")
+TEXT_COLUMNS = {
+    "Name": "name",
+    "Brand": "brand",
+    "Category": "category",
+    "Sub_Category": "sub_category",
+    "Gender": "gender",
+    "Color": "color",
+    "Description": "description",
+    "Material Care": "material_care",
+    "sizes": "sizes",
+    "Thumbnail Image Filename": "thumbnail_image",
+    "size_chart": "size_chart",
+}
+NUMBER_COLUMNS = {"MRP": "mrp", "Discount %": "discount_percent"}
+VTON_COLUMN = "Vton Ready Image Filename"
+OTHER_IMAGES_COLUMN = "Other images filename"
+USED_COLUMNS = {"id", VTON_COLUMN, OTHER_IMAGES_COLUMN, *TEXT_COLUMNS, *NUMBER_COLUMNS}
+
+
+def parse_catalogue(csv_path, garment_dir, scope):
+    """
+    Parse one catalogue CSV into product dicts.
+    Only the columns we use are read, and each column is normalised in a single
+    vectorized pass before the row dicts are zipped together.
+    """
+    # "id" keeps pandas' type inference so ids stringify exactly as they always have
+    dtypes = {col: str for col in (*TEXT_COLUMNS, VTON_COLUMN, OTHER_IMAGES_COLUMN)}
+    df = pd.read_csv(csv_path, usecols=lambda c: c in USED_COLUMNS, dtype=dtypes)
+    n = len(df)
+    if n == 0:
+        return []
+
+    fields = ["id"]
+    columns = [df["id"].astype(str).tolist()]
+    for col, field in TEXT_COLUMNS.items():
+        fields.append(field)
+        columns.append(df[col].fillna("").tolist() if col in df else [""] * n)
+    for col, field in NUMBER_COLUMNS.items():
+        fields.append(field)
+        columns.append(pd.to_numeric(df[col], errors="coerce").fillna(0.0).astype(float).tolist() if col in df else [0.0] * n)
+
+    fields.append("vton_image")
+    if VTON_COLUMN in df:
+        vton = df[VTON_COLUMN]
+        columns.append(vton.astype(object).where(vton.notna(), None).tolist())
+    else:
+        columns.append([None] * n)
+
+    fields.append("other_images")
+    if OTHER_IMAGES_COLUMN in df:
+        split = df[OTHER_IMAGES_COLUMN].str.split("; ").tolist()
+        columns.append([v if isinstance(v, list) else [] for v in split])
+    else:
+        columns.append([[] for _ in range(n)])
+
+    fields += ["_base_garment_dir", "_source_csv", "_scope"]
+    columns += [[garment_dir] * n, [csv_path] * n, [scope] * n]
+    return [dict(zip(fields, values)) for values in zip(*columns)]
+
+
+def _parse_job(job):
+    csv_path, garment_dir, scope = job
+    try:
+        return csv_path, parse_catalogue(csv_path, garment_dir, scope), None
+    except Exception as e:
+        return csv_path, None, str(e)
+
+
+def parse_catalogues(jobs, workers=None, min_parallel=8):
+    """
+    Parse many (csv_path, garment_dir, scope) jobs, yielding (csv_path, products, error).
+    Small batches run inline; larger ones are spread over a process pool since
+    parsing is CPU-bound.
+    """
+    workers = workers or min(os.cpu_count() or 1, 8)
+    if workers <= 1 or len(jobs) < min_parallel:
+        for job in jobs:
+            yield _parse_job(job)
+        return
+    from concurrent.futures import ProcessPoolExecutor
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for result in pool.map(_parse_job, jobs, chunksize=max(1, len(jobs) // (workers * 4))):
+                yield result
+    except Exception as e:
+        # e.g. no multiprocessing support in this environment
+        print(f"Parallel catalogue parse unavailable ({e}), parsing serially")
+        for job in jobs:
+            yield _parse_job(job)
+
+
+def discover_catalogues(root_dir):
+    """
+    Find every catalogue CSV under root_dir.
+    Returns {csv_path: (garment_dir, scope, (mtime_ns, size))}. Garment folders are
+    not descended into, since they only hold per-product image dirs.
+    """
+    found = {}
+    if not os.path.exists(root_dir):
+        return found
+    for root, dirs, files in os.walk(root_dir):
+        csv_path = None
+        for name in CATALOGUE_FILENAMES:
+            if name in files:
+                csv_path = os.path.join(root, name)
+                break
+        if not csv_path:
+            continue
+        dirs[:] = [d for d in dirs if d not in GARMENT_DIRNAMES]
+        try:
+            st = os.stat(csv_path)
+        except OSError:
+            continue
+        scope = os.path.relpath(root, root_dir).replace(os.sep, "/")
+        found[csv_path] = (find_garment_dir(root), scope, (st.st_mtime_ns, st.st_size))
+    return found
+
+
+class IncrementalLoader:
+    """
+    Keeps a CatalogueStore in sync with the CSVs on disk.
+    Each refresh only stats the catalogue files; CSVs are re-parsed only when
+    they are new or their (mtime, size) changed, and removed CSVs are dropped.
+    With a snapshot attached, every change is mirrored to it so the next boot can
+    start from the snapshot instead of parsing everything.
+    """
+
+    def __init__(self, root_dir, store, workers=None, snapshot=None):
+        self.root_dir = root_dir
+        self.store = store
+        self.workers = workers
+        self.snapshot = snapshot
+        self.on_change = None  # optional callable(changed_paths, removed_paths), called after a refresh that changed something
+        self.tracked = {}  # csv_path -> (mtime_ns, size)
+        self._lock = threading.Lock()
+
+    def load_snapshot(self):
+        """Fill the store from the snapshot. Returns the number of catalogues loaded."""
+        if self.snapshot is None:
+            return 0
+        with self._lock:
+            # Hydrating ~1M small objects triggers a lot of pointless GC passes; pause it meanwhile
+            gc_was_enabled = gc.isenabled()
+            gc.disable()
+            try:
+                saved = self.snapshot.load()
+                self.store.replace_all({path: products for path, (_, products) in saved.items()})
+            except Exception as e:
+                print(f"Failed to load catalogue snapshot: {e}")
+                return 0
+            finally:
+                if gc_was_enabled:
+                    gc.enable()
+            self.tracked = {path: stamp for path, (stamp, _) in saved.items()}
+            return len(saved)
+
+    def _persist(self, csv_path, stamp=None, products=None):
+        if self.snapshot is None:
+            return
+        try:
+            if stamp is None:
+                self.snapshot.remove_source(csv_path)
+            else:
+                self.snapshot.save_source(csv_path, stamp, products)
+        except Exception as e:
+            print(f"Failed to update catalogue snapshot for {csv_path}: {e}")
+
+    def refresh(self):
+        with self._lock:
+            found = discover_catalogues(self.root_dir)
+            changed = {path: info for path, info in found.items() if self.tracked.get(path) != info[2]}
+            removed = [path for path in self.tracked if path not in found]
+
+            for path in removed:
+                self.store.remove_source(path)
+                del self.tracked[path]
+                self._persist(path)
+
+            jobs = [(csv_path, garment_dir, scope) for csv_path, (garment_dir, scope, _) in changed.items()]
+            for csv_path, products, error in parse_catalogues(jobs, workers=self.workers):
+                # Remember the stamp even on failure so a broken file isn't re-parsed until it changes again
+                self.tracked[csv_path] = changed[csv_path][2]
+                if error is not None:
+                    print(f"Error reading {csv_path}: {error}")
+                    self.store.remove_source(csv_path)
+                    self._persist(csv_path, changed[csv_path][2], [])
+                    continue
+                self.store.replace_source(csv_path, products)
+                self._persist(csv_path, changed[csv_path][2], products)
+
+            if self.on_change and (changed or removed):
+                try:
+                    self.on_change(list(changed), removed)
+                except Exception as e:
+                    print(f"Catalogue change handler failed: {e}")
+
+            return {"changed": len(changed), "removed": len(removed), "tracked": len(self.tracked)}
+
+    def rewrite(self, csv_path, write):
+        """
+        Run write(csv_path) to bring a CSV in line with edits already made in the
+        store, then track the new (mtime, size) so the next refresh doesn't
+        re-parse it. If the file had changed on disk since it was last parsed,
+        the stamp is left alone and the next refresh picks up both edits.
+        Returns whatever write returned.
+        """
+        with self._lock:
+            st = os.stat(csv_path)
+            in_sync = self.tracked.get(csv_path) == (st.st_mtime_ns, st.st_size)
+            result = write(csv_path)
+            if in_sync:
+                st = os.stat(csv_path)
+                stamp = (st.st_mtime_ns, st.st_size)
+                self.tracked[csv_path] = stamp
+                self._persist(csv_path, stamp, self.store.source_products(csv_path))
+            return result
+
+
+class CatalogueWatcher:
+    """
+    Pushes catalogue changes into the store without waiting for the cache TTL.
+    Uses watchdog (inotify on Linux) when it's installed, otherwise falls back to
+    polling the CSV stats every `poll_interval` seconds. Bursts of events are
+    debounced into a single refresh.
+    """
+
+    def __init__(self, loader, poll_interval=10, debounce=1.0):
+        self.loader = loader
+        self.poll_interval = poll_interval
+        self.debounce = debounce
+        self._dirty = threading.Event()
+        self._observer = None
+        self._thread = None
+
+    def start(self):
+        try:
+            from watchdog.observers import Observer
+            from watchdog.events import FileSystemEventHandler
+
+            watcher = self
+
+            class _Handler(FileSystemEventHandler):
+                def on_any_event(self, event):
+                    path = getattr(event, "dest_path", "") or event.src_path
+                    if event.is_directory or os.path.basename(path) in CATALOGUE_FILENAMES:
+                        watcher._dirty.set()
+
+            if os.path.exists(self.loader.root_dir):
+                self._observer = Observer()
+                self._observer.schedule(_Handler(), self.loader.root_dir, recursive=True)
+                self._observer.start()
+                print("Catalogue watcher: using filesystem events")
+        except ImportError:
+            print("Catalogue watcher: watchdog not installed, polling")
+        except Exception as e:
+            print(f"Catalogue watcher: filesystem events unavailable ({e}), polling")
+            self._observer = None
+
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            # With an observer we only wake up on events; the poll still runs as a safety net
+            self._dirty.wait(self.poll_interval if self._observer is None else self.poll_interval * 6)
+            if self._dirty.is_set():
+                time.sleep(self.debounce)
+                self._dirty.clear()
+            try:
+                self.loader.refresh()
+            except Exception as e:
+                print(f"Catalogue watcher refresh failed: {e}")
@@ -0,0 +1,263 @@
+import csv
+import json
+import os
+import re
+import shutil
+import tempfile
+import uuid
+import zipfile
+
+CHUNK = 256 * 1024
+
+BASE_COLUMNS = ["id", "Name", "Brand", "MRP", "Discount %", "Category", "Gender",
+                "Color", "sizes", "Thumbnail Image Filename", "Vton Ready Image Filename"]
+OPTIONAL_COLUMNS = ["Description", "Material Care", "locations", "size_chart", "size_chart_unit"]
+
+# Client errors that may mean the internal API rejected some of the catalogue's rows
+REJECTED_STATUSES = (400, 409, 422)
+# Row errors name the product: "Row 3: Image a.png not found for ID 1001"
+ERROR_ID_RE = re.compile(r"\bID (\S+?)[.,;:]?(?:\s|$)")
+
+
+def product_row(product_data, vton_filename, thumb_filename, custom_location=None, size_chart=None, size_chart_unit=None):
+    """The catalogue CSV row for one product, as {column: value}. Optional columns are only set when present."""
+    row = {
+        "id": str(product_data["id"]),
+        "Name": product_data.get("name", ""),
+        "Brand": product_data.get("brand", ""),
+        "MRP": str(product_data.get("mrp", 0)),
+        "Discount %": str(product_data.get("discount_percent", 0)),
+        "Category": product_data.get("category", ""),
+        "Gender": product_data.get("gender", ""),
+        "Color": product_data.get("color", ""),
+        "sizes": product_data.get("sizes", ""),
+        "Thumbnail Image Filename": thumb_filename or vton_filename,
+        "Vton Ready Image Filename": vton_filename,
+    }
+    if product_data.get("description"):
+        row["Description"] = product_data["description"]
+    if product_data.get("material_care"):
+        row["Material Care"] = product_data["material_care"]
+    if custom_location:
+        row["locations"] = custom_location
+    if size_chart:
+        row["size_chart"] = json.dumps(size_chart)
+        # A unit without a chart is meaningless, so it's skipped
+        if size_chart_unit:
+            row["size_chart_unit"] = size_chart_unit
+    return row
+
+
+def write_catalogue(entries, directory):
+    """
+    Write catalogue.csv and images.zip for `entries` ({"product_id", "row",
+    "images": [(source_path, name in zip)]}) into directory. Images are
+    stored, not deflated: PNG/JPEG are already compressed, so deflating only
+    burns CPU. Returns (csv_path, zip_path).
+    """
+    csv_path = os.path.join(directory, "catalogue.csv")
+    zip_path = os.path.join(directory, "images.zip")
+    columns = BASE_COLUMNS + [c for c in OPTIONAL_COLUMNS if any(c in e["row"] for e in entries)]
+    with open(csv_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=columns, restval="")
+        writer.writeheader()
+        for entry in entries:
+            writer.writerow(entry["row"])
+    written = set()
+    with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_STORED) as zf:
+        for entry in entries:
+            for source_path, arcname in entry["images"]:
+                if arcname not in written:
+                    zf.write(source_path, arcname)
+                    written.add(arcname)
+    return csv_path, zip_path
+
+
+class MultipartStream:
+    """
+    A multipart/form-data body read straight from files on disk as it is sent.
+
+    The total length is worked out up front (exposed as `len`, which requests
+    uses for Content-Length), so the upload is a normal fixed-length request
+    without ever holding the files in memory.
+    """
+
+    def __init__(self, fields, files):
+        """fields: {name: value}; files: [(field name, filename, path, content type)]."""
+        boundary = uuid.uuid4().hex
+        self.content_type = f"multipart/form-data; boundary={boundary}"
+        parts = []
+        for name, value in fields.items():
+            parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+        for name, filename, path, content_type in files:
+            parts.append(
+                f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+                f"Content-Type: {content_type}\r\n\r\n".encode()
+            )
+            parts.append(path)
+            parts.append(b"\r\n")
+        parts.append(f"--{boundary}--\r\n".encode())
+        self.len = sum(len(p) if isinstance(p, bytes) else os.path.getsize(p) for p in parts)
+        self._chunks = self._iter(parts)
+        self._chunk = b""
+        self._pos = 0
+
+    @staticmethod
+    def _iter(parts):
+        for part in parts:
+            if isinstance(part, bytes):
+                yield part
+                continue
+            with open(part, "rb") as f:
+                for chunk in iter(lambda: f.read(CHUNK), b""):
+                    yield chunk
+
+    def read(self, size=-1):
+        out = []
+        while size != 0:
+            if self._pos >= len(self._chunk):
+                self._chunk, self._pos = next(self._chunks, b""), 0
+                if not self._chunk:
+                    break
+            end = len(self._chunk) if size < 0 else min(len(self._chunk), self._pos + size)
+            out.append(self._chunk[self._pos:end])
+            if size > 0:
+                size -= end - self._pos
+            self._pos = end
+        return b"".join(out)
+
+
+def error_detail(resp):
+    try:
+        data = resp.json()
+        if isinstance(data, dict):
+            return data.get("detail", data.get("message", str(data)))
+        return str(data)
+    except ValueError:
+        return resp.text[:500]
+
+
+def rejected_products(resp):
+    """
+    The products a rejected upload names in its per-row "errors" list, as
+    {product_id: [messages]}. None when there is no such list, i.e. the request
+    itself was refused (bad client_id, missing form field, ...) rather than
+    some of its rows.
+    """
+    try:
+        data = resp.json()
+    except ValueError:
+        return None
+    detail = data.get("detail", data) if isinstance(data, dict) else None
+    errors = detail.get("errors") if isinstance(detail, dict) else None
+    if not isinstance(errors, list) or not errors:
+        return None
+    named = {}
+    for error in errors:
+        match = ERROR_ID_RE.search(str(error))
+        if match:
+            named.setdefault(match.group(1), []).append(str(error))
+    return named
+
+
+def plan_chunks(entries, max_products, max_bytes):
+    """Split entries into uploads of at most max_products products and (roughly) max_bytes of images."""
+    chunks, current, size = [], [], 0
+    for entry in entries:
+        entry_bytes = sum(os.path.getsize(path) for path, _ in entry["images"])
+        if current and (len(current) >= max_products or size + entry_bytes > max_bytes):
+            chunks.append(current)
+            current, size = [], 0
+        current.append(entry)
+        size += entry_bytes
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def push_catalogue(send, entries, spool_dir, max_products=200, max_bytes=256 * 1024 * 1024):
+    """
+    Upload entries to the internal API as few catalogues as the limits allow.
+
+    send(csv_path, zip_path) posts one catalogue and returns the response.
+    Each chunk is written to its own temp folder under spool_dir and removed
+    afterwards. If the API rejects some of a chunk's rows, the products its
+    errors name fail and the rest of the chunk is sent again; when the errors
+    don't say which products they are about, the chunk is split in half and
+    retried until the bad ones are isolated. Either way one bad product
+    doesn't fail everything uploaded with it. Any other error fails the chunk
+    once. Returns
+    ({product_id: {"status": "uploaded"|"failed", "error"}}, [responses]).
+    """
+    outcomes = {}
+    responses = []
+    os.makedirs(spool_dir, exist_ok=True)
+
+    def upload(chunk):
+        directory = tempfile.mkdtemp(prefix="push_", dir=spool_dir)
+        try:
+            csv_path, zip_path = write_catalogue(chunk, directory)
+            resp = send(csv_path, zip_path)
+        except Exception as e:
+            for entry in chunk:
+                outcomes[entry["product_id"]] = {"status": "failed", "error": str(e)}
+            return
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+        if resp.status_code == 200:
+            try:
+                responses.append(resp.json())
+            except ValueError:
+                responses.append(resp.text[:500])
+            for entry in chunk:
+                outcomes[entry["product_id"]] = {"status": "uploaded", "error": None}
+            return
+        named = rejected_products(resp) if resp.status_code in REJECTED_STATUSES else None
+        if named is None or len(chunk) == 1:
+            error = f"{resp.status_code}: {error_detail(resp)}"
+            for entry in chunk:
+                outcomes[entry["product_id"]] = {"status": "failed", "error": error}
+            return
+        rest = [entry for entry in chunk if str(entry["product_id"]) not in named]
+        if len(rest) < len(chunk):
+            for entry in chunk:
+                if str(entry["product_id"]) in named:
+                    error = f"{resp.status_code}: {'; '.join(named[str(entry['product_id'])])}"
+                    outcomes[entry["product_id"]] = {"status": "failed", "error": error}
+            if rest:
+                upload(rest)
+        else:
+            middle = len(chunk) // 2
+            upload(chunk[:middle])
+            upload(chunk[middle:])
+
+    for chunk in plan_chunks(entries, max_products, max_bytes):
+        upload(chunk)
+    return outcomes, responses
+
+
+def push_batch(products, build_entry, push):
+    """
+    Resolve and upload a batch given as [(product_id, item)]. build_entry(item)
+    returns its push_catalogue entry or raises LookupError; push(entries) runs
+    push_catalogue. Each product id is sent once; a later item with the same
+    id fails as a duplicate. Returns ([outcome per item, in order], responses).
+    """
+    outcomes = [None] * len(products)
+    first = {}  # product_id -> index of the item that is sent
+    entries = []
+    for i, (product_id, item) in enumerate(products):
+        if not product_id:
+            outcomes[i] = {"status": "failed", "error": "product.id is required"}
+        elif product_id in first:
+            outcomes[i] = {"status": "failed", "error": "Duplicate product in batch"}
+        else:
+            first[product_id] = i
+            try:
+                entries.append(build_entry(item))
+            except LookupError as e:
+                outcomes[i] = {"status": "failed", "error": str(e)}
+    pushed, responses = push(entries) if entries else ({}, [])
+    for product_id, outcome in pushed.items():
+        outcomes[first[str(product_id)]] = outcome
+    return outcomes, responses
@@ -0,0 +1,266 @@
+import base64
+import bisect
+import hashlib
+import itertools
+import json
+import re
+import threading
+from collections import OrderedDict
+
+from catalogue_store import product_key, public_product
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+TEXT_FIELDS = ("name", "description")
+FILTER_FIELDS = ("client", "category", "gender", "brand")
+SORTS = {
+    "mrp": lambda p: (p.get("mrp") or 0.0),
+    "discount": lambda p: (p.get("discount_percent") or 0.0),
+    "name": lambda p: (p.get("name") or "").lower(),
+}
+CLIENT_RE = re.compile(r"^client_([^/]+)")
+
+
+class CursorExpired(Exception):
+    """The cursor is malformed or belongs to a different query."""
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(text.lower()) if text else []
+
+
+def client_of(product):
+    """Client id from the catalogue scope (client_<id>/upload_<n>), or ""."""
+    match = CLIENT_RE.match(product.get("_scope", ""))
+    return match.group(1) if match else ""
+
+
+class SourceIndex:
+    """Token and exact-field postings for the products of one catalogue CSV."""
+
+    def __init__(self, products):
+        self.rows = []     # (key, product), first occurrence of each key, in file order
+        self.tokens = {}   # token -> set of keys
+        self.fields = {name: {} for name in FILTER_FIELDS}  # field -> lowercased value -> set of keys
+        seen = set()
+        for p in products:
+            key = product_key(p)
+            if key in seen:
+                continue
+            seen.add(key)
+            self.rows.append((key, p))
+            for field in TEXT_FIELDS:
+                for token in tokenize(p.get(field)):
+                    self.tokens.setdefault(token, set()).add(key)
+            self.fields["client"].setdefault(client_of(p), set()).add(key)
+            for name in ("category", "gender", "brand"):
+                self.fields[name].setdefault((p.get(name) or "").lower(), set()).add(key)
+        self.sorted_tokens = sorted(self.tokens)
+
+    def match(self, words, filters):
+        """Keys matching every filter and every word (as a word prefix), or None if there are neither."""
+        sets = sorted((self.fields[name].get(value, set()) for name, value in filters), key=len)
+        matched = sets[0].intersection(*sets[1:]) if sets else None
+        for word in words:
+            i = bisect.bisect_left(self.sorted_tokens, word)
+            j = bisect.bisect_left(self.sorted_tokens, word + "\uffff")
+            hits = set().union(*(self.tokens[t] for t in self.sorted_tokens[i:j]))
+            matched = hits if matched is None else matched & hits
+            if not matched:
+                break
+        return matched
+
+
+class Index:
+    """The catalogue as of one sources_version: per-CSV indexes plus the global order."""
+
+    def __init__(self, version, sources):
+        self.version = version
+        self.sources = sources  # [(seq, SourceIndex)] in catalogue order
+        self.order = {}         # key -> (seq, row), the default sort order
+        self.by_key = {}
+        self.keys = []          # every key in default order
+        for seq, source in sources:
+            for row, (key, product) in enumerate(source.rows):
+                if key not in self.order:
+                    self.order[key] = (seq, row)
+                    self.by_key[key] = product
+                    self.keys.append(key)
+        self._sorted = {}
+        self._lock = threading.Lock()
+
+    def sort_key(self, sort):
+        """key -> comparable tuple for a sort; these tuples are what cursors carry."""
+        if sort == "default":
+            return self.order.__getitem__
+        value, order, by_key = SORTS[sort], self.order, self.by_key
+        return lambda k: (value(by_key[k]),) + order[k]
+
+    def sorted_keys(self, sort):
+        """Every key in ascending sort order, computed once per index."""
+        if sort == "default":
+            return self.keys
+        with self._lock:
+            if sort not in self._sorted:
+                self._sorted[sort] = sorted(self.keys, key=self.sort_key(sort))
+            return self._sorted[sort]
+
+
+class CatalogueSearch:
+    """
+    Search, filter and sort over a CatalogueStore.
+
+    Each catalogue CSV gets its own inverted index (token -> keys over
+    name/description) plus exact-match indexes on client/category/gender/brand.
+    refresh() re-indexes only the catalogues whose product list changed and
+    swaps the new Index in with one assignment, so searches already running
+    finish on the old one. Call it (and search()) off the event loop.
+    Approvals don't touch the index; the pending filter reads the store.
+
+    Cursors are keyset cursors: the sort position of the last product on the
+    page plus a hash of the query. The next page is whatever sorts after that
+    position in the current catalogue, so paging stays in order across
+    refreshes without holding result lists per cursor. Products are serialized
+    once and the JSON is reused until the product changes, so a page is a join
+    of cached bytes.
+    """
+
+    def __init__(self, store, cached_queries=8):
+        self.store = store
+        self.cached_queries = cached_queries
+        self._build_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._index = None
+        self._sources = {}  # csv_path -> (product list, SourceIndex)
+        # Catalogue order, fixed per CSV for as long as it stays loaded; cursors refer to it
+        self._seq = {}
+        self._next_seq = itertools.count()
+        self._results = OrderedDict()  # (params, store.version, index) -> ascending keys
+        self._json = {}                # key -> (product object, vton_image, bytes)
+
+    def refresh(self):
+        """Bring the index up to date with the store and return it."""
+        with self._build_lock:
+            index = self._index
+            if index is not None and index.version == self.store.sources_version:
+                return index
+            version, lists = self.store.source_lists()
+            sources = {}
+            for csv_path, products in lists.items():
+                cached = self._sources.get(csv_path)
+                if cached is None or cached[0] is not products:
+                    cached = (products, SourceIndex(products))
+                sources[csv_path] = cached
+                if csv_path not in self._seq:
+                    self._seq[csv_path] = next(self._next_seq)
+            self._seq = {path: seq for path, seq in self._seq.items() if path in sources}
+            self._sources = sources
+            index = Index(version, [(self._seq[path], source) for path, (_, source) in sources.items()])
+            with self._lock:
+                self._index = index
+                self._results.clear()
+                self._json = {k: v for k, v in self._json.items() if k in index.order}
+            return index
+
+    def _query(self, index, q, filters, pending_only, sort):
+        """Matching keys in ascending sort order."""
+        words = tokenize(q)
+        filters = [(name, str(value).lower()) for name, value in filters.items() if value]
+        if words or filters:
+            matched = []
+            for _, source in index.sources:
+                keys = source.match(words, filters)
+                if keys:
+                    matched.extend(k for k in keys if k in index.order)
+            keys = sorted(set(matched), key=index.sort_key(sort))
+        else:
+            keys = index.sorted_keys(sort)
+        if pending_only:
+            keys = [k for k in keys if self.store.is_pending(k)]
+        return keys
+
+    def _product_json(self, key):
+        product = self.store.get(key[1], scope=key[0])
+        if product is None:
+            return None
+        cached = self._json.get(key)
+        if cached is not None and cached[0] is product and cached[1] == product.get("vton_image"):
+            return cached[2]
+        data = json.dumps(public_product(product)).encode()
+        self._json[key] = (product, product.get("vton_image"), data)
+        return data
+
+    @staticmethod
+    def _encode_cursor(query_hash, position):
+        data = base64.urlsafe_b64encode(json.dumps(position).encode()).decode().rstrip("=")
+        return f"{query_hash}.{data}"
+
+    @staticmethod
+    def _decode_cursor(cursor, query_hash):
+        prefix, _, data = cursor.partition(".")
+        if prefix != query_hash:
+            raise CursorExpired(cursor)
+        try:
+            position = json.loads(base64.urlsafe_b64decode(data + "=" * (-len(data) % 4)))
+        except ValueError:
+            raise CursorExpired(cursor)
+        if not isinstance(position, list):
+            raise CursorExpired(cursor)
+        return tuple(position)
+
+    def search(self, q="", filters=None, pending_only=False, sort="default", limit=30, offset=0, cursor=None):
+        """
+        Returns (total, [product JSON bytes], next_cursor). A cursor continues
+        a previous search after its last product; CursorExpired if it doesn't
+        belong to this query.
+        """
+        sort = sort or "default"
+        descending = sort.startswith("-")
+        base_sort = sort.lstrip("-")
+        if base_sort not in SORTS and base_sort != "default":
+            raise ValueError(f"Unknown sort {sort!r}, expected one of: default, {', '.join(SORTS)} (prefix - for descending)")
+        index = self.refresh()
+        filters = filters or {}
+        params = (q or "", tuple(sorted(filters.items())), pending_only, sort)
+        query_hash = hashlib.sha1(repr(params).encode()).hexdigest()[:12]
+        cache_key = (params, self.store.version, index)
+
+        with self._lock:
+            keys = self._results.get(cache_key)
+            if keys is not None:
+                self._results.move_to_end(cache_key)
+        if keys is None:
+            keys = self._query(index, q, filters, pending_only, base_sort)
+            with self._lock:
+                self._results[cache_key] = keys
+                while len(self._results) > self.cached_queries:
+                    self._results.popitem(last=False)
+
+        position = index.sort_key(base_sort)
+        if cursor:
+            after = self._decode_cursor(cursor, query_hash)
+            try:
+                if descending:
+                    # Everything sorting before the cursor, walked backwards
+                    start = len(keys) - bisect.bisect_left(keys, after, key=position)
+                else:
+                    start = bisect.bisect_right(keys, after, key=position)
+            except TypeError:
+                raise CursorExpired(cursor)
+        else:
+            start = offset
+
+        page = []
+        last = None
+        end = start
+        # Skip products that disappeared since the index was built
+        while end < len(keys) and len(page) < limit:
+            key = keys[len(keys) - 1 - end] if descending else keys[end]
+            end += 1
+            data = self._product_json(key)
+            if data is not None:
+                page.append(data)
+                last = key
+        next_cursor = None
+        if end < len(keys) and last is not None:
+            next_cursor = self._encode_cursor(query_hash, list(position(last)))
+        return len(keys), page, next_cursor
@@ -0,0 +1,76 @@
+import pickle
+import sqlite3
+import threading
+
+# Bump when the product dict shape produced by parse_catalogue changes
+SNAPSHOT_FORMAT = "2"
+
+
+def _to_columns(products):
+    """Products as (fields, columns): one list per field pickles far faster than a list of dicts."""
+    if not products:
+        return [], []
+    fields = list(products[0].keys())
+    return fields, [[p.get(f) for p in products] for f in fields]
+
+
+def _from_columns(fields, columns):
+    return [dict(zip(fields, values)) for values in zip(*columns)]
+
+
+class CatalogueSnapshot:
+    """
+    On-disk copy of the parsed catalogue, one row per source CSV keyed by its
+    path and (mtime_ns, size) stamp, with the products stored column-wise.
+    Loading it on boot lets the server answer straight away; the loader then
+    re-checks the stamps against disk and only re-parses what changed. The
+    store's indexes are rebuilt from the products on load, which is quicker
+    than deserialising them.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sources ("
+            " csv_path TEXT PRIMARY KEY, mtime_ns INTEGER, size INTEGER, products BLOB)"
+        )
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'format'").fetchone()
+        if row is None or row[0] != SNAPSHOT_FORMAT:
+            self._conn.execute("DELETE FROM sources")
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('format', ?)", (SNAPSHOT_FORMAT,))
+        self._conn.commit()
+
+    def load(self):
+        """Return {csv_path: ((mtime_ns, size), products)} in the order they were saved."""
+        with self._lock:
+            rows = self._conn.execute("SELECT csv_path, mtime_ns, size, products FROM sources ORDER BY rowid").fetchall()
+        result = {}
+        for csv_path, mtime_ns, size, blob in rows:
+            try:
+                result[csv_path] = ((mtime_ns, size), _from_columns(*pickle.loads(blob)))
+            except Exception as e:
+                print(f"Skipping unreadable snapshot entry for {csv_path}: {e}")
+        return result
+
+    def save_source(self, csv_path, stamp, products):
+        blob = pickle.dumps(_to_columns(products), protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sources (csv_path, mtime_ns, size, products) VALUES (?, ?, ?, ?)",
+                (csv_path, stamp[0], stamp[1], blob),
+            )
+            self._conn.commit()
+
+    def remove_source(self, csv_path):
+        with self._lock:
+            self._conn.execute("DELETE FROM sources WHERE csv_path = ?", (csv_path,))
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
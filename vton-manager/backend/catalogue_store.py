@@ -0,0 +1,196 @@
+import threading
+
+
+# Fields that get a secondary index, and the product dict key they read from.
+# Category/gender/brand filtering lives in CatalogueSearch's per-CSV indexes.
+INDEXED_FIELDS = {
+    "source_csv": "_source_csv",
+}
+
+
+def product_key(product):
+    """Primary key for a product: (catalogue scope, product id)."""
+    return (product.get("_scope", ""), product["id"])
+
+
+def public_product(product):
+    """Copy of a product without the internal underscore-prefixed fields."""
+    return {k: v for k, v in product.items() if not k.startswith("_")}
+
+
+SUMMARY_FIELDS = ("id", "name", "brand", "thumbnail_image", "category")
+
+
+def product_summary(product):
+    """The few fields list views need, e.g. next to each queue item."""
+    return {k: product.get(k) for k in SUMMARY_FIELDS}
+
+
+class CatalogueStore:
+    """
+    In-memory catalogue with O(1) lookups.
+
+    Products are grouped by their source CSV. The primary index is keyed by
+    (scope, id) where scope is the catalogue folder relative to ROOT_DIR, so the
+    same SKU uploaded for two clients doesn't collide. A second map from bare id
+    to its keys serves the existing /product/{id} style lookups, which resolve
+    to the first catalogue (in load order) containing that id. Re-parsing a
+    catalogue keeps its place in that order.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        # dicts keep insertion order, so {key: None} doubles as an ordered set
+        self._sources = {}   # csv_path -> [product, ...]
+        self._rank = {}      # csv_path -> load order, for resolving ids found in several catalogues
+        self._next_rank = 0
+        self._by_key = {}    # (scope, id) -> product
+        self._by_id = {}     # id -> ordered set of (scope, id)
+        self._pending = {}   # keys without a vton image
+        self._indexes = {name: {} for name in INDEXED_FIELDS}  # name -> value -> ordered set of keys
+        self._all = None     # cached flat list, rebuilt lazily
+        self.version = 0          # bumped on every change
+        self.sources_version = 0  # bumped only when whole catalogues are added, replaced or removed
+
+    # ─── Mutation ──────────────────────────────────────────────────
+    def replace_source(self, csv_path, products):
+        """Swap in the products of one CSV, dropping whatever it held before."""
+        with self._lock:
+            self._drop_source(csv_path)
+            if csv_path not in self._sources:
+                self._add_rank(csv_path)
+            self._sources[csv_path] = list(products)
+            for p in self._sources[csv_path]:
+                self._index(p)
+            self._changed(sources=True)
+
+    def remove_source(self, csv_path):
+        with self._lock:
+            if csv_path in self._sources:
+                self._drop_source(csv_path)
+                del self._sources[csv_path]
+                del self._rank[csv_path]
+                self._changed(sources=True)
+
+    def replace_all(self, sources):
+        """Rebuild from a {csv_path: [products]} mapping in one go."""
+        with self._lock:
+            self._sources = {}
+            self._rank = {}
+            self._by_key = {}
+            self._by_id = {}
+            self._pending = {}
+            self._indexes = {name: {} for name in INDEXED_FIELDS}
+            for csv_path, products in sources.items():
+                self._add_rank(csv_path)
+                self._sources[csv_path] = list(products)
+                for p in self._sources[csv_path]:
+                    self._index(p)
+            self._changed(sources=True)
+
+    def set_vton_image(self, product, vton_image):
+        """Update a product's vton image in place, keeping pending in sync."""
+        with self._lock:
+            key = product_key(product)
+            self._pending.pop(key, None)
+            product["vton_image"] = vton_image
+            if not vton_image:
+                self._pending[key] = None
+            self._changed()
+
+    def _add_rank(self, csv_path):
+        self._rank[csv_path] = self._next_rank
+        self._next_rank += 1
+
+    def _index(self, p):
+        key = (p.get("_scope", ""), p["id"])
+        by_key = self._by_key
+        if key in by_key:
+            # Same id twice in one catalogue: keep the first row
+            return
+        by_key[key] = p
+        keys = self._by_id.setdefault(p["id"], {})
+        keys[key] = None
+        if len(keys) > 1:
+            # Keep them in catalogue order, not the order they were (re)indexed in
+            rank = self._rank
+            self._by_id[p["id"]] = dict.fromkeys(sorted(keys, key=lambda k: rank[by_key[k]["_source_csv"]]))
+        if not p.get("vton_image"):
+            self._pending[key] = None
+        indexes = self._indexes
+        for name, field in INDEXED_FIELDS.items():
+            indexes[name].setdefault(p.get(field) or "", {})[key] = None
+
+    def _unindex(self, p):
+        key = product_key(p)
+        if self._by_key.get(key) is not p:
+            return
+        del self._by_key[key]
+        keys = self._by_id.get(p["id"])
+        if keys is not None:
+            keys.pop(key, None)
+            if not keys:
+                del self._by_id[p["id"]]
+        self._pending.pop(key, None)
+        for name, field in INDEXED_FIELDS.items():
+            bucket = self._indexes[name].get(p.get(field) or "")
+            if bucket is not None:
+                bucket.pop(key, None)
+                if not bucket:
+                    del self._indexes[name][p.get(field) or ""]
+
+    def _drop_source(self, csv_path):
+        for p in self._sources.get(csv_path, []):
+            self._unindex(p)
+
+    def _changed(self, sources=False):
+        self._all = None
+        self.version += 1
+        if sources:
+            self.sources_version += 1
+
+    # ─── Lookup ────────────────────────────────────────────────────
+    def all(self):
+        with self._lock:
+            if self._all is None:
+                self._all = [p for products in self._sources.values() for p in products]
+            return self._all
+
+    def get(self, product_id, scope=None):
+        """Product by id. Without a scope, the first catalogue holding the id wins."""
+        with self._lock:
+            if scope is not None:
+                return self._by_key.get((scope, product_id))
+            keys = self._by_id.get(product_id)
+            if not keys:
+                return None
+            return self._by_key[next(iter(keys))]
+
+    def is_pending(self, key):
+        return key in self._pending
+
+    def by(self, name, value):
+        """Products whose indexed field `name` (see INDEXED_FIELDS) equals value."""
+        with self._lock:
+            return [self._by_key[k] for k in self._indexes[name].get(value, ())]
+
+    def source_products(self, csv_path):
+        """The products of one CSV, in file order."""
+        with self._lock:
+            return list(self._sources.get(csv_path, ()))
+
+    def sources(self):
+        with self._lock:
+            return list(self._sources.keys())
+
+    def source_lists(self):
+        """
+        (sources_version, {csv_path: products}) in catalogue order, read together.
+        The lists are the store's own: a changed catalogue gets a new list rather
+        than being edited in place, so callers can tell what changed by identity.
+        """
+        with self._lock:
+            return self.sources_version, dict(self._sources)
+
+    def __len__(self):
+        return len(self._by_key)
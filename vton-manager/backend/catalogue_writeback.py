@@ -0,0 +1,133 @@
+import os
+import threading
+
+import pandas as pd
+
+
+def write_csv_updates(csv_path, updates):
+    """
+    Apply {product_id: {column: value}} to one catalogue CSV, atomically.
+
+    Every column is read and written back as text so untouched cells keep their
+    exact formatting. The new file is written next to the old one, fsynced and
+    renamed over it, so a crash leaves either the old file or the new one.
+    Returns (rows updated, [product ids with no row in the file]).
+    """
+    df = pd.read_csv(csv_path, dtype=str, keep_default_na=False)
+    # Match ids the way parse_catalogue derives them (pandas' inference, then str)
+    ids = pd.read_csv(csv_path, usecols=["id"])["id"].astype(str)
+    rows = ids.isin(updates.keys())
+    for column in {c for changes in updates.values() for c in changes}:
+        if column not in df:
+            df[column] = ""
+        values = ids[rows].map(lambda pid: updates[pid].get(column))
+        keep = values.notna()
+        df.loc[values.index[keep], column] = values[keep]
+
+    tmp_path = f"{csv_path}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, "w", newline="", encoding="utf-8") as f:
+            df.to_csv(f, index=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, csv_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    missing = sorted(set(updates) - set(ids[rows]))
+    return int(rows.sum()), missing
+
+
+def csv_ids(csv_path):
+    """Product ids in a catalogue CSV, matched the same way write_csv_updates matches them."""
+    return set(pd.read_csv(csv_path, usecols=["id"])["id"].astype(str))
+
+
+class CsvWriteBack:
+    """
+    Buffers cell updates to catalogue CSVs and writes each file at most once per
+    `delay` seconds.
+
+    set() records the change and returns straight away; the first change to a
+    file arms a timer, and when it fires every change buffered for that file
+    goes out in one write_csv_updates() call. Writes go through the loader so
+    its tracked stamp and snapshot follow the new file and the next refresh
+    doesn't re-parse it.
+    """
+
+    def __init__(self, loader, delay=1.0):
+        self.loader = loader
+        self.delay = delay
+        self._lock = threading.Lock()
+        # Serializes flushes so an older batch can never land on top of a newer one
+        self._flush_lock = threading.Lock()
+        self._pending = {}  # csv_path -> {product_id: {column: value}}
+        self._timers = {}
+        self._ids = {}  # csv_path -> ((mtime, size), ids), for has_row
+        self.stats = {"updates": 0, "flushes": 0, "rows_written": 0, "failed": 0, "missing_rows": 0}
+
+    def set(self, csv_path, product_id, column, value):
+        with self._lock:
+            self._pending.setdefault(csv_path, {}).setdefault(str(product_id), {})[column] = value
+            self.stats["updates"] += 1
+            self._arm(csv_path)
+
+    def _arm(self, csv_path):
+        if csv_path not in self._timers:
+            timer = threading.Timer(self.delay, self.flush, args=(csv_path,))
+            timer.daemon = True
+            self._timers[csv_path] = timer
+            timer.start()
+
+    def has_row(self, csv_path, product_id):
+        """Whether the CSV on disk has a row for product_id. The id column is re-read only when the file changes."""
+        st = os.stat(csv_path)
+        stamp = (st.st_mtime_ns, st.st_size)
+        cached = self._ids.get(csv_path)
+        if cached is None or cached[0] != stamp:
+            cached = (stamp, csv_ids(csv_path))
+            self._ids[csv_path] = cached
+        return str(product_id) in cached[1]
+
+    def pending(self):
+        with self._lock:
+            return {path: len(updates) for path, updates in self._pending.items()}
+
+    def flush(self, csv_path):
+        """Write everything buffered for csv_path now. Returns the number of rows updated."""
+        with self._flush_lock:
+            with self._lock:
+                timer = self._timers.pop(csv_path, None)
+                updates = self._pending.pop(csv_path, None)
+            if timer is not None:
+                timer.cancel()
+            if not updates:
+                return 0
+            if not os.path.exists(csv_path):
+                print(f"Dropping {len(updates)} buffered updates for {csv_path}: file no longer exists")
+                return 0
+            try:
+                written, missing = self.loader.rewrite(csv_path, lambda path: write_csv_updates(path, updates))
+            except Exception as e:
+                print(f"Failed to write back {csv_path}, retrying in {self.delay}s: {e}")
+                with self._lock:
+                    self.stats["failed"] += 1
+                    # Put the batch back underneath anything newer that arrived meanwhile
+                    buffered = self._pending.setdefault(csv_path, {})
+                    for product_id, changes in updates.items():
+                        buffered[product_id] = {**changes, **buffered.get(product_id, {})}
+                    self._arm(csv_path)
+                return 0
+            if missing:
+                # Their approvals were already reported as successful; this is the only trace
+                print(f"Write-back to {csv_path}: no row for product ids {missing}, their updates were dropped")
+            with self._lock:
+                self.stats["flushes"] += 1
+                self.stats["rows_written"] += written
+                self.stats["missing_rows"] += len(missing)
+            return written
+
+    def flush_all(self):
+        with self._lock:
+            paths = list(self._pending)
+        return sum(self.flush(path) for path in paths)
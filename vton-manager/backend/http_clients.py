@@ -0,0 +1,85 @@
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+
+
+class UpstreamClient:
+    """
+    One pooled keep-alive session per upstream service.
+
+    Connections are reused across calls and threads, with at most `pool_size`
+    open per host (callers wait for a free one rather than opening more).
+    Idempotent methods are retried with exponential backoff on connection
+    errors and 502/503/504; non-idempotent calls are only retried when the
+    connection couldn't be established, i.e. nothing was sent.
+    """
+
+    def __init__(self, name, pool_size=10, retries=2, backoff=0.25):
+        self.name = name
+        self.pool_size = pool_size
+        retry = Retry(
+            total=retries,
+            connect=retries,
+            read=retries,
+            status=retries,
+            backoff_factor=backoff,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=IDEMPOTENT_METHODS,
+            raise_on_status=False,
+        )
+        self._adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=retry, pool_block=True)
+        self.session = requests.Session()
+        self.session.mount("http://", self._adapter)
+        self.session.mount("https://", self._adapter)
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._errors = 0
+        self._total_time = 0.0
+        self._max_time = 0.0
+
+    def request(self, method, url, **kwargs):
+        start = time.perf_counter()
+        try:
+            return self.session.request(method, url, **kwargs)
+        except Exception:
+            with self._lock:
+                self._errors += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self._requests += 1
+                self._total_time += elapsed
+                self._max_time = max(self._max_time, elapsed)
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def stats(self):
+        # urllib3 counts, per host pool, how many connections it had to open vs requests sent
+        opened = sent = 0
+        pools = self._adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            opened += pool.num_connections
+            sent += pool.num_requests
+        with self._lock:
+            return {
+                "requests": self._requests,
+                "errors": self._errors,
+                "connections_opened": opened,
+                "connections_reused": max(sent - opened, 0),
+                "avg_ms": round(self._total_time / self._requests * 1000, 1) if self._requests else 0.0,
+                "max_ms": round(self._max_time * 1000, 1),
+                "pool_size": self.pool_size,
+            }
@@ -0,0 +1,138 @@
+import asyncio
+import base64
+
+import requests
+
+
+class BatchUnsupported(Exception):
+    """The inference server has no batch endpoint."""
+
+
+def _content_type(filename):
+    return 'image/png' if filename.endswith('.png') else 'image/jpeg'
+
+
+def infer_single(url, input_path, filename, params, timeout=120, http=requests):
+    """Run one image through the inference server. Returns the output bytes, or None on failure."""
+    try:
+        with open(input_path, 'rb') as f:
+            files = {'image': (filename, f, _content_type(filename))}
+            response = http.post(url, files=files, data=params, timeout=timeout)
+        if response.status_code == 200:
+            return response.content
+        print(f"Inference failed: {response.status_code} {response.text}")
+    except Exception as e:
+        print(f"Inference connection error: {e}")
+    return None
+
+
+def infer_batch(url, inputs, params, timeout=300, http=requests):
+    """
+    Send several images in one request.
+
+    The batch endpoint takes the same form fields as /infer plus one `images`
+    file part per input, and answers with
+    {"results": [{"image": "<base64>"} | {"error": "..."}, ...]} in input order.
+    Returns a list of output bytes (None for failed entries). Raises
+    BatchUnsupported if the server doesn't have the endpoint.
+    """
+    handles = []
+    try:
+        files = []
+        for input_path, filename in inputs:
+            f = open(input_path, 'rb')
+            handles.append(f)
+            files.append(('images', (filename, f, _content_type(filename))))
+        response = http.post(url, files=files, data=params, timeout=timeout)
+    finally:
+        for f in handles:
+            f.close()
+    if response.status_code in (404, 405, 501):
+        raise BatchUnsupported(f"{response.status_code} from {url}")
+    if response.status_code != 200:
+        print(f"Batch inference failed: {response.status_code} {response.text[:200]}")
+        return [None] * len(inputs)
+    results = response.json().get("results", [])
+    outputs = []
+    for i in range(len(inputs)):
+        entry = results[i] if i < len(results) else {"error": "missing from batch response"}
+        if "image" in entry:
+            outputs.append(base64.b64decode(entry["image"]))
+        else:
+            print(f"Batch inference error for {inputs[i][1]}: {entry.get('error')}")
+            outputs.append(None)
+    return outputs
+
+
+class InferenceBatcher:
+    """
+    Collects concurrent infer() calls into batched requests.
+
+    A batch is sent once `max_batch` inputs are waiting or `max_wait_ms` has
+    passed since the first one arrived, whichever comes first, and the results
+    are handed back to each caller. If the server turns out not to support
+    batches, the batcher switches to single requests for good.
+    """
+
+    def __init__(self, url, batch_url, params, max_batch=8, max_wait_ms=50, timeout=120, http=requests):
+        self.http = http
+        self.url = url
+        self.batch_url = batch_url
+        self.params = params
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max_wait_ms / 1000
+        self.timeout = timeout
+        self.batch_supported = None  # unknown until the first batch goes out
+        self._waiting = []  # (input_path, filename, future)
+        self._timer = None
+        self._tasks = set()  # in-flight sends; the loop only keeps weak references to tasks
+        self.stats = {"batches": 0, "batched_items": 0, "single_items": 0}
+
+    async def infer(self, input_path, filename):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._waiting.append((input_path, filename, future))
+        if len(self._waiting) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        while self._waiting:
+            batch, self._waiting = self._waiting[:self.max_batch], self._waiting[self.max_batch:]
+            task = asyncio.create_task(self._send(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, batch):
+        try:
+            outputs = None
+            if len(batch) > 1 and self.batch_supported is not False:
+                try:
+                    inputs = [(path, filename) for path, filename, _ in batch]
+                    outputs = await asyncio.to_thread(infer_batch, self.batch_url, inputs, self.params, self.timeout * 2, self.http)
+                    self.batch_supported = True
+                    self.stats["batches"] += 1
+                    self.stats["batched_items"] += len(batch)
+                except BatchUnsupported as e:
+                    print(f"Inference server has no batch endpoint ({e}); using single requests")
+                    self.batch_supported = False
+                except Exception as e:
+                    print(f"Batch inference connection error: {e}")
+                    outputs = [None] * len(batch)
+            if outputs is None:
+                outputs = await asyncio.gather(*(
+                    asyncio.to_thread(infer_single, self.url, path, filename, self.params, self.timeout, self.http)
+                    for path, filename, _ in batch
+                ))
+                self.stats["single_items"] += len(batch)
+        except Exception as e:
+            print(f"Inference batch error: {e}")
+            outputs = [None] * len(batch)
+        for (_, _, future), output in zip(batch, outputs):
+            if not future.done():
+                future.set_result(output)
@@ -0,0 +1,163 @@
+import json
+import sqlite3
+import threading
+import time
+
+STAGES = ("spool", "extract", "index", "validate", "s3", "thumbnails", "merge")
+FINISHED = ("succeeded", "failed")
+
+# Progress counters change constantly; only write them through to SQLite this often
+PROGRESS_PERSIST_INTERVAL = 1.0
+
+
+class JobStore:
+    """
+    Catalogue ingestion jobs, kept in memory and persisted to SQLite (WAL) so
+    they survive a restart.
+
+    A job is a plain dict:
+    {"id", "client_id", "upload_dir", "status": queued|running|succeeded|failed,
+     "stage", "stages": {name: {"status", "done", "total", "started_at", "finished_at"}},
+     "errors", "warnings", "result", "created_at", "updated_at"}
+
+    Finished jobs are pruned once they are older than `retention` seconds,
+    and beyond the newest `max_finished` of them.
+    """
+
+    def __init__(self, db_path, retention=7 * 24 * 3600, max_finished=500):
+        self.retention = retention
+        self.max_finished = max_finished
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs (id TEXT PRIMARY KEY, created_at REAL NOT NULL, status TEXT NOT NULL, data TEXT NOT NULL)"
+        )
+        self._conn.commit()
+        self._jobs = {}
+        self._persisted_at = {}
+        for (data,) in self._conn.execute("SELECT data FROM jobs ORDER BY created_at").fetchall():
+            job = json.loads(data)
+            self._jobs[job["id"]] = job
+        with self._lock:
+            self._prune()
+
+    def _persist(self, job):
+        job["updated_at"] = time.time()
+        self._persisted_at[job["id"]] = job["updated_at"]
+        with self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO jobs (id, created_at, status, data) VALUES (?, ?, ?, ?)",
+                (job["id"], job["created_at"], job["status"], json.dumps(job)),
+            )
+
+    def _prune(self):
+        finished = [job for job in self._jobs.values() if job["status"] in FINISHED]
+        cutoff = time.time() - self.retention
+        # _jobs is in creation order, so the oldest finished jobs come first
+        excess = len(finished) - self.max_finished
+        stale = [job["id"] for i, job in enumerate(finished) if i < excess or job["updated_at"] < cutoff]
+        if not stale:
+            return
+        with self._conn:
+            self._conn.executemany("DELETE FROM jobs WHERE id = ?", [(job_id,) for job_id in stale])
+        for job_id in stale:
+            del self._jobs[job_id]
+            self._persisted_at.pop(job_id, None)
+
+    def create(self, job_id, client_id, upload_dir, **extra):
+        now = time.time()
+        job = {
+            "id": job_id,
+            "client_id": client_id,
+            "upload_dir": upload_dir,
+            "status": "queued",
+            "stage": None,
+            "stages": {
+                name: {"status": "pending", "done": 0, "total": None, "started_at": None, "finished_at": None}
+                for name in STAGES
+            },
+            "errors": [],
+            "warnings": [],
+            "result": None,
+            "created_at": now,
+            "updated_at": now,
+            **extra,
+        }
+        with self._lock:
+            self._jobs[job["id"]] = job
+            self._persist(job)
+        return job
+
+    def get(self, job_id):
+        """A copy of the job, safe to serialize while the job keeps running."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return json.loads(json.dumps(job)) if job else None
+
+    def list(self, limit=50):
+        with self._lock:
+            jobs = list(self._jobs.values())[-limit:]
+            return json.loads(json.dumps(jobs[::-1]))
+
+    def unfinished(self):
+        with self._lock:
+            return [job["id"] for job in self._jobs.values() if job["status"] not in FINISHED]
+
+    def update(self, job_id, **changes):
+        with self._lock:
+            job = self._jobs[job_id]
+            job.update(changes)
+            self._persist(job)
+
+    def start_stage(self, job_id, stage, total=None):
+        with self._lock:
+            job = self._jobs[job_id]
+            job["status"] = "running"
+            job["stage"] = stage
+            job["stages"][stage].update(status="running", done=0, total=total, started_at=time.time(), finished_at=None)
+            self._persist(job)
+
+    def progress(self, job_id, stage, done, total=None):
+        with self._lock:
+            job = self._jobs[job_id]
+            entry = job["stages"][stage]
+            entry["done"] = done
+            if total is not None:
+                entry["total"] = total
+            if time.time() - self._persisted_at.get(job_id, 0) >= PROGRESS_PERSIST_INTERVAL:
+                self._persist(job)
+
+    def finish_stage(self, job_id, stage, status="done", done=None, **counts):
+        with self._lock:
+            job = self._jobs[job_id]
+            entry = job["stages"][stage]
+            entry.update(status=status, finished_at=time.time(), **counts)
+            if done is not None:
+                entry["done"] = done
+            self._persist(job)
+
+    def stage_status(self, job_id, stage):
+        with self._lock:
+            return self._jobs[job_id]["stages"][stage]["status"]
+
+    def fail(self, job_id, error, errors=None, result=None):
+        with self._lock:
+            job = self._jobs[job_id]
+            stage = job["stage"]
+            if stage and job["stages"][stage]["status"] == "running":
+                job["stages"][stage].update(status="failed", finished_at=time.time())
+            job["status"] = "failed"
+            job["errors"] = errors if errors is not None else [error]
+            job["result"] = result or {"success": False, "message": error}
+            self._persist(job)
+            self._prune()
+
+    def succeed(self, job_id, result):
+        with self._lock:
+            job = self._jobs[job_id]
+            job["status"] = "succeeded"
+            job["result"] = result
+            self._persist(job)
+            self._prune()
@@ -0,0 +1,109 @@
+"""
+Local stand-in for the internal admin API, for exercising the product upload
+endpoints without the real service.
+
+    python internal_api_standin.py [--port 9100] [--latency 0.05]
+    INTERNAL_API_URL=http://localhost:9100/api/internal uvicorn main:app --port 8001
+
+Implements just what this app calls: /auth/login, /clients, /clients/{id} and
+/catalogues/upload. Uploads are validated like the real API does: the client
+must exist, and every CSV row needs its VTON image in the ZIP under
+garments/<id>/, otherwise the whole catalogue is rejected with a 400. --latency adds a fixed delay per request to
+make round-trips visible. GET /api/internal/_stats reports what was received.
+"""
+import argparse
+import csv
+import io
+import time
+import zipfile
+
+from fastapi import FastAPI, File, Form, Header, HTTPException, UploadFile
+
+TOKEN = "standin-token"
+CLIENTS = [
+    {"id": 1, "name": "Client One", "locations": [{"id": 11, "name": "Mumbai"}, {"id": 12, "name": "Pune"}]},
+    {"id": 2, "name": "Client Two", "locations": [{"id": 21, "name": "Delhi"}]},
+]
+
+app = FastAPI()
+LATENCY = 0.0
+STATS = {"requests": 0, "uploads": 0, "rejected": 0, "products": 0, "bytes": 0, "deflated_members": 0}
+
+
+def check_auth(authorization):
+    STATS["requests"] += 1
+    if LATENCY:
+        time.sleep(LATENCY)
+    if authorization != f"Bearer {TOKEN}":
+        raise HTTPException(status_code=401, detail="Invalid token")
+
+
+@app.post("/api/internal/auth/login")
+def login(body: dict):
+    STATS["requests"] += 1
+    return {"success": True, "data": {"token": TOKEN}}
+
+
+@app.get("/api/internal/clients")
+def clients(authorization: str = Header(None)):
+    check_auth(authorization)
+    return {"success": True, "data": [{"id": c["id"], "name": c["name"]} for c in CLIENTS]}
+
+
+@app.get("/api/internal/clients/{client_id}")
+def client_detail(client_id: int, authorization: str = Header(None)):
+    check_auth(authorization)
+    for c in CLIENTS:
+        if c["id"] == client_id:
+            return {"success": True, "data": c}
+    raise HTTPException(status_code=404, detail="Client not found")
+
+
+@app.post("/api/internal/catalogues/upload")
+def upload(
+    file: UploadFile = File(...),
+    images_zip: UploadFile = File(...),
+    client_id: str = Form(...),
+    location_ids: str = Form(None),
+    size_chart_unit: str = Form(None),
+    authorization: str = Header(None),
+):
+    check_auth(authorization)
+    if not any(str(c["id"]) == client_id for c in CLIENTS):
+        STATS["rejected"] += 1
+        raise HTTPException(status_code=400, detail={"message": f"Client {client_id} not found"})
+    rows = list(csv.DictReader(io.TextIOWrapper(file.file, encoding="utf-8")))
+    images_zip.file.seek(0, 2)
+    STATS["bytes"] += images_zip.file.tell()
+    images_zip.file.seek(0)
+    with zipfile.ZipFile(images_zip.file) as zf:
+        members = zf.infolist()
+        names = {m.filename for m in members}
+        STATS["deflated_members"] += sum(1 for m in members if m.compress_type != zipfile.ZIP_STORED)
+    errors = [
+        f"Row {i + 2}: Image {row['Vton Ready Image Filename']} not found for ID {row['id']}"
+        for i, row in enumerate(rows)
+        if f"garments/{row['id']}/{row['Vton Ready Image Filename']}" not in names
+    ]
+    if errors:
+        STATS["rejected"] += 1
+        raise HTTPException(status_code=400, detail={"message": "Validation failed", "errors": errors})
+    STATS["uploads"] += 1
+    STATS["products"] += len(rows)
+    return {"success": True, "data": {"client_id": client_id, "products_created": len(rows)}}
+
+
+@app.get("/api/internal/_stats")
+def stats():
+    return STATS
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every authenticated request")
+    args = parser.parse_args()
+    LATENCY = args.latency
+    uvicorn.run(app, host="127.0.0.1", port=args.port)
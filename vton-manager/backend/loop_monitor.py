@@ -0,0 +1,139 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+
+MAX_STACK = 20
+
+
+class LoopMonitor:
+    """
+    Measures event-loop lag and catches whatever blocks the loop.
+
+    A ticker task sleeps `interval` seconds in a loop; how late it wakes up is
+    the lag, i.e. how long some callback kept the loop busy. A watchdog thread
+    watches the ticker's heartbeat, and when it falls more than `threshold`
+    behind it grabs the loop thread's stack while the blocking call is still
+    running. The stack is matched against the route handlers (`routes`:
+    {code object: "METHOD /path"}), so each stall is attributed to the
+    endpoint that caused it. When the ticker finally wakes, the stall is
+    recorded with its duration.
+    """
+
+    def __init__(self, threshold=0.1, interval=0.05, app_dir=None, recent=100, samples=2000):
+        self.threshold = threshold
+        self.interval = interval
+        self.app_dir = app_dir
+        self.routes = {}
+        self._lags = deque(maxlen=samples)
+        self._recent = deque(maxlen=recent)
+        self._by_route = {}  # route (or where, for non-route code) -> aggregate
+        self._heartbeat = time.monotonic()
+        self._captured = None  # stack grabbed by the watchdog for the stall in progress
+        self._loop_thread = None
+        self._task = None
+        self._lock = threading.Lock()
+        self.started_at = None
+
+    def start(self, loop, routes=None):
+        self.routes = routes or {}
+        self._loop_thread = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self.started_at = time.time()
+        self._task = loop.create_task(self._tick())
+        threading.Thread(target=self._watch, daemon=True, name="loop-watchdog").start()
+
+    # ─── Loop side ─────────────────────────────────────────────────
+    async def _tick(self):
+        while True:
+            start = time.monotonic()
+            self._heartbeat = start
+            await asyncio.sleep(self.interval)
+            lag = time.monotonic() - start - self.interval
+            with self._lock:
+                self._lags.append(lag)
+                captured, self._captured = self._captured, None
+            if lag >= self.threshold:
+                self._record(lag, captured if captured and captured["beat"] == start else None)
+
+    def _record(self, lag, captured):
+        route = captured["route"] if captured else None
+        where = captured["where"] if captured else None
+        event = {
+            "at": time.time(),
+            "duration_ms": round(lag * 1000, 1),
+            "route": route,
+            "where": where,
+            "stack": captured["stack"] if captured else [],
+        }
+        key = route or where or "unknown (stall ended before it could be sampled)"
+        with self._lock:
+            self._recent.append(event)
+            agg = self._by_route.setdefault(key, {"count": 0, "total_ms": 0.0, "max_ms": 0.0, "last_stack": []})
+            agg["count"] += 1
+            agg["total_ms"] += event["duration_ms"]
+            if event["duration_ms"] >= agg["max_ms"]:
+                agg["max_ms"] = event["duration_ms"]
+                agg["last_stack"] = event["stack"]
+        print(f"Event loop blocked for {event['duration_ms']}ms by {key}")
+
+    # ─── Watchdog thread ───────────────────────────────────────────
+    def _watch(self):
+        sampled_beat = None
+        while True:
+            time.sleep(self.threshold / 4)
+            beat = self._heartbeat
+            if beat == sampled_beat or time.monotonic() - beat < self.interval + self.threshold:
+                continue
+            # One sample per stall, taken while the blocking call is still on the stack
+            sampled_beat = beat
+            frame = sys._current_frames().get(self._loop_thread)
+            if frame is None:
+                continue
+            captured = self._describe(frame)
+            captured["beat"] = beat
+            with self._lock:
+                self._captured = captured
+
+    def _describe(self, frame):
+        route = where = None
+        f = frame
+        while f is not None:
+            code = f.f_code
+            if route is None and code in self.routes:
+                route = self.routes[code]
+            # Innermost frame in our own code (not the standard library or site-packages)
+            if where is None and self.app_dir and os.path.abspath(code.co_filename).startswith(self.app_dir):
+                where = f"{os.path.basename(code.co_filename)}:{f.f_lineno} in {code.co_name}"
+            f = f.f_back
+        stack = [line.rstrip() for line in traceback.format_stack(frame)[-MAX_STACK:]]
+        return {"route": route, "where": where, "stack": stack}
+
+    # ─── Report ────────────────────────────────────────────────────
+    def report(self):
+        with self._lock:
+            lags = sorted(self._lags)
+            by_route = {key: {**agg, "total_ms": round(agg["total_ms"], 1)} for key, agg in self._by_route.items()}
+            recent = list(self._recent)[::-1]
+
+        def pct(p):
+            return round(lags[min(len(lags) - 1, int(len(lags) * p))] * 1000, 1) if lags else 0.0
+
+        return {
+            "threshold_ms": round(self.threshold * 1000, 1),
+            "lag_ms": {"p50": pct(0.5), "p99": pct(0.99), "max": pct(1.0), "samples": len(lags)},
+            # Worst offenders first
+            "blocking": dict(sorted(by_route.items(), key=lambda kv: kv[1]["total_ms"], reverse=True)),
+            "recent": recent,
+            "since": self.started_at,
+        }
+
+    def reset(self):
+        with self._lock:
+            self._lags.clear()
+            self._recent.clear()
+            self._by_route.clear()
+            self.started_at = time.time()
@@ -1,19 +1,40 @@
 import os
 import shutil
 import time
+import tempfile
+import threading
+import uuid
 from typing import List, Optional
-from fastapi import FastAPI, HTTPException, UploadFile, File, Form
+from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Request, Query
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from email.utils import formatdate, parsedate_to_datetime
 import pandas as pd
 import requests
 from pydantic import BaseModel
 import json
 import zipfile
-import io
-import boto3
-from botocore.exceptions import NoCredentialsError
+from catalogue_store import CatalogueStore, public_product, product_summary
+from catalogue_loader import IncrementalLoader, CatalogueWatcher, VTON_COLUMN
+from catalogue_writeback import CsvWriteBack
+from catalogue_search import CatalogueSearch, CursorExpired
+from catalogue_snapshot import CatalogueSnapshot
+from queue_store import QueueStore, item_dict
+from queue_events import QueueEventHub, sse
+from worker_pool import WorkerPool
+from inference import InferenceBatcher, infer_single
+from http_clients import UpstreamClient
+from result_cache import ResultCache, cache_key
+from s3_transfer import S3Transfer, summarize
+from ingest_jobs import JobStore
+from blob_gc import BlobGC
+from blob_store import BlobStore
+from ttl_cache import AsyncTTLCache
+from loop_monitor import LoopMonitor
+from catalogue_push import MultipartStream, product_row, write_catalogue, push_catalogue, push_batch, error_detail
+from zip_ingest import UploadSizeLimit, ZipRejected, spool_upload, extract_zip, FileIndex, validate_images, remove_tree
+from thumbnails import ThumbnailPipeline, THUMB_SIZES, DEFAULT_THUMB_SIZE, WEBP_SUPPORTED, thumb_name, parse_thumb_name, render_thumbnails
 
 app = FastAPI()
 
@@ -28,16 +49,46 @@ app.add_middleware(
 
 # Configuration
 ROOT_DIR = r"c:/Users/admin/Desktop/vton extractor"
+BLOB_DIR = "./blobs"  # crops, processed images and thumbnails, content-addressed
+# Flat folders used before the blob store; their files are moved into it on startup
 PROCESSED_DIR = "./processed_images"
 TEMP_CROP_DIR = "./temp_crops"
 INFERENCE_URL = "http://82.141.118.34:29894/infer"
+INFERENCE_WORKERS = int(os.environ.get("INFERENCE_WORKERS", "2"))  # concurrent inference requests
+INFERENCE_PARAMS = {'category': 'dress', 'seed': 42, 'steps': 10, 'cfg': 1.0}
+# Batching is off unless INFERENCE_BATCH_SIZE > 1
+INFERENCE_BATCH_SIZE = int(os.environ.get("INFERENCE_BATCH_SIZE", "1"))
+INFERENCE_BATCH_WAIT_MS = int(os.environ.get("INFERENCE_BATCH_WAIT_MS", "50"))
+INFERENCE_BATCH_URL = os.environ.get("INFERENCE_BATCH_URL", INFERENCE_URL + "_batch")
+HTTP_RETRIES = int(os.environ.get("HTTP_RETRIES", "2"))
+INTERNAL_API_POOL_SIZE = int(os.environ.get("INTERNAL_API_POOL_SIZE", "10"))
 THUMB_DIR = "./thumbnails"
-QUEUE_FILE = "queue_data.json"
-
-# Ensure directories exist
-os.makedirs(PROCESSED_DIR, exist_ok=True)
-os.makedirs(TEMP_CROP_DIR, exist_ok=True)
-os.makedirs(THUMB_DIR, exist_ok=True)
+THUMB_FORMATS = [f.strip() for f in os.environ.get("THUMB_FORMATS", "jpeg").split(",") if f.strip()]  # "jpeg", "webp"
+THUMB_WORKERS = int(os.environ.get("THUMB_WORKERS", "2"))
+# Catalogue ZIP upload limits
+MB = 1024 * 1024
+CATALOGUE_ZIP_MAX_BYTES = int(os.environ.get("CATALOGUE_ZIP_MAX_MB", "5120")) * MB
+CATALOGUE_ZIP_MAX_UNCOMPRESSED = int(os.environ.get("CATALOGUE_ZIP_MAX_UNCOMPRESSED_MB", "20480")) * MB
+CATALOGUE_ZIP_MAX_MEMBERS = int(os.environ.get("CATALOGUE_ZIP_MAX_MEMBERS", "100000"))
+CATALOGUE_ZIP_MAX_RATIO = int(os.environ.get("CATALOGUE_ZIP_MAX_RATIO", "100"))
+CATALOGUE_CSV_MAX_BYTES = int(os.environ.get("CATALOGUE_CSV_MAX_MB", "100")) * MB
+S3_BUCKET = os.environ.get("S3_BUCKET_NAME")
+S3_ENDPOINT_URL = os.environ.get("S3_ENDPOINT_URL")  # e.g. a local S3 stand-in
+S3_UPLOAD_WORKERS = int(os.environ.get("S3_UPLOAD_WORKERS", "8"))
+S3_MULTIPART_THRESHOLD = int(os.environ.get("S3_MULTIPART_THRESHOLD_MB", "16")) * MB
+S3_MULTIPART_CHUNKSIZE = int(os.environ.get("S3_MULTIPART_CHUNKSIZE_MB", "8")) * MB
+CATALOGUE_INGEST_CONCURRENCY = int(os.environ.get("CATALOGUE_INGEST_CONCURRENCY", "1"))  # catalogue upload jobs running at once
+INFERENCE_CACHE_DIR = "./inference_cache"
+INFERENCE_CACHE_MAX_BYTES = int(os.environ.get("INFERENCE_CACHE_MAX_MB", "2048")) * 1024 * 1024
+QUEUE_FILE = "queue_data.json"  # legacy JSON queue, migrated into QUEUE_DB_FILE on first start
+QUEUE_DB_FILE = "queue_data.db"
+CATALOGUE_SNAPSHOT_FILE = "catalogue_snapshot.db"
+INGEST_JOBS_DB_FILE = "ingest_jobs.db"
+INGEST_JOBS_RETENTION = int(os.environ.get("INGEST_JOBS_RETENTION_DAYS", "7")) * 24 * 3600  # finished jobs are forgotten after this
+INGEST_JOBS_MAX_FINISHED = int(os.environ.get("INGEST_JOBS_MAX_FINISHED", "500"))  # and beyond this many
+
+# Oversized catalogue uploads are refused before the form parser spools them to disk
+app.add_middleware(UploadSizeLimit, limits={"/catalogues/upload": CATALOGUE_ZIP_MAX_BYTES + CATALOGUE_CSV_MAX_BYTES})
 
 # Try to ensure ROOT_DIR exists
 if not os.path.exists(ROOT_DIR):
@@ -53,517 +104,977 @@ class QueueItem(BaseModel):
     processed_image_path: Optional[str] = None
     is_cropped: bool = False
 
-def load_queue_from_file():
-    if os.path.exists(QUEUE_FILE):
-        try:
-            with open(QUEUE_FILE, 'r') as f:
-                data = json.load(f)
-                return [QueueItem(**item) for item in data]
-        except Exception as e:
-            print(f"Failed to load queue: {e}")
-    return []
-
-def save_queue_to_file():
-    try:
-        data = [item.dict() for item in extraction_queue]
-        with open(QUEUE_FILE, 'w') as f:
-            json.dump(data, f, indent=2)
-    except Exception as e:
-        print(f"Failed to save queue: {e}")
-
-extraction_queue: List[QueueItem] = load_queue_from_file()
+QUEUE = QueueStore(QUEUE_DB_FILE, QueueItem, legacy_json=QUEUE_FILE)
+# Queue changes are pushed to /queue/stream subscribers as they happen
+QUEUE_EVENTS = QueueEventHub()
+QUEUE.listeners.append(QUEUE_EVENTS.publish)
+QUEUE_STREAM_KEEPALIVE = 15  # seconds between SSE keepalive comments
 
 class ProductUpdate(BaseModel):
     vton_image: str
 
 # Global Cache
-PRODUCTS_CACHE = []
-LAST_CACHE_UPDATE = 0
-CACHE_DURATION = 300 # 5 minutes
-
-def upload_file_to_s3(file_path, bucket_name, s3_key):
-    """Uploads a file to S3 if credentials are available."""
+CATALOGUE = CatalogueStore()
+CATALOGUE_PARSE_WORKERS = int(os.environ.get("CATALOGUE_PARSE_WORKERS", "0")) or None  # None = one per CPU (max 8)
+def open_catalogue_snapshot():
     try:
-        s3 = boto3.client('s3')
-        s3.upload_file(file_path, bucket_name, s3_key)
-        return f"https://{bucket_name}.s3.amazonaws.com/{s3_key}"
-    except NoCredentialsError:
-        print("S3 Credentials not available.")
-        return None
+        return CatalogueSnapshot(CATALOGUE_SNAPSHOT_FILE)
     except Exception as e:
-        print(f"S3 Upload Error: {e}")
+        print(f"Catalogue snapshot disabled: {e}")
         return None
 
+CATALOGUE_LOADER = IncrementalLoader(ROOT_DIR, CATALOGUE, workers=CATALOGUE_PARSE_WORKERS, snapshot=open_catalogue_snapshot())
+BLOBS = BlobStore(BLOB_DIR)
+THUMBNAILS = ThumbnailPipeline(BLOBS, formats=THUMB_FORMATS, workers=THUMB_WORKERS)
+
+def on_catalogue_change(changed, removed):
+    track_catalogue_refs(changed, removed)
+    # Re-index the changed catalogues here, in the loader's thread, rather than in the next search
+    CATALOGUE_SEARCH.refresh()
+    # New or edited catalogues get their thumbnails pre-generated in the background
+    for csv_path in changed:
+        THUMBNAILS.submit_products(CATALOGUE.by("source_csv", csv_path))
+
+CATALOGUE_LOADER.on_change = on_catalogue_change
+CATALOGUE_WRITEBACK_DELAY = float(os.environ.get("CATALOGUE_WRITEBACK_DELAY", "1.0"))  # seconds approvals are buffered before the CSV is rewritten
+CATALOGUE_WRITEBACK = CsvWriteBack(CATALOGUE_LOADER, delay=CATALOGUE_WRITEBACK_DELAY)
+LAST_CACHE_UPDATE = 0
+CACHE_DURATION = 300 # 5 minutes
+CATALOGUE_POLL_INTERVAL = int(os.environ.get("CATALOGUE_POLL_INTERVAL", "10"))  # seconds, 0 disables the watcher
+
+S3_TRANSFER = S3Transfer(
+    workers=S3_UPLOAD_WORKERS,
+    multipart_threshold=S3_MULTIPART_THRESHOLD,
+    multipart_chunksize=S3_MULTIPART_CHUNKSIZE,
+    endpoint_url=S3_ENDPOINT_URL,
+)
+
 # Helper to load all products
 def load_all_products(force_refresh=False):
-    global PRODUCTS_CACHE, LAST_CACHE_UPDATE
+    """
+    Return the catalogue, refreshing it if the TTL expired or on force_refresh.
+    Refreshes are incremental: only CSVs whose mtime/size changed are re-parsed.
+    """
+    global LAST_CACHE_UPDATE
     
     current_time = time.time()
-    if not force_refresh and PRODUCTS_CACHE and (current_time - LAST_CACHE_UPDATE < CACHE_DURATION):
-        return PRODUCTS_CACHE
+    if not force_refresh and LAST_CACHE_UPDATE and (current_time - LAST_CACHE_UPDATE < CACHE_DURATION):
+        return CATALOGUE.all()
         
-    print("Refreshing product cache...")
-    all_products = []
-    
-    if os.path.exists(ROOT_DIR):
-        for root, dirs, files in os.walk(ROOT_DIR):
-            csv_path = None
-            if "catalogue.csv" in files:
-                print(f"Found catalogue.csv in {root}")
-                csv_path = os.path.join(root, "catalogue.csv")
-            elif "catalogue - Sheet1.csv" in files:
-                print(f"Found catalogue - Sheet1.csv in {root}")
-                csv_path = os.path.join(root, "catalogue - Sheet1.csv")
-            
-            if csv_path:
-                # Check for "garment" or "garments" folder
-                garment_dir = os.path.join(root, "garment")
-                if not os.path.exists(garment_dir) and os.path.exists(os.path.join(root, "garments")):
-                    garment_dir = os.path.join(root, "garments")
-                
-                try:
-                    df = pd.read_csv(csv_path)
-                    # Helper to safely get a string field (NaN -> "")
-                    def safe_str(val, default=""):
-                        return str(val) if pd.notna(val) else default
-
-                    for _, row in df.iterrows():
-                        other_images = str(row.get('Other images filename', '')).split('; ') if pd.notna(row.get('Other images filename')) else []
-                        size_chart_raw = safe_str(row.get('size_chart'))
-                        all_products.append({
-                            "id": str(row['id']),
-                            "name": safe_str(row.get('Name')),
-                            "brand": safe_str(row.get('Brand')),
-                            "mrp": float(row['MRP']) if 'MRP' in row and pd.notna(row['MRP']) else 0.0,
-                            "discount_percent": float(row['Discount %']) if 'Discount %' in row and pd.notna(row['Discount %']) else 0.0,
-                            "category": safe_str(row.get('Category')),
-                            "sub_category": safe_str(row.get('Sub_Category')),
-                            "gender": safe_str(row.get('Gender')),
-                            "color": safe_str(row.get('Color')),
-                            "description": safe_str(row.get('Description')),
-                            "material_care": safe_str(row.get('Material Care')),
-                            "sizes": safe_str(row.get('sizes')),
-                            "thumbnail_image": safe_str(row.get('Thumbnail Image Filename')),
-                            "vton_image": safe_str(row.get('Vton Ready Image Filename'), None),
-                            "other_images": other_images,
-                            "size_chart": size_chart_raw,
-                            "_base_garment_dir": garment_dir,
-                            "_source_csv": csv_path
-                        })
-                except Exception as e:
-                    print(f"Error reading {csv_path}: {e}")
-                    continue
-    
-    PRODUCTS_CACHE = all_products
+    result = CATALOGUE_LOADER.refresh()
     LAST_CACHE_UPDATE = current_time
-    print(f"Cache refreshed. Found {len(all_products)} products.")
-    return all_products
+    if result["changed"] or result["removed"]:
+        print(f"Cache refreshed: {result['changed']} catalogues loaded, {result['removed']} removed. {len(CATALOGUE)} products.")
+    return CATALOGUE.all()
+
+def find_product(product_id):
+    """O(1) product lookup by id, refreshing the cache first if it has expired. Blocks; for worker threads."""
+    load_all_products()
+    return CATALOGUE.get(product_id)
+
+CATALOGUE_REFRESH = None  # background TTL refresh started by lookup_product, while it runs
+
+async def lookup_product(product_id):
+    """
+    find_product for async handlers. Answers from the store straight away (the
+    watcher keeps it current) and runs a due TTL refresh in a worker thread in
+    the background; only waits for it if nothing has been loaded yet.
+    """
+    global CATALOGUE_REFRESH
+    if time.time() - LAST_CACHE_UPDATE >= CACHE_DURATION:
+        if CATALOGUE_REFRESH is None or CATALOGUE_REFRESH.done():
+            CATALOGUE_REFRESH = spawn(asyncio.to_thread(load_all_products))
+        if not LAST_CACHE_UPDATE:
+            await asyncio.shield(CATALOGUE_REFRESH)
+    return CATALOGUE.get(product_id)
 
 import asyncio
 
-def cleanup_temp_files():
-    """Remove orphaned files from temp_crops, processed_images, and thumbnails."""
-    # Collect all filenames and product IDs still referenced by the queue
-    queue_crop_files = set()
-    queue_processed_files = set()
-    queue_product_ids = set()
-    for item in extraction_queue:
-        queue_crop_files.add(item.image_filename)
-        if item.processed_image_path:
-            queue_processed_files.add(item.processed_image_path)
-        queue_processed_files.add(f"processed_{item.product_id}_{item.image_filename}")
-        queue_product_ids.add(item.product_id)
-
-    # Collect all valid product IDs
-    products = load_all_products()
-    valid_product_ids = set(p['id'] for p in products)
-
-    cleaned = {"temp_crops": 0, "processed_images": 0, "thumbnails": 0}
-
-    # 1. Clean temp_crops — keep only files referenced by current queue items
-    if os.path.exists(TEMP_CROP_DIR):
-        for f in os.listdir(TEMP_CROP_DIR):
-            if f not in queue_crop_files:
-                try:
-                    os.remove(os.path.join(TEMP_CROP_DIR, f))
-                    cleaned["temp_crops"] += 1
-                except: pass
-
-    # 2. Clean processed_images — keep only files referenced by current queue items
-    if os.path.exists(PROCESSED_DIR):
-        for f in os.listdir(PROCESSED_DIR):
-            if f not in queue_processed_files:
-                try:
-                    os.remove(os.path.join(PROCESSED_DIR, f))
-                    cleaned["processed_images"] += 1
-                except: pass
-
-    # 3. Clean thumbnails — keep only thumbnails for valid products
-    if os.path.exists(THUMB_DIR):
-        for f in os.listdir(THUMB_DIR):
-            # Thumbnail filenames are: thumb_{product_id}_{original_filename}
-            # Extract product_id from the filename
-            if f.startswith("thumb_"):
-                parts = f[len("thumb_"):].split("_", 1)
-                product_id = parts[0] if parts else ""
-                if product_id and product_id not in valid_product_ids:
-                    try:
-                        os.remove(os.path.join(THUMB_DIR, f))
-                        cleaned["thumbnails"] += 1
-                    except: pass
-
-    total = sum(cleaned.values())
-    if total > 0:
-        print(f"Cleanup: removed {cleaned['temp_crops']} temp crops, {cleaned['processed_images']} processed images, {cleaned['thumbnails']} thumbnails")
-    return cleaned
+# The event loop only keeps weak references to tasks; hold fire-and-forget ones until they finish
+BACKGROUND_TASKS = set()
+
+def spawn(coro):
+    task = asyncio.create_task(coro)
+    BACKGROUND_TASKS.add(task)
+    task.add_done_callback(BACKGROUND_TASKS.discard)
+    return task
+
+# ─── Event Loop Monitor ────────────────────────────────────────────
+# Blocking work in an async handler stalls every other request. Lag is sampled
+# continuously; any stall over the threshold is logged and reported at
+# /admin/event-loop with the route and stack that caused it.
+LOOP_LAG_THRESHOLD_MS = int(os.environ.get("LOOP_LAG_THRESHOLD_MS", "100"))  # 0 turns the monitor off
+LOOP_MONITOR = LoopMonitor(
+    threshold=LOOP_LAG_THRESHOLD_MS / 1000,
+    app_dir=os.path.dirname(os.path.abspath(__file__)),
+)
+
+def route_labels():
+    """{handler code object: "METHOD /path"} for attributing stalls to endpoints."""
+    labels = {}
+    for route in app.routes:
+        endpoint = getattr(route, "endpoint", None)
+        if endpoint is not None and hasattr(endpoint, "__code__"):
+            labels[endpoint.__code__] = f"{','.join(sorted(getattr(route, 'methods', None) or ['WS']))} {route.path}"
+    return labels
+
+# ─── Derived File Cleanup ──────────────────────────────────────────
+# Queue items and catalogues register the crops, processed images and thumbnails
+# they use; blobs are deleted in the background once nothing references them,
+# with an occasional full pass over the store as a safety net.
+BLOB_GC_GRACE = int(os.environ.get("BLOB_GC_GRACE", "600"))  # seconds before an unreferenced new file may be removed
+BLOB_GC_RECONCILE_INTERVAL = int(os.environ.get("BLOB_GC_RECONCILE_INTERVAL", "3600"))  # seconds between full passes
+BLOB_GC = BlobGC(grace=BLOB_GC_GRACE, reconcile_interval=BLOB_GC_RECONCILE_INTERVAL)
+
+def remove_thumbnails(name, not_after):
+    product_id, filename = name
+    return sum(
+        BLOBS.remove("thumbnails", thumb_name(product_id, filename, size, fmt), not_after)
+        for size in THUMB_SIZES for fmt in ("jpeg", "webp")
+    )
+
+BLOB_GC.register("crops", lambda name, not_after: BLOBS.remove("crops", name, not_after), lambda: BLOBS.names("crops"))
+BLOB_GC.register("processed", lambda name, not_after: BLOBS.remove("processed", name, not_after), lambda: BLOBS.names("processed"))
+BLOB_GC.register("thumbnails", remove_thumbnails, lambda: ((parse_thumb_name(name), at) for name, at in BLOBS.names("thumbnails")))
+# Never referenced, so reconcile removes every blob file no name points at (e.g. left by a crash)
+BLOB_GC.register("orphans", BLOBS.remove_orphan, BLOBS.orphans)
+
+def queue_item_blobs(item):
+    product_id, filename = item["product_id"], item["image_filename"]
+    blobs = {
+        ("crops", filename),
+        ("processed", f"processed_{product_id}_{filename}"),
+        ("thumbnails", (product_id, filename)),
+    }
+    if item["processed_image_path"]:
+        blobs.add(("processed", item["processed_image_path"]))
+    return blobs
+
+def on_queue_event(event):
+    if event["type"] == "upsert":
+        item = event["item"]
+        BLOB_GC.set_refs(("queue", item["product_id"], item["image_filename"]), queue_item_blobs(item))
+    else:
+        BLOB_GC.set_refs(("queue", event["product_id"], event["image_filename"]), ())
+
+def track_catalogue_refs(changed, removed=()):
+    """Thumbnails are referenced by the catalogue that lists their image."""
+    for csv_path in changed:
+        BLOB_GC.set_refs(("catalogue", csv_path), {
+            ("thumbnails", (p["id"], filename))
+            for p in CATALOGUE.source_products(csv_path)
+            for filename in [p.get("thumbnail_image"), *p.get("other_images", [])] if filename
+        })
+    for csv_path in removed:
+        BLOB_GC.set_refs(("catalogue", csv_path), ())
+
+for queued in QUEUE.all():
+    on_queue_event({"type": "upsert", "item": item_dict(queued)})
+QUEUE.listeners.append(on_queue_event)
+
+def legacy_files(directory):
+    try:
+        with os.scandir(directory) as entries:
+            return [(entry.name, entry.path) for entry in entries if entry.is_file(follow_symlinks=False)]
+    except FileNotFoundError:
+        return []
+
+def migrate_legacy_files():
+    """Move files from the old flat temp_crops/processed_images/thumbnails folders into the blob store, then remove the folders."""
+    moved = 0
+    for directory, namespace in ((TEMP_CROP_DIR, "crops"), (PROCESSED_DIR, "processed")):
+        for name, path in legacy_files(directory):
+            BLOBS.put_file(namespace, name, path)
+            os.remove(path)
+            moved += 1
+    for size in THUMB_SIZES:
+        for name, path in legacy_files(os.path.join(THUMB_DIR, str(size))):
+            # thumb_{product_id}_{original_filename}, with .webp appended for WebP thumbnails
+            if name.startswith("thumb_"):
+                product_id, _, filename = name[len("thumb_"):].partition("_")
+                with open(path, "rb") as f:
+                    is_webp = f.read(12)[8:12] == b"WEBP"
+                if is_webp and filename.endswith(".webp"):
+                    filename = filename[:-len(".webp")]
+                BLOBS.put_file("thumbnails", thumb_name(product_id, filename, size, "webp" if is_webp else "jpeg"), path)
+                moved += 1
+            os.remove(path)
+    # Older single-size thumbnails at the top level are dropped; they're re-rendered on demand
+    for _, path in legacy_files(THUMB_DIR):
+        os.remove(path)
+    for directory in [os.path.join(THUMB_DIR, str(size)) for size in THUMB_SIZES] + [THUMB_DIR, TEMP_CROP_DIR, PROCESSED_DIR]:
+        try: os.rmdir(directory)
+        except OSError: pass
+    if moved:
+        print(f"Moved {moved} files from the old image folders into the blob store")
 
 @app.on_event("startup")
 async def startup_event():
-    load_all_products(force_refresh=True)
-    cleanup_temp_files()
-    asyncio.create_task(queue_worker())
-
-async def queue_worker():
-    print("Queue worker started.")
-    cleanup_counter = 0
-    while True:
-        await asyncio.sleep(3)
-        is_processing = any(item.status == "processing" for item in extraction_queue)
-        if is_processing: continue
-        
-        pending_item = next((item for item in extraction_queue if item.status == "pending"), None)
-        if pending_item:
-            print(f"Auto-processing: {pending_item.product_id}/{pending_item.image_filename}")
-            await asyncio.to_thread(do_process_item, pending_item)
-        
-        # Run cleanup every ~60 seconds (20 iterations × 3s sleep)
-        cleanup_counter += 1
-        if cleanup_counter >= 20:
-            cleanup_counter = 0
-            await asyncio.to_thread(cleanup_temp_files)
-
-def do_process_item(queue_item):
+    global LAST_CACHE_UPDATE
+    # Serve from the snapshot straight away, then reconcile it with disk in the background.
+    # Without a snapshot, the first request to need products does a normal full load.
+    loaded = CATALOGUE_LOADER.load_snapshot()
+    if loaded:
+        LAST_CACHE_UPDATE = time.time()
+        print(f"Loaded {len(CATALOGUE)} products from snapshot ({loaded} catalogues)")
+    if LOOP_LAG_THRESHOLD_MS > 0:
+        LOOP_MONITOR.start(asyncio.get_running_loop(), route_labels())
+    # Pending queue items may still point at crops in the old folders, so move them before any worker starts
+    await asyncio.to_thread(migrate_legacy_files)
+    spawn(verify_catalogue_on_startup())
+    QUEUE_EVENTS.bind(asyncio.get_running_loop())
+    start_queue_workers()
+    resume_ingest_jobs()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    CATALOGUE_WRITEBACK.flush_all()
+    THUMBNAILS.shutdown()
+    S3_TRANSFER.shutdown()
+
+async def verify_catalogue_on_startup():
+    await asyncio.to_thread(load_all_products, True)
+    # Catalogues loaded from the snapshot never went through on_catalogue_change;
+    # register their references before the collector may delete anything
+    await asyncio.to_thread(track_catalogue_refs, CATALOGUE.sources())
+    await asyncio.to_thread(CATALOGUE_SEARCH.refresh)
+    BLOB_GC.start()
+    # Catch up on thumbnails for anything that was loaded without them (e.g. from the snapshot)
+    THUMBNAILS.submit_products(CATALOGUE.all())
+    if CATALOGUE_POLL_INTERVAL > 0:
+        CatalogueWatcher(CATALOGUE_LOADER, poll_interval=CATALOGUE_POLL_INTERVAL).start()
+
+async def process_queue_item(queue_item, force=False):
+    # Skip items that were removed, or (for auto-processing) already handled, while they waited
+    if QUEUE.get(queue_item.product_id, queue_item.image_filename) is not queue_item:
+        return
+    if not force and queue_item.status != "pending":
+        return
+    print(f"Processing: {queue_item.product_id}/{queue_item.image_filename}")
+    if BATCHER is None:
+        await asyncio.to_thread(do_process_item, queue_item)
+        return
+    input_path = await asyncio.to_thread(start_processing, queue_item)
+    if input_path is None:
+        return
+    key, output = await asyncio.to_thread(cached_inference, input_path)
+    if output is None:
+        output = await BATCHER.infer(input_path, queue_item.image_filename)
+        await asyncio.to_thread(store_inference, key, output)
+    await asyncio.to_thread(finish_processing, queue_item, input_path, output)
+
+# One keep-alive connection pool per upstream. Inference gets a connection per concurrent request.
+INFERENCE_HTTP = UpstreamClient("inference", pool_size=max(INFERENCE_WORKERS, 1), retries=HTTP_RETRIES)
+INTERNAL_HTTP = UpstreamClient("internal_api", pool_size=INTERNAL_API_POOL_SIZE, retries=HTTP_RETRIES)
+
+BATCHER = None
+if INFERENCE_BATCH_SIZE > 1:
+    BATCHER = InferenceBatcher(INFERENCE_URL, INFERENCE_BATCH_URL, INFERENCE_PARAMS,
+                               max_batch=INFERENCE_BATCH_SIZE, max_wait_ms=INFERENCE_BATCH_WAIT_MS,
+                               http=INFERENCE_HTTP)
+
+# With batching on, enough workers must be waiting at once to fill a batch; they
+# mostly sit on the batcher's future rather than on a request of their own.
+WORKER_COUNT = INFERENCE_WORKERS * INFERENCE_BATCH_SIZE if BATCHER else INFERENCE_WORKERS
+WORKERS = WorkerPool(process_queue_item, size=WORKER_COUNT, name="inference worker")
+
+def schedule_item(queue_item, force=False):
+    return WORKERS.submit((queue_item.product_id, queue_item.image_filename), queue_item, force)
+
+def start_queue_workers():
+    WORKERS.start()
+    # Anything left "processing" by a previous run was interrupted mid-flight; run it again
+    for item in QUEUE.with_status("processing"):
+        QUEUE.update(item, status="pending")
+    for item in QUEUE.with_status("pending"):
+        schedule_item(item)
+
+def start_processing(queue_item):
+    """Mark an item processing and resolve its source image. Returns None (item failed) if missing."""
     product_id = queue_item.product_id
     filename = queue_item.image_filename
     
-    queue_item.status = "processing"
-    save_queue_to_file()
+    QUEUE.update(queue_item, status="processing")
     
-    input_path = None
-    temp_path = os.path.join(TEMP_CROP_DIR, filename)
-    if os.path.exists(temp_path):
-        input_path = temp_path
-    else:
-        products = load_all_products()
-        product = next((p for p in products if p['id'] == product_id), None)
+    input_path = BLOBS.path("crops", filename)
+    if input_path is None:
+        product = find_product(product_id)
         if not product:
-            queue_item.status = "failed"
-            save_queue_to_file()
+            QUEUE.update(queue_item, status="failed")
             print(f"Processing failed: Product {product_id} not found")
-            return
+            return None
         input_path = os.path.join(product['_base_garment_dir'], product_id, filename)
 
     if not os.path.exists(input_path):
-        queue_item.status = "failed"
-        save_queue_to_file()
+        QUEUE.update(queue_item, status="failed")
         print(f"Processing failed: Source file not found at {input_path}")
-        return
-
-    processed_filename = f"processed_{product_id}_{filename}"
-    output_path = os.path.join(PROCESSED_DIR, processed_filename)
+        return None
+    return input_path
 
+def finish_processing(queue_item, input_path, output):
+    """Store the inference output (or the original image if inference failed) and complete the item."""
+    processed_filename = f"processed_{queue_item.product_id}_{queue_item.image_filename}"
     try:
-        success = False
-        try:
-            with open(input_path, 'rb') as f:
-                content_type = 'image/png' if filename.endswith('.png') else 'image/jpeg'
-                files = {'image': (filename, f, content_type)}
-                data = {'category': 'dress', 'seed': 42, 'steps': 10, 'cfg': 1.0}
-                response = requests.post(INFERENCE_URL, files=files, data=data, timeout=120)
-                if response.status_code == 200:
-                    with open(output_path, 'wb') as out_f:
-                        out_f.write(response.content)
-                    success = True
-                else:
-                    print(f"Inference failed: {response.status_code} {response.text}")
-        except Exception as e:
-            print(f"Inference connection error: {e}")
-
-        if not success:
-            shutil.copy(input_path, output_path)
+        if output is not None:
+            BLOBS.put("processed", processed_filename, output)
+        else:
+            BLOBS.put_file("processed", processed_filename, input_path)
 
-        queue_item.status = "completed"
-        queue_item.processed_image_path = processed_filename
-        save_queue_to_file()
+        QUEUE.update(queue_item, status="completed", processed_image_path=processed_filename)
         print(f"Processing complete: {processed_filename}")
 
     except Exception as e:
-        queue_item.status = "failed"
-        save_queue_to_file()
+        QUEUE.update(queue_item, status="failed")
         print(f"Processing error: {e}")
 
-@app.get("/products")
-async def get_products(page: int = 1, limit: int = 30, pending_only: bool = False):
+RESULT_CACHE = ResultCache(INFERENCE_CACHE_DIR, INFERENCE_CACHE_MAX_BYTES)
+
+def cached_inference(input_path):
+    """Look up a previous inference result for these exact input bytes and params. Returns (key, output or None)."""
     try:
-        products = load_all_products()
-        if pending_only:
-            products = [p for p in products if not p.get('vton_image')]
-        start = (page - 1) * limit
-        end = start + limit
-        paginated_products = products[start:end]
-        response_products = []
-        for p in paginated_products:
-            p_copy = p.copy()
-            if '_base_garment_dir' in p_copy: del p_copy['_base_garment_dir']
-            if '_source_csv' in p_copy: del p_copy['_source_csv']
-            response_products.append(p_copy)
-        return {"total": len(products), "page": page, "limit": limit, "products": response_products}
+        key = cache_key(input_path, INFERENCE_PARAMS)
+        return key, RESULT_CACHE.get(key)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        print(f"Inference cache lookup failed: {e}")
+        return None, None
+
+def store_inference(key, output):
+    # Only real inference results are cached, never the copy-the-original fallback
+    if key is None or output is None:
+        return
+    try:
+        RESULT_CACHE.put(key, output)
+    except Exception as e:
+        print(f"Inference cache write failed: {e}")
+
+def do_process_item(queue_item):
+    input_path = start_processing(queue_item)
+    if input_path is None:
+        return
+    key, output = cached_inference(input_path)
+    if output is None:
+        output = infer_single(INFERENCE_URL, input_path, queue_item.image_filename, INFERENCE_PARAMS, http=INFERENCE_HTTP)
+        store_inference(key, output)
+    else:
+        print(f"Inference cache hit: {queue_item.product_id}/{queue_item.image_filename}")
+    finish_processing(queue_item, input_path, output)
+
+CATALOGUE_SEARCH = CatalogueSearch(CATALOGUE)
+PRODUCT_PAGE_LIMIT = 500
+
+@app.get("/products")
+async def get_products(
+    page: int = 1, limit: int = 30, pending_only: bool = False,
+    q: str = "", client: Optional[str] = None, category: Optional[str] = None,
+    gender: Optional[str] = None, brand: Optional[str] = None,
+    sort: str = "default", cursor: Optional[str] = None,
+):
+    """
+    A page of products. q is a word-prefix search over name/description; client,
+    category, gender and brand filter exactly (case-insensitive); sort is one of
+    default, mrp, discount, name, with a leading - for descending. Pass the
+    returned next_cursor to continue after the last product of the page, which
+    keeps its place even if the catalogue refreshes in between; page still
+    works as an offset.
+    """
+    await asyncio.to_thread(load_all_products)
+    limit = max(1, min(limit, PRODUCT_PAGE_LIMIT))
+    filters = {"client": client, "category": category, "gender": gender, "brand": brand}
+    try:
+        total, products, next_cursor = await asyncio.to_thread(
+            CATALOGUE_SEARCH.search, q, filters, pending_only, sort, limit,
+            offset=max(page - 1, 0) * limit, cursor=cursor,
+        )
+    except CursorExpired:
+        raise HTTPException(status_code=410, detail="Cursor expired, start the search again")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    # Products come pre-serialized from the search layer; just stitch the page together
+    head = json.dumps({"total": total, "page": page, "limit": limit, "next_cursor": next_cursor})[:-1]
+    body = head.encode() + b', "products": [' + b", ".join(products) + b"]}"
+    return Response(content=body, media_type="application/json")
+
+PRODUCT_BATCH_LIMIT = 500
+
+@app.get("/products/batch")
+async def get_products_batch(ids: List[str] = Query(...)):
+    """
+    Many products in one round-trip: ?ids=1,2,3 (or ?ids=1&ids=2).
+    Returns {"products": {id: product}, "missing": [ids not found]}.
+    """
+    wanted = list(dict.fromkeys(i.strip() for value in ids for i in value.split(",") if i.strip()))
+    if len(wanted) > PRODUCT_BATCH_LIMIT:
+        raise HTTPException(status_code=400, detail=f"At most {PRODUCT_BATCH_LIMIT} ids per request")
+    await asyncio.to_thread(load_all_products)
+    found = {}
+    missing = []
+    for product_id in wanted:
+        product = CATALOGUE.get(product_id)
+        if product:
+            found[product_id] = public_product(product)
+        else:
+            missing.append(product_id)
+    return {"products": found, "missing": missing}
 
 @app.get("/product/{product_id}")
 async def get_product(product_id: str):
     try:
-        products = load_all_products()
-        product = next((p for p in products if p['id'] == product_id), None)
+        product = await lookup_product(product_id)
         if not product: raise HTTPException(status_code=404, detail="Product not found")
-        p_copy = product.copy()
-        if '_base_garment_dir' in p_copy: del p_copy['_base_garment_dir']
-        if '_source_csv' in p_copy: del p_copy['_source_csv']
-        return p_copy
+        return public_product(product)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# ─── Image Endpoints ───────────────────────────────────────────────
+# Originals and thumbnails rarely change under the same URL, so browsers may keep them
+# for a week; processed images are overwritten on re-processing, so those are always
+# revalidated (a cheap 304 when unchanged).
+IMMUTABLE_CACHE = "public, max-age=604800"
+REVALIDATE_CACHE = "public, no-cache"
+
+def cached_file_response(request, path, media_type=None, cache_control=IMMUTABLE_CACHE, etag=None):
+    """FileResponse with ETag/Last-Modified, answering conditional requests with 304. Blob store files pass their digest as the ETag."""
+    stat = os.stat(path)
+    etag = f'"{etag}"' if etag else f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+    headers = {"ETag": etag, "Last-Modified": formatdate(stat.st_mtime, usegmt=True), "Cache-Control": cache_control}
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+        if etag in tags or "*" in tags:
+            return Response(status_code=304, headers=headers)
+    elif request.headers.get("if-modified-since"):
+        try:
+            if int(stat.st_mtime) <= parsedate_to_datetime(request.headers["if-modified-since"]).timestamp():
+                return Response(status_code=304, headers=headers)
+        except (TypeError, ValueError):
+            pass
+    return FileResponse(path, media_type=media_type, headers=headers, stat_result=stat)
+
 @app.get("/images/{product_id}/{filename}")
-async def get_image(product_id: str, filename: str):
-    temp_path = os.path.join(TEMP_CROP_DIR, filename)
-    if os.path.exists(temp_path): return FileResponse(temp_path)
-    products = load_all_products()
-    product = next((p for p in products if p['id'] == product_id), None)
+async def get_image(request: Request, product_id: str, filename: str):
+    crop_path = BLOBS.path("crops", filename)
+    if crop_path: return cached_file_response(request, crop_path, etag=BLOBS.digest("crops", filename))
+    product = await lookup_product(product_id)
     if not product: raise HTTPException(status_code=404, detail="Product not found")
     path = os.path.join(product['_base_garment_dir'], product_id, filename)
-    if os.path.exists(path): return FileResponse(path)
+    if os.path.exists(path): return cached_file_response(request, path)
     raise HTTPException(status_code=404, detail="Image not found")
 
-from PIL import Image
+# Thumbnail renders in flight, by thumbnail name, so concurrent misses share one render
+THUMB_RENDERS = {}
+
+def render_thumbnail(source_path, size, fmt, name):
+    for name, data in render_thumbnails(source_path, [(size, fmt, name)]):
+        BLOBS.put("thumbnails", name, data)
+
+async def render_thumbnail_once(source_path, size, fmt, name):
+    future = THUMB_RENDERS.get(name)
+    if future is None:
+        future = asyncio.ensure_future(asyncio.to_thread(render_thumbnail, source_path, size, fmt, name))
+        THUMB_RENDERS[name] = future
+        future.add_done_callback(lambda f: THUMB_RENDERS.pop(name, None))
+    # Shielded so a client disconnecting doesn't cancel the render other requests are waiting on
+    await asyncio.shield(future)
 
 @app.get("/thumbnail/{product_id}/{filename}")
-async def get_thumbnail(product_id: str, filename: str):
-    thumb_filename = f"thumb_{product_id}_{filename}"
-    thumb_path = os.path.join(THUMB_DIR, thumb_filename)
-    if os.path.exists(thumb_path): return FileResponse(thumb_path)
-    products = load_all_products()
-    product = next((p for p in products if p['id'] == product_id), None)
+async def get_thumbnail(request: Request, product_id: str, filename: str, size: int = DEFAULT_THUMB_SIZE, format: str = "jpeg"):
+    # Snap to a pre-generated size so arbitrary sizes can't fill the disk
+    size = min(THUMB_SIZES, key=lambda s: abs(s - size))
+    fmt = "webp" if format == "webp" and WEBP_SUPPORTED else "jpeg"
+    media_type = f"image/{fmt}"
+    name = thumb_name(product_id, filename, size, fmt)
+    path = BLOBS.path("thumbnails", name)
+    if path: return cached_file_response(request, path, media_type, etag=BLOBS.digest("thumbnails", name))
+    product = await lookup_product(product_id)
     if not product: raise HTTPException(status_code=404, detail="Product not found")
     original_path = os.path.join(product['_base_garment_dir'], product_id, filename)
     if not os.path.exists(original_path):
-        temp_path = os.path.join(TEMP_CROP_DIR, filename)
-        if os.path.exists(temp_path): original_path = temp_path
-        else: raise HTTPException(status_code=404, detail="Image not found")
+        original_path = BLOBS.path("crops", filename)
+        if not original_path: raise HTTPException(status_code=404, detail="Image not found")
+    # Not pre-generated yet: render just this one on demand, off the event loop
     try:
-        with Image.open(original_path) as img:
-            img.thumbnail((400, 400))
-            if img.mode in ("RGBA", "P"): img = img.convert("RGB")
-            img.save(thumb_path, "JPEG", quality=70)
-        return FileResponse(thumb_path)
+        await render_thumbnail_once(original_path, size, fmt, name)
+        return cached_file_response(request, BLOBS.path("thumbnails", name), media_type, etag=BLOBS.digest("thumbnails", name))
     except Exception as e:
         return FileResponse(original_path)
 
 @app.get("/processed-images/{filename}")
-async def get_processed_image(filename: str):
-    path = os.path.join(PROCESSED_DIR, filename)
-    if os.path.exists(path): return FileResponse(path)
+async def get_processed_image(request: Request, filename: str):
+    path = BLOBS.path("processed", filename)
+    if path: return cached_file_response(request, path, cache_control=REVALIDATE_CACHE, etag=BLOBS.digest("processed", filename))
     raise HTTPException(status_code=404, detail="Image not found")
 
 @app.post("/queue/add")
 async def add_to_queue(item: QueueItem):
-    for q_item in extraction_queue:
-        if q_item.product_id == item.product_id and q_item.image_filename == item.image_filename:
-             return {"message": "Already in queue", "queue": extraction_queue}
-    extraction_queue.append(item)
-    save_queue_to_file()
-    return {"message": "Added to queue", "queue": extraction_queue}
+    if not QUEUE.add(item):
+        return {"message": "Already in queue", "queue": QUEUE.all()}
+    if item.status == "pending":
+        schedule_item(item)
+    return {"message": "Added to queue", "queue": QUEUE.all()}
+
+def with_product_summaries(items):
+    """Queue item dicts with a slim "product" summary (None if the product is gone) attached to each."""
+    for item in items:
+        product = CATALOGUE.get(item["product_id"])
+        item["product"] = product_summary(product) if product else None
+    return items
 
 @app.get("/queue")
-async def get_queue():
-    return extraction_queue
+async def get_queue(response: Response, since: Optional[int] = None, with_products: bool = False):
+    """
+    The whole queue, or with ?since=<version> only what changed after that
+    version ({"version", "full", "items", "removed"}), or 304 if nothing did.
+    ?with_products=true embeds a product summary in every item.
+    """
+    if since is None:
+        response.headers["X-Queue-Version"] = str(QUEUE.version)
+        if with_products:
+            return with_product_summaries([item_dict(i) for i in QUEUE.all()])
+        return QUEUE.all()
+    if since == QUEUE.version:
+        return Response(status_code=304, headers={"X-Queue-Version": str(since)})
+    changes = QUEUE.changes_since(since)
+    if with_products:
+        with_product_summaries(changes["items"])
+    return changes
+
+@app.get("/queue/stream")
+async def stream_queue(request: Request, since: Optional[int] = None, with_products: bool = False):
+    """
+    Server-sent events: first a "sync" event (changes_since for ?since= or the
+    Last-Event-ID a reconnecting browser sends, else the full queue), then a
+    "change" event per upsert/remove as the workers and endpoints make them.
+    ?with_products=true embeds product summaries as GET /queue does.
+    """
+    last_event_id = request.headers.get("last-event-id")
+    if since is None and last_event_id and last_event_id.isdigit():
+        since = int(last_event_id)
+
+    async def events():
+        # Subscribe before taking the sync snapshot so nothing falls in between
+        subscription = QUEUE_EVENTS.subscribe()
+        try:
+            state = QUEUE.changes_since(since)
+            sent = state["version"]
+            if with_products:
+                with_product_summaries(state["items"])
+            yield sse("sync", state, sent)
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(subscription.get(), QUEUE_STREAM_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if event["type"] == "resync":
+                    state = QUEUE.changes_since(sent)
+                    sent = state["version"]
+                    if with_products:
+                        with_product_summaries(state["items"])
+                    yield sse("sync", state, sent)
+                elif event["version"] > sent:
+                    sent = event["version"]
+                    if with_products and event["type"] == "upsert":
+                        # Events are shared between subscribers; don't modify the original
+                        event = {**event, "item": with_product_summaries([dict(event["item"])])[0]}
+                    yield sse("change", event, sent)
+        finally:
+            QUEUE_EVENTS.unsubscribe(subscription)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.get("/http/stats")
+async def get_http_stats():
+    """Connection reuse and latency counters for each upstream."""
+    return {client.name: client.stats() for client in (INFERENCE_HTTP, INTERNAL_HTTP)}
+
+@app.get("/admin/catalogue-writeback")
+async def get_catalogue_writeback_stats():
+    return {**CATALOGUE_WRITEBACK.stats, "pending": CATALOGUE_WRITEBACK.pending()}
+
+@app.get("/admin/blob-gc")
+async def get_blob_gc_stats():
+    return {**BLOB_GC.stats, "reclaim_pending": BLOB_GC.pending(), "store": BLOBS.stats()}
+
+@app.post("/admin/blob-gc/reconcile")
+async def reconcile_blobs():
+    """Run the full directory pass now instead of waiting for the next scheduled one."""
+    removed = await asyncio.to_thread(BLOB_GC.reconcile)
+    return {"removed": removed}
+
+@app.get("/admin/s3")
+async def get_s3_stats():
+    return {"bucket": S3_BUCKET, "workers": S3_TRANSFER.workers, **S3_TRANSFER.stats}
+
+@app.get("/admin/inference-cache")
+async def get_inference_cache_stats():
+    return RESULT_CACHE.stats()
+
+@app.delete("/admin/inference-cache")
+async def invalidate_inference_cache(key: Optional[str] = None):
+    """Drop one cached result, or all of them (e.g. after the model changes)."""
+    removed = await asyncio.to_thread(RESULT_CACHE.invalidate, key)
+    return {"message": f"Removed {removed} cached results", "removed": removed}
+
+@app.get("/admin/event-loop")
+async def get_event_loop_report():
+    """Event-loop lag percentiles and the endpoints that blocked the loop, worst first."""
+    return {"enabled": LOOP_LAG_THRESHOLD_MS > 0, **LOOP_MONITOR.report()}
+
+@app.delete("/admin/event-loop")
+async def reset_event_loop_report():
+    LOOP_MONITOR.reset()
+    return {"message": "Event loop report cleared"}
+
+@app.get("/admin/thumbnails")
+async def get_thumbnail_stats():
+    return {**THUMBNAILS.stats, "sizes": THUMBNAILS.sizes, "formats": THUMBNAILS.formats}
+
+@app.get("/queue/workers")
+async def get_worker_stats():
+    stats = WORKERS.stats()
+    stats["stream_subscribers"] = len(QUEUE_EVENTS)
+    if BATCHER is not None:
+        stats["batching"] = {**BATCHER.stats, "batch_supported": BATCHER.batch_supported}
+    return stats
 
 @app.delete("/queue/approved")
 async def clear_approved():
-    global extraction_queue
-    approved_count = len([q for q in extraction_queue if q.status == "approved"])
-    extraction_queue = [q for q in extraction_queue if q.status != "approved"]
-    save_queue_to_file()
-    cleanup_temp_files()
+    # Their crops and processed images are released and removed in the background
+    approved_count = len(QUEUE.remove_with_status("approved"))
     return {"message": f"Cleared {approved_count} approved items", "cleared": approved_count}
 
 @app.delete("/queue/{product_id}/{filename}")
 async def delete_from_queue(product_id: str, filename: str):
-    global extraction_queue
-    initial_len = len(extraction_queue)
-    extraction_queue = [q for q in extraction_queue if not (q.product_id == product_id and q.image_filename == filename)]
-    if len(extraction_queue) < initial_len:
-        processed_filename = f"processed_{product_id}_{filename}"
-        processed_path = os.path.join(PROCESSED_DIR, processed_filename)
-        if os.path.exists(processed_path):
-            try: os.remove(processed_path)
-            except: pass
-        save_queue_to_file()
-        cleanup_temp_files()
+    if QUEUE.remove(product_id, filename):
         return {"message": "Removed from queue"}
     raise HTTPException(status_code=404, detail="Item not found")
 
 @app.post("/process/{product_id}/{filename}")
 async def process_image(product_id: str, filename: str):
-    queue_item = None
-    for item in extraction_queue:
-        if item.product_id == product_id and item.image_filename == filename:
-            queue_item = item
-            break
+    queue_item = QUEUE.get(product_id, filename)
     if not queue_item: raise HTTPException(status_code=404, detail="Item not found in queue")
-    await asyncio.to_thread(do_process_item, queue_item)
+    # Goes through the worker pool: if the item is already queued or running we just wait for that run
+    await schedule_item(queue_item, force=True)
     return {"message": "Processing complete"}
 
 @app.post("/upload-crop/{product_id}")
 async def upload_cropped_image(product_id: str, file: UploadFile = File(...)):
     try:
-        timestamp = int(time.time())
-        filename = f"cropped_{timestamp}.png"
-        file_path = os.path.join(TEMP_CROP_DIR, filename)
-        with open(file_path, "wb") as buffer: shutil.copyfileobj(file.file, buffer)
+        # Named after the content, so two crops can't collide and the same crop uploaded twice is stored once
+        digest = await asyncio.to_thread(BLOBS.write, file.file)
+        filename = f"cropped_{digest[:16]}.png"
+        BLOBS.link("crops", filename, digest)
+        # Kept while a queue item uses it; removed if none does within the grace period
+        BLOB_GC.track_new(("crops", filename))
         return {"filename": filename}
     except Exception as e: raise HTTPException(status_code=500, detail=str(e))
 
+class ApproveItem(BaseModel):
+    product_id: str
+    filename: str
+    processed_filename: str
+
+class BulkApproveRequest(BaseModel):
+    items: List[ApproveItem]
+
+def place_approved_image(product, product_id, processed_filename):
+    """Copy a processed image into the product's garment folder as its vton image. Returns (new_filename, dest_path)."""
+    source_path = BLOBS.path("processed", processed_filename)
+    new_filename = f"{product_id}_vton.png"
+    dest_path = os.path.join(product['_base_garment_dir'], product_id, new_filename)
+    if not source_path or not os.path.exists(source_path): raise FileNotFoundError("Processed image not found")
+    shutil.copy(source_path, dest_path)
+    return new_filename, dest_path
+
+def record_approval(product, product_id, filename, new_filename):
+    # The record is updated in memory right away; the CSV catches up on the
+    # write-back debounce, in one rewrite per file however many approvals land
+    CATALOGUE.set_vton_image(product, new_filename)
+    CATALOGUE_WRITEBACK.set(product['_source_csv'], product_id, VTON_COLUMN, new_filename)
+    queue_item = QUEUE.get(product_id, filename)
+    if queue_item:
+        QUEUE.update(queue_item, status="approved")
+
 @app.post("/approve/{product_id}/{filename}")
 async def approve_image(product_id: str, filename: str, processed_filename: str):
-    products = load_all_products()
-    product = next((p for p in products if p['id'] == product_id), None)
+    product = await lookup_product(product_id)
     if not product: raise HTTPException(status_code=404, detail="Product not found")
+    # The CSV is written later, so make sure now that it still has the row the approval will land in
+    if not await asyncio.to_thread(CATALOGUE_WRITEBACK.has_row, product['_source_csv'], product_id):
+        raise HTTPException(status_code=404, detail="Product not found in CSV")
 
-    source_path = os.path.join(PROCESSED_DIR, processed_filename)
-    new_filename = f"{product_id}_vton.png" 
-    dest_path = os.path.join(product['_base_garment_dir'], product_id, new_filename)
-    
-    if not os.path.exists(source_path): raise HTTPException(status_code=404, detail="Processed image not found")
-    shutil.copy(source_path, dest_path)
-    
-    # Try S3 upload for correct flow
-    s3_bucket = os.environ.get("S3_BUCKET_NAME")
-    if s3_bucket:
+    try:
+        new_filename, dest_path = await asyncio.to_thread(place_approved_image, product, product_id, processed_filename)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+    # Best effort S3 key; runs on the transfer pool so the event loop isn't blocked
+    s3_result = None
+    if S3_BUCKET:
+        s3_key = f"products/{product_id}/{new_filename}"
+        s3_result = await asyncio.wrap_future(S3_TRANSFER.submit(dest_path, S3_BUCKET, s3_key))
+
+    try:
+        record_approval(product, product_id, filename, new_filename)
+        return {"message": "Image approved and CSV updated", "vton_filename": new_filename, "s3": s3_result}
+    except Exception as e: raise HTTPException(status_code=500, detail=f"Failed to update CSV: {str(e)}")
+
+@app.post("/approve/bulk")
+async def approve_bulk(request: BulkApproveRequest):
+    """
+    Approve many queue items at once. Copies run in parallel, S3 uploads go
+    through the transfer pool together, and each affected catalogue CSV is
+    written once. A product has one vton image, so when several items share a
+    product id the last one wins and the earlier ones fail as superseded.
+    Returns a result per item, in request order.
+    """
+    results = [
+        {"product_id": item.product_id, "filename": item.filename, "status": "failed", "error": None, "vton_filename": None, "s3": None}
+        for item in request.items
+    ]
+    products = [await lookup_product(item.product_id) for item in request.items]
+    for result, product in zip(results, products):
+        if not product:
+            result["error"] = "Product not found"
+
+    def check_and_place(product, product_id, processed_filename):
+        if not CATALOGUE_WRITEBACK.has_row(product['_source_csv'], product_id):
+            raise LookupError("Product not found in CSV")
+        return place_approved_image(product, product_id, processed_filename)
+
+    async def place(i):
         try:
-            # Try to determine client_id/structure or just use a flat structure for now
-            # Best effort S3 key
-            s3_key = f"products/{product_id}/{new_filename}" 
-            upload_file_to_s3(dest_path, s3_bucket, s3_key)
+            return await asyncio.to_thread(check_and_place, products[i], request.items[i].product_id, request.items[i].processed_filename)
         except Exception as e:
-            print(f"S3 upload in approve failed: {e}")
+            results[i]["error"] = str(e)
+            return None
+    # Each product is placed once: its image file and S3 key are the same for every item
+    last = {request.items[i].product_id: i for i, product in enumerate(products) if product}
+    for i, product in enumerate(products):
+        if product and last[request.items[i].product_id] != i:
+            results[i]["error"] = "Superseded by a later item for the same product"
+    todo = sorted(last.values())
+    placed = dict(zip(todo, await asyncio.gather(*(place(i) for i in todo))))
+    placed = {i: p for i, p in placed.items() if p}
+
+    if S3_BUCKET and placed:
+        futures = {
+            i: asyncio.wrap_future(S3_TRANSFER.submit(dest_path, S3_BUCKET, f"products/{request.items[i].product_id}/{new_filename}"))
+            for i, (new_filename, dest_path) in placed.items()
+        }
+        for i, s3_result in zip(futures, await asyncio.gather(*futures.values())):
+            results[i]["s3"] = s3_result
 
+    touched = set()
+    for i, (new_filename, _) in placed.items():
+        item = request.items[i]
+        try:
+            record_approval(products[i], item.product_id, item.filename, new_filename)
+            touched.add(products[i]['_source_csv'])
+            results[i].update(status="approved", vton_filename=new_filename)
+        except Exception as e:
+            results[i]["error"] = f"Failed to update CSV: {e}"
+    # Write the affected catalogues now rather than on the debounce: one rewrite per CSV
+    for csv_path in touched:
+        await asyncio.to_thread(CATALOGUE_WRITEBACK.flush, csv_path)
+
+    approved = sum(1 for r in results if r["status"] == "approved")
+    return {"approved": approved, "failed": len(results) - approved, "catalogues_written": len(touched), "results": results}
+
+# ─── Catalogue Ingestion Jobs ──────────────────────────────────────
+# Uploads are spooled to disk inside the request, everything after that runs as a
+# background job: extract → index → validate → s3 → thumbnails → merge.
+INGEST_JOBS = JobStore(INGEST_JOBS_DB_FILE, retention=INGEST_JOBS_RETENTION, max_finished=INGEST_JOBS_MAX_FINISHED)
+INGEST_SLOTS = asyncio.Semaphore(max(1, CATALOGUE_INGEST_CONCURRENCY))
+REQUIRED_CATALOGUE_COLUMNS = ["id", "Name", "Category", "Gender", "Thumbnail Image Filename"]
+
+def ingest_paths(upload_dir):
+    """(csv_path, staging_csv_path, zip_path, extract_path) for an upload folder."""
+    csv_path = os.path.join(upload_dir, "catalogue.csv")
+    # The CSV keeps a temporary name until the job merges it, so the catalogue
+    # watcher never loads a half-ingested upload
+    return csv_path, csv_path + ".part", os.path.join(upload_dir, "images.zip.part"), os.path.join(upload_dir, "garment")
+
+async def run_ingest_job(job_id):
+    async with INGEST_SLOTS:
+        await asyncio.to_thread(ingest_catalogue, job_id)
+
+def spool_catalogue_csv(source, staging_csv_path):
+    """Copy the uploaded CSV into the upload folder and return its columns."""
+    with open(staging_csv_path, "wb") as f: shutil.copyfileobj(source, f)
+    return pd.read_csv(staging_csv_path, nrows=0).columns
+
+def resume_ingest_jobs():
+    """Pick up jobs a restart interrupted. Finished stages are skipped."""
+    for job_id in INGEST_JOBS.unfinished():
+        job = INGEST_JOBS.get(job_id)
+        if job["stages"]["spool"]["status"] != "done" or not os.path.isdir(job["upload_dir"]):
+            remove_tree(job["upload_dir"])
+            INGEST_JOBS.fail(job_id, "Upload was interrupted by a server restart, please upload again")
+            continue
+        print(f"Resuming catalogue ingestion job {job_id}")
+        INGEST_JOBS.update(job_id, status="queued")
+        spawn(run_ingest_job(job_id))
+
+def ingest_catalogue(job_id):
+    job = INGEST_JOBS.get(job_id)
+    client_id, upload_dir = job["client_id"], job["upload_dir"]
+    csv_path, staging_csv_path, zip_path, extract_path = ingest_paths(upload_dir)
+    done = lambda stage: INGEST_JOBS.stage_status(job_id, stage) == "done"
     try:
-        csv_path = product['_source_csv']
-        df = pd.read_csv(csv_path)
-        mask = df['id'].astype(str) == product_id
-        if not mask.any(): raise HTTPException(status_code=404, detail="Product not found in CSV")
-        df.loc[mask, 'Vton Ready Image Filename'] = new_filename
-        df.to_csv(csv_path, index=False)
-        for item in extraction_queue:
-            if item.product_id == product_id and item.image_filename == filename:
-                item.status = "approved"
-                save_queue_to_file()
-                break
+        file_index = FileIndex()
+        if not done("extract"):
+            with zipfile.ZipFile(zip_path) as zf:
+                total = sum(1 for m in zf.infolist() if not m.is_dir())
+            INGEST_JOBS.start_stage(job_id, "extract", total=total)
+            remove_tree(extract_path)
+            os.makedirs(extract_path, exist_ok=True)
+            def on_file(rel_path, abs_path):
+                # The filename index is built as files land, no second pass over the tree
+                file_index.add(rel_path, abs_path)
+                INGEST_JOBS.progress(job_id, "extract", len(file_index.by_rel_path))
+            extracted = extract_zip(
+                zip_path, extract_path,
+                CATALOGUE_ZIP_MAX_MEMBERS, CATALOGUE_ZIP_MAX_UNCOMPRESSED, CATALOGUE_ZIP_MAX_RATIO,
+                on_file,
+            )
+            INGEST_JOBS.finish_stage(job_id, "extract", done=extracted)
+        # Only drop the archive once the extract is recorded as done, so a restart
+        # in between re-extracts from it or finds it already gone with the stage done
+        if os.path.exists(zip_path):
+            os.remove(zip_path)
+        INGEST_JOBS.start_stage(job_id, "index")
+        if not file_index.by_rel_path:
+            # Resumed after a restart: the archive is gone, index the extracted tree instead
+            for root, _, files in os.walk(extract_path):
+                for name in files:
+                    path = os.path.join(root, name)
+                    file_index.add(os.path.relpath(path, extract_path), path)
+        INGEST_JOBS.finish_stage(
+            job_id, "index", done=len(file_index.by_rel_path), total=len(file_index.by_rel_path),
+            duplicate_names=len(file_index.duplicates),
+        )
+
+        df = pd.read_csv(staging_csv_path if os.path.exists(staging_csv_path) else csv_path)
+        INGEST_JOBS.start_stage(job_id, "validate", total=len(df))
+        validation_errors, validation_warnings, found_images = validate_images(df, file_index)
+        INGEST_JOBS.update(job_id, warnings=validation_warnings)
+        if validation_errors:
+            remove_tree(upload_dir)
+            INGEST_JOBS.fail(job_id, "Validation failed", errors=validation_errors, result={
+                "success": False,
+                "message": f"{len(validation_errors)} images referenced in the CSV are missing from the ZIP",
+                "validation_report": {
+                    "status": "failed",
+                    "total_rows": len(df),
+                    "valid_rows": len(df) - len(validation_errors),
+                    "errors": validation_errors,
+                    "warnings": validation_warnings
+                }
+            })
+            return
+        INGEST_JOBS.finish_stage(job_id, "validate", done=len(df))
+
+        s3_report = None
+        if S3_BUCKET:
+            uploads = [
+                (found_path, S3_BUCKET, f"clients/{client_id}/products/{product_id}/{image_filename}")
+                for product_id, image_filename, found_path in found_images
+            ]
+            INGEST_JOBS.start_stage(job_id, "s3", total=len(uploads))
+            finished = [0]
+            def on_result(result):
+                finished[0] += 1
+                INGEST_JOBS.progress(job_id, "s3", finished[0])
+            s3_report = summarize(S3_TRANSFER.upload_many(uploads, on_result=on_result))
+            INGEST_JOBS.finish_stage(
+                job_id, "s3", done=finished[0],
+                uploaded=s3_report["uploaded"], skipped=s3_report["skipped"], failed=s3_report["failed"],
+            )
+        else:
+            INGEST_JOBS.finish_stage(job_id, "s3", status="skipped")
+
+        # Rendering carries on in the thumbnail pool; this stage only queues the work
+        INGEST_JOBS.start_stage(job_id, "thumbnails", total=len(found_images))
+        THUMBNAILS.submit(found_images)
+        INGEST_JOBS.finish_stage(job_id, "thumbnails", done=len(found_images))
+
+        INGEST_JOBS.start_stage(job_id, "merge", total=len(df))
+        if os.path.exists(staging_csv_path):
+            os.replace(staging_csv_path, csv_path)
         load_all_products(force_refresh=True)
-        return {"message": "Image approved and CSV updated", "vton_filename": new_filename}
-    except Exception as e: raise HTTPException(status_code=500, detail=f"Failed to update CSV: {str(e)}")
+        INGEST_JOBS.finish_stage(job_id, "merge", done=len(df))
+        INGEST_JOBS.succeed(job_id, {
+            "success": True,
+            "message": f"Successfully uploaded {len(df)} products",
+            "products_processed": len(df),
+            "validation_report": { "status": "completed", "total_rows": len(df), "valid_rows": len(df), "errors": [], "warnings": validation_warnings },
+            "s3_upload": s3_report
+        })
+    except zipfile.BadZipFile:
+        remove_tree(upload_dir)
+        INGEST_JOBS.fail(job_id, "Invalid ZIP file")
+    except ZipRejected as e:
+        remove_tree(upload_dir)
+        INGEST_JOBS.fail(job_id, str(e))
+    except Exception as e:
+        print(f"Catalogue ingestion job {job_id} failed: {e}")
+        remove_tree(upload_dir)
+        INGEST_JOBS.fail(job_id, str(e))
 
-@app.post("/catalogues/upload")
+@app.post("/catalogues/upload", status_code=202)
 async def upload_catalogue(
     client_id: int = Form(...),
     location_ids: Optional[str] = Form(None),
     file: UploadFile = File(...),
     images_zip: UploadFile = File(...)
 ):
-    upload_id = str(int(time.time()))
+    job_id = uuid.uuid4().hex
+    upload_id = f"{int(time.time())}_{job_id[:8]}"
     upload_rel_path = f"client_{client_id}/upload_{upload_id}"
     upload_dir = os.path.join(ROOT_DIR, upload_rel_path)
     os.makedirs(upload_dir, exist_ok=True)
-    
-    csv_filename = "catalogue.csv"
-    csv_path = os.path.join(upload_dir, csv_filename)
-    with open(csv_path, "wb") as f: shutil.copyfileobj(file.file, f)
-        
+    csv_path, staging_csv_path, zip_path, _ = ingest_paths(upload_dir)
+
+    INGEST_JOBS.create(job_id, client_id, upload_dir, upload_id=upload_id, location_ids=location_ids)
+    INGEST_JOBS.start_stage(job_id, "spool")
     try:
-        zip_content = await images_zip.read()
-        zip_file = zipfile.ZipFile(io.BytesIO(zip_content))
-        extract_path = os.path.join(upload_dir, "garment")
-        os.makedirs(extract_path, exist_ok=True)
-        zip_file.extractall(extract_path)
-        
-        # Handle "garments" subfolder from zip
-        extracted_items = os.listdir(extract_path)
-        if len(extracted_items) == 1 and extracted_items[0].lower() == 'garments' and os.path.isdir(os.path.join(extract_path, extracted_items[0])):
-            nested_dir = os.path.join(extract_path, extracted_items[0])
-            for item in os.listdir(nested_dir):
-                shutil.move(os.path.join(nested_dir, item), extract_path)
-            os.rmdir(nested_dir)
-            
-        df = pd.read_csv(csv_path)
-        required_columns = ["id", "Name", "Category", "Gender", "Thumbnail Image Filename"]
-        missing_cols = [col for col in required_columns if col not in df.columns]
+        columns = await asyncio.to_thread(spool_catalogue_csv, file.file, staging_csv_path)
+        missing_cols = [col for col in REQUIRED_CATALOGUE_COLUMNS if col not in columns]
         if missing_cols:
-            shutil.rmtree(upload_dir)
             raise HTTPException(status_code=400, detail=f"Missing required columns: {missing_cols}")
+        # Spool the archive to disk in chunks; extraction happens in the job
+        spooled = await asyncio.to_thread(spool_upload, images_zip.file, zip_path, CATALOGUE_ZIP_MAX_BYTES)
+        if not await asyncio.to_thread(zipfile.is_zipfile, zip_path):
+            raise HTTPException(status_code=400, detail="Invalid ZIP file")
+        INGEST_JOBS.finish_stage(job_id, "spool", done=spooled, total=spooled)
+    except (ZipRejected, HTTPException) as e:
+        await asyncio.to_thread(remove_tree, upload_dir)
+        detail = e.detail if isinstance(e, HTTPException) else str(e)
+        INGEST_JOBS.fail(job_id, detail)
+        raise HTTPException(status_code=getattr(e, "status_code", 400), detail=detail)
+    except Exception as e:
+        await asyncio.to_thread(remove_tree, upload_dir)
+        INGEST_JOBS.fail(job_id, str(e))
+        raise HTTPException(status_code=500, detail=str(e))
 
-        validation_errors = []
-        s3_bucket = os.environ.get("S3_BUCKET_NAME")
-        do_s3_upload = s3_bucket is not None
-        
-        # Helper to check image
-        # Assuming zip extracted structure: extract_path/garments/SKU...
-        # So we search recursively
-        
-        for idx, row in df.iterrows():
-            product_id = str(row['id'])
-            for img_col in ['Thumbnail Image Filename', 'Vton Ready Image Filename']: 
-                if img_col in row and pd.notna(row[img_col]):
-                    image_filename = row[img_col]
-                    found_path = None
-                    for root, dirs, files in os.walk(extract_path):
-                         if image_filename in files:
-                             found_path = os.path.join(root, image_filename)
-                             break
-                    if not found_path:
-                        validation_errors.append(f"Row {idx+1}: Image {image_filename} not found for ID {product_id}")
-                    elif do_s3_upload:
-                         try:
-                             s3_key = f"clients/{client_id}/products/{product_id}/{image_filename}"
-                             upload_file_to_s3(found_path, s3_bucket, s3_key)
-                         except: pass
+    INGEST_JOBS.update(job_id, status="queued")
+    spawn(run_ingest_job(job_id))
+    return {"success": True, "job_id": job_id, "status": "queued", "status_url": f"/catalogues/jobs/{job_id}"}
 
-        if validation_errors:
-            shutil.rmtree(upload_dir)
-            return {
-                "success": False,
-                "validation_report": {
-                    "status": "failed",
-                    "total_rows": len(df),
-                    "valid_rows": len(df) - len(validation_errors),
-                    "errors": validation_errors
-                }
-            }
-            
-        load_all_products(force_refresh=True)
-        return {
-            "success": True,
-            "message": f"Successfully uploaded {len(df)} products",
-            "products_processed": len(df),
-            "validation_report": { "status": "completed", "total_rows": len(df), "valid_rows": len(df), "errors": [] }
-        }
+@app.get("/catalogues/jobs")
+async def list_catalogue_jobs(limit: int = 50):
+    return INGEST_JOBS.list(limit)
+
+@app.get("/catalogues/jobs/{job_id}")
+async def get_catalogue_job(job_id: str):
+    job = INGEST_JOBS.get(job_id)
+    if not job: raise HTTPException(status_code=404, detail="Job not found")
+    return job
 
-    except zipfile.BadZipFile:
-        shutil.rmtree(upload_dir)
-        raise HTTPException(status_code=400, detail="Invalid ZIP file")
-    except Exception as e:
-        if os.path.exists(upload_dir): shutil.rmtree(upload_dir)
-        raise HTTPException(status_code=500, detail=str(e))
 # ─── Client & Location Proxy Endpoints ─────────────────────────────
 # These proxy to the internal admin API for client/location data
 INTERNAL_API_URL = os.environ.get("INTERNAL_API_URL", "http://35.154.214.159:8000/api/internal")
@@ -572,57 +1083,71 @@ INTERNAL_API_PASSWORD = os.environ.get("INTERNAL_API_PASSWORD", "adminpassword")
 
 # Token cache
 _internal_api_token = os.environ.get("INTERNAL_API_TOKEN", "")
-_token_fetched_at = 0
+_token_fetched_at = 0  # 0 = never logged in, -1 = rejected, log in again
 _TOKEN_LIFETIME = 6 * 60 * 60  # Refresh every 6 hours
+# Held while logging in, so concurrent callers (and concurrent 401s) share one login
+_token_lock = threading.Lock()
+
+def _token_valid(current_time):
+    return _internal_api_token and _token_fetched_at > 0 and current_time - _token_fetched_at < _TOKEN_LIFETIME
 
 def get_internal_token():
     """Get API token, auto-login if needed."""
     global _internal_api_token, _token_fetched_at
-    
-    current_time = time.time()
-    
+
     # Use cached token if still valid
-    if _internal_api_token and (current_time - _token_fetched_at < _TOKEN_LIFETIME):
+    if _token_valid(time.time()):
         return _internal_api_token
-    
-    # If we have a static token from env and never logged in, use it
-    if _internal_api_token and _token_fetched_at == 0:
-        _token_fetched_at = current_time
-        return _internal_api_token
-    
-    # Try to login
-    if not INTERNAL_API_PASSWORD:
-        print("Warning: INTERNAL_API_PASSWORD not set, cannot auto-login to internal API")
-        return _internal_api_token
-    
-    try:
-        print(f"Logging in to internal API as {INTERNAL_API_EMAIL}...")
-        resp = requests.post(
-            f"{INTERNAL_API_URL}/auth/login",
-            json={"email": INTERNAL_API_EMAIL, "password": INTERNAL_API_PASSWORD},
-            timeout=15
-        )
-        if resp.status_code == 200:
-            data = resp.json()
-            token = data.get("data", {}).get("token", "")
-            if token:
-                _internal_api_token = token
-                _token_fetched_at = current_time
-                print("Successfully logged in to internal API")
-                return token
+
+    with _token_lock:
+        current_time = time.time()
+        # Another thread may have logged in while we waited
+        if _token_valid(current_time):
+            return _internal_api_token
+
+        # If we have a static token from env and never logged in, use it
+        if _internal_api_token and _token_fetched_at == 0:
+            _token_fetched_at = current_time
+            return _internal_api_token
+
+        # Try to login
+        if not INTERNAL_API_PASSWORD:
+            print("Warning: INTERNAL_API_PASSWORD not set, cannot auto-login to internal API")
+            return _internal_api_token
+
+        try:
+            print(f"Logging in to internal API as {INTERNAL_API_EMAIL}...")
+            resp = INTERNAL_HTTP.post(
+                f"{INTERNAL_API_URL}/auth/login",
+                json={"email": INTERNAL_API_EMAIL, "password": INTERNAL_API_PASSWORD},
+                timeout=15
+            )
+            if resp.status_code == 200:
+                data = resp.json()
+                token = data.get("data", {}).get("token", "")
+                if token:
+                    _internal_api_token = token
+                    _token_fetched_at = current_time
+                    print("Successfully logged in to internal API")
+                    return token
+                else:
+                    print(f"Login response missing token: {data}")
             else:
-                print(f"Login response missing token: {data}")
-        else:
-            print(f"Internal API login failed: {resp.status_code} - {resp.text[:200]}")
-    except Exception as e:
-        print(f"Internal API login error: {e}")
-    
-    return _internal_api_token
+                print(f"Internal API login failed: {resp.status_code} - {resp.text[:200]}")
+        except Exception as e:
+            print(f"Internal API login error: {e}")
 
-def refresh_token_on_401():
-    """Force re-login on next call."""
+        return _internal_api_token
+
+def refresh_token_on_401(token=None):
+    """
+    Force re-login on next call. Pass the token that was rejected: if another
+    caller already replaced it, nothing happens, so a burst of 401s logs in once.
+    """
     global _token_fetched_at
-    _token_fetched_at = 0
+    with _token_lock:
+        if token is None or token == _internal_api_token:
+            _token_fetched_at = -1
 
 def get_internal_headers():
     token = get_internal_token()
@@ -631,20 +1156,54 @@ def get_internal_headers():
         headers["Authorization"] = f"Bearer {token}"
     return headers
 
+def internal_get(path):
+    """GET from the internal API (blocking), re-logging in once if the token was rejected."""
+    for attempt in range(2):
+        headers = get_internal_headers()
+        resp = INTERNAL_HTTP.get(f"{INTERNAL_API_URL}{path}", headers=headers, timeout=15)
+        if resp.status_code != 401 or attempt:
+            return resp
+        refresh_token_on_401(headers.get("Authorization", "").removeprefix("Bearer "))
+
+# Clients and locations rarely change: serve them from memory, refreshing in the background
+INTERNAL_CACHE_TTL = int(os.environ.get("INTERNAL_CACHE_TTL", "300"))  # seconds a cached list is fresh
+INTERNAL_CACHE_STALE_TTL = int(os.environ.get("INTERNAL_CACHE_STALE_TTL", "3600"))  # further seconds it is served while refreshing
+INTERNAL_CACHE = AsyncTTLCache(ttl=INTERNAL_CACHE_TTL, stale_ttl=INTERNAL_CACHE_STALE_TTL)
+
+class UpstreamError(Exception):
+    def __init__(self, status_code, detail):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+def fetch_clients():
+    resp = internal_get("/clients")
+    if resp.status_code == 200:
+        data = resp.json()
+        # The internal API wraps in {"success": true, "data": [...]}
+        if isinstance(data, dict) and "data" in data:
+            return data["data"]
+        return data
+    print(f"Internal API /clients error: {resp.status_code} {resp.text}")
+    raise UpstreamError(resp.status_code, "Failed to fetch clients from internal API")
+
+def fetch_client_locations(client_id):
+    resp = internal_get(f"/clients/{client_id}")
+    if resp.status_code == 200:
+        data = resp.json()
+        # Extract locations from client detail response
+        client_data = data.get("data", data) if isinstance(data, dict) else data
+        return client_data.get("locations", []) if isinstance(client_data, dict) else []
+    print(f"Internal API /clients/{client_id} error: {resp.status_code}")
+    raise UpstreamError(resp.status_code, "Failed to fetch client locations")
+
 @app.get("/clients")
 async def list_clients():
     """Proxy: List all clients from internal API."""
     try:
-        resp = requests.get(f"{INTERNAL_API_URL}/clients", headers=get_internal_headers(), timeout=15)
-        if resp.status_code == 200:
-            data = resp.json()
-            # The internal API wraps in {"success": true, "data": [...]}
-            if isinstance(data, dict) and "data" in data:
-                return data["data"]
-            return data
-        else:
-            print(f"Internal API /clients error: {resp.status_code} {resp.text}")
-            raise HTTPException(status_code=resp.status_code, detail="Failed to fetch clients from internal API")
+        return await INTERNAL_CACHE.get("clients", lambda: asyncio.to_thread(fetch_clients))
+    except UpstreamError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
     except requests.exceptions.ConnectionError:
         print("Cannot connect to internal API - returning empty list")
         return []
@@ -656,16 +1215,9 @@ async def list_clients():
 async def list_client_locations(client_id: int):
     """Proxy: Get locations for a specific client from internal API."""
     try:
-        resp = requests.get(f"{INTERNAL_API_URL}/clients/{client_id}", headers=get_internal_headers(), timeout=15)
-        if resp.status_code == 200:
-            data = resp.json()
-            # Extract locations from client detail response
-            client_data = data.get("data", data) if isinstance(data, dict) else data
-            locations = client_data.get("locations", []) if isinstance(client_data, dict) else []
-            return locations
-        else:
-            print(f"Internal API /clients/{client_id} error: {resp.status_code}")
-            raise HTTPException(status_code=resp.status_code, detail="Failed to fetch client locations")
+        return await INTERNAL_CACHE.get(("locations", client_id), lambda: asyncio.to_thread(fetch_client_locations, client_id))
+    except UpstreamError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
     except requests.exceptions.ConnectionError:
         print("Cannot connect to internal API - returning empty locations")
         return []
@@ -673,7 +1225,83 @@ async def list_client_locations(client_id: int):
         print("Internal API timeout")
         return []
 
-# ─── Single Product Upload to Internal API ─────────────────────────
+@app.get("/admin/internal-cache")
+async def get_internal_cache_stats():
+    return {**INTERNAL_CACHE.stats, "ttl": INTERNAL_CACHE.ttl, "stale_ttl": INTERNAL_CACHE.stale_ttl}
+
+@app.delete("/admin/internal-cache")
+async def invalidate_internal_cache():
+    """Forget cached clients and locations, e.g. right after adding a client."""
+    return {"removed": INTERNAL_CACHE.invalidate()}
+
+# ─── Product Upload to Internal API ────────────────────────────────
+# Products are sent as a catalogue (CSV + images ZIP) to the internal API's
+# /catalogues/upload. Both files are written to disk and streamed from there.
+INTERNAL_PUSH_SPOOL_DIR = "./push_spool"
+INTERNAL_PUSH_MAX_PRODUCTS = int(os.environ.get("INTERNAL_PUSH_MAX_PRODUCTS", "200"))  # products per upload request
+INTERNAL_PUSH_MAX_BYTES = int(os.environ.get("INTERNAL_PUSH_MAX_MB", "256")) * MB  # image bytes per upload request
+INTERNAL_PUSH_TIMEOUT = int(os.environ.get("INTERNAL_PUSH_TIMEOUT", "600"))  # seconds to wait for one upload's response
+
+def push_entry(product_data, processed_filename=None, custom_location=None, size_chart=None, size_chart_unit=None):
+    """
+    Resolve a product's images and build its catalogue row. Raises LookupError
+    if there is no VTON image for it.
+    """
+    product_id = str(product_data["id"])
+
+    # Find the processed VTON image, else the approved one in the garment dir
+    processed_path = BLOBS.path("processed", processed_filename) if processed_filename else None
+    local_product = find_product(product_id)
+    vton_filename = f"{product_id}_vton.png"
+
+    if processed_path and os.path.exists(processed_path):
+        image_source = processed_path
+    elif local_product:
+        approved_path = os.path.join(local_product['_base_garment_dir'], product_id, vton_filename)
+        if os.path.exists(approved_path):
+            image_source = approved_path
+        else:
+            raise LookupError(f"No VTON image found for product {product_id}")
+    else:
+        raise LookupError(f"Product {product_id} not found and no processed image available")
+
+    images = [(image_source, f"garments/{product_id}/{vton_filename}")]
+    # Use the existing thumbnail if available
+    thumb_filename = local_product.get('thumbnail_image', '') if local_product else ''
+    if local_product and thumb_filename and thumb_filename != vton_filename:
+        thumb_source = os.path.join(local_product['_base_garment_dir'], product_id, thumb_filename)
+        if os.path.exists(thumb_source):
+            images.append((thumb_source, f"garments/{product_id}/{thumb_filename}"))
+
+    row = product_row(product_data, vton_filename, thumb_filename, custom_location, size_chart, size_chart_unit)
+    return {"product_id": product_id, "row": row, "images": images}
+
+def internal_catalogue_sender(fields):
+    """send(csv_path, zip_path) for push_catalogue: one streamed upload, re-logging in once on a 401."""
+    def send(csv_path, zip_path):
+        for attempt in range(2):
+            body = MultipartStream(fields, [
+                ("file", "catalogue.csv", csv_path, "text/csv"),
+                ("images_zip", "images.zip", zip_path, "application/zip"),
+            ])
+            headers = {"Content-Type": body.content_type}
+            token = get_internal_token()
+            if token:
+                headers["Authorization"] = f"Bearer {token}"
+            resp = INTERNAL_HTTP.post(f"{INTERNAL_API_URL}/catalogues/upload", data=body, headers=headers, timeout=INTERNAL_PUSH_TIMEOUT)
+            if resp.status_code != 401 or attempt:
+                return resp
+            refresh_token_on_401(token)
+    return send
+
+def upload_form_fields(client_id, location_ids=None, custom_location=None, size_chart_unit=None):
+    data = {'client_id': str(client_id)}
+    if location_ids and not custom_location:
+        data['location_ids'] = ','.join(str(lid) for lid in location_ids)
+    if size_chart_unit:
+        data['size_chart_unit'] = size_chart_unit
+    return data
+
 @app.post("/catalogue/upload-single")
 async def upload_single_product(body: dict):
     """
@@ -695,121 +1323,18 @@ async def upload_single_product(body: dict):
         raise HTTPException(status_code=400, detail="product.id is required")
 
     product_id = str(product_data["id"])
-
-    # Find the processed VTON image
-    processed_path = os.path.join(PROCESSED_DIR, processed_filename) if processed_filename else None
-    
-    # Also try the approved image in the garment dir
-    products = load_all_products()
-    local_product = next((p for p in products if p['id'] == product_id), None)
-    vton_filename = f"{product_id}_vton.png"
-    
-    if processed_path and os.path.exists(processed_path):
-        image_source = processed_path
-    elif local_product:
-        approved_path = os.path.join(local_product['_base_garment_dir'], product_id, vton_filename)
-        if os.path.exists(approved_path):
-            image_source = approved_path
-        else:
-            raise HTTPException(status_code=404, detail=f"No VTON image found for product {product_id}")
-    else:
-        raise HTTPException(status_code=404, detail=f"Product {product_id} not found and no processed image available")
-
-    # Use the existing thumbnail if available
-    thumb_filename = local_product.get('thumbnail_image', '') if local_product else ''
-    thumb_source = None
-    if local_product and thumb_filename:
-        thumb_path = os.path.join(local_product['_base_garment_dir'], product_id, thumb_filename)
-        if os.path.exists(thumb_path):
-            thumb_source = thumb_path
-
-    # --- Build 1-row CSV ---
-    csv_columns = ["id", "Name", "Brand", "MRP", "Discount %", "Category", "Gender",
-                    "Color", "sizes", "Thumbnail Image Filename", "Vton Ready Image Filename"]
-    
-    # Add optional columns if data present
-    if product_data.get("description"):
-        csv_columns.append("Description")
-    if product_data.get("material_care"):
-        csv_columns.append("Material Care")
-    if custom_location:
-        csv_columns.append("locations")
-    if size_chart:
-        csv_columns.append("size_chart")
-    if size_chart_unit and not size_chart:
-        pass  # No size chart data, skip unit too
-    elif size_chart_unit:
-        csv_columns.append("size_chart_unit")
-
-    row_values = {
-        "id": product_id,
-        "Name": product_data.get("name", ""),
-        "Brand": product_data.get("brand", ""),
-        "MRP": str(product_data.get("mrp", 0)),
-        "Discount %": str(product_data.get("discount_percent", 0)),
-        "Category": product_data.get("category", ""),
-        "Gender": product_data.get("gender", ""),
-        "Color": product_data.get("color", ""),
-        "sizes": product_data.get("sizes", ""),
-        "Thumbnail Image Filename": thumb_filename or vton_filename,
-        "Vton Ready Image Filename": vton_filename,
-    }
-    if product_data.get("description"):
-        row_values["Description"] = product_data["description"]
-    if product_data.get("material_care"):
-        row_values["Material Care"] = product_data["material_care"]
-    if custom_location:
-        row_values["locations"] = custom_location
-    if size_chart:
-        import json as json_module
-        row_values["size_chart"] = json_module.dumps(size_chart)
-    if size_chart_unit and size_chart:
-        row_values["size_chart_unit"] = size_chart_unit
-
-    # Build CSV string
-    import csv as csv_module
-    csv_buffer = io.StringIO()
-    writer = csv_module.DictWriter(csv_buffer, fieldnames=csv_columns)
-    writer.writeheader()
-    writer.writerow(row_values)
-    csv_content = csv_buffer.getvalue().encode('utf-8')
-
-    # --- Build ZIP with product images ---
-    zip_buffer = io.BytesIO()
-    with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zf:
-        # Add VTON image: garments/{product_id}/vton_filename
-        zf.write(image_source, f"garments/{product_id}/{vton_filename}")
-        # Add thumbnail if different and available
-        if thumb_source and thumb_filename and thumb_filename != vton_filename:
-            zf.write(thumb_source, f"garments/{product_id}/{thumb_filename}")
-    zip_buffer.seek(0)
+    try:
+        entry = await asyncio.to_thread(push_entry, product_data, processed_filename, custom_location, size_chart, size_chart_unit)
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
 
     # --- POST to internal API ---
+    send = internal_catalogue_sender(upload_form_fields(client_id, location_ids, custom_location, size_chart_unit if size_chart else None))
+    os.makedirs(INTERNAL_PUSH_SPOOL_DIR, exist_ok=True)
+    directory = tempfile.mkdtemp(prefix="push_", dir=INTERNAL_PUSH_SPOOL_DIR)
     try:
-        files = {
-            'file': ('catalogue.csv', csv_content, 'text/csv'),
-            'images_zip': ('images.zip', zip_buffer.getvalue(), 'application/zip'),
-        }
-        data = {
-            'client_id': str(client_id),
-        }
-        if location_ids and not custom_location:
-            data['location_ids'] = ','.join(str(lid) for lid in location_ids)
-        if size_chart_unit and size_chart:
-            data['size_chart_unit'] = size_chart_unit
-
-        headers = {}
-        token = get_internal_token()
-        if token:
-            headers["Authorization"] = f"Bearer {token}"
-
-        resp = requests.post(
-            f"{INTERNAL_API_URL}/catalogues/upload",
-            files=files,
-            data=data,
-            headers=headers,
-            timeout=120
-        )
+        csv_path, zip_path = await asyncio.to_thread(write_catalogue, [entry], directory)
+        resp = await asyncio.to_thread(send, csv_path, zip_path)
 
         if resp.status_code == 200:
             result = resp.json()
@@ -820,13 +1345,7 @@ async def upload_single_product(body: dict):
                 "internal_response": result
             }
         else:
-            error_detail = "Upload failed"
-            try:
-                error_data = resp.json()
-                error_detail = error_data.get("detail", error_data.get("message", str(error_data)))
-            except:
-                error_detail = resp.text[:500]
-            raise HTTPException(status_code=resp.status_code, detail=error_detail)
+            raise HTTPException(status_code=resp.status_code, detail=error_detail(resp))
 
     except requests.exceptions.ConnectionError:
         raise HTTPException(status_code=503, detail="Cannot connect to internal API. Check INTERNAL_API_URL configuration.")
@@ -836,6 +1355,50 @@ async def upload_single_product(body: dict):
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+class PushProduct(BaseModel):
+    product: dict
+    processed_filename: Optional[str] = None
+    size_chart: Optional[list] = None
+    size_chart_unit: Optional[str] = None
+
+class BatchPushRequest(BaseModel):
+    client_id: int
+    location_ids: Optional[List[int]] = None
+    custom_location: Optional[str] = None
+    products: List[PushProduct]
+
+@app.post("/catalogue/upload-batch")
+async def upload_product_batch(request: BatchPushRequest):
+    """
+    Upload many products to the internal catalogue API in as few requests as
+    INTERNAL_PUSH_MAX_PRODUCTS / INTERNAL_PUSH_MAX_MB allow. Returns an
+    outcome per product, in request order.
+    """
+    # The form-level unit only applies if every product with a chart agrees on it
+    units = {item.size_chart_unit for item in request.products if item.size_chart and item.size_chart_unit}
+    send = internal_catalogue_sender(upload_form_fields(
+        request.client_id, request.location_ids, request.custom_location, units.pop() if len(units) == 1 else None,
+    ))
+    products = [(str(item.product.get("id") or ""), item) for item in request.products]
+    # Image lookups hit the disk once per product, so resolving runs off the event loop too
+    outcomes, responses = await asyncio.to_thread(
+        push_batch,
+        products,
+        lambda item: push_entry(item.product, item.processed_filename, request.custom_location, item.size_chart, item.size_chart_unit),
+        lambda entries: push_catalogue(send, entries, INTERNAL_PUSH_SPOOL_DIR, INTERNAL_PUSH_MAX_PRODUCTS, INTERNAL_PUSH_MAX_BYTES),
+    )
+    results = [{"product_id": product_id, **outcome} for (product_id, _), outcome in zip(products, outcomes)]
+    uploaded = sum(1 for r in results if r["status"] == "uploaded")
+    return {
+        "uploaded": uploaded,
+        "failed": len(results) - uploaded,
+        "requests": len(responses),
+        "results": results,
+        "internal_responses": responses,
+    }
 
 if __name__ == "__main__":
     import uvicorn
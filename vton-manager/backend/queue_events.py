@@ -0,0 +1,57 @@
+import asyncio
+import json
+
+
+class QueueEventHub:
+    """
+    Fans QueueStore change events out to asyncio subscribers (one per SSE
+    connection). publish() is safe to call from any thread; events are handed
+    to the event loop and queued per subscriber. A subscriber that falls more
+    than `backlog` events behind gets its backlog replaced with a single
+    {"type": "resync"} so it re-reads the queue instead of slowing everyone down.
+    """
+
+    def __init__(self, backlog=1000):
+        self.backlog = backlog
+        self._loop = None
+        self._subscribers = set()
+
+    def bind(self, loop):
+        self._loop = loop
+
+    def publish(self, event):
+        loop = self._loop
+        if loop is None or not self._subscribers:
+            return
+        try:
+            loop.call_soon_threadsafe(self._dispatch, event)
+        except RuntimeError:
+            pass  # loop closed during shutdown
+
+    def _dispatch(self, event):
+        for queue in list(self._subscribers):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait({"type": "resync"})
+
+    def subscribe(self):
+        queue = asyncio.Queue(maxsize=self.backlog)
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue):
+        self._subscribers.discard(queue)
+
+    def __len__(self):
+        return len(self._subscribers)
+
+
+def sse(event, data, event_id=None):
+    """One server-sent event frame."""
+    frame = f"event: {event}\n"
+    if event_id is not None:
+        frame += f"id: {event_id}\n"
+    return frame + f"data: {json.dumps(data)}\n\n"
@@ -0,0 +1,225 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+QUEUE_FIELDS = ("product_id", "image_filename", "status", "processed_image_path", "is_cropped")
+MAX_TOMBSTONES = 10000
+
+
+def item_dict(item):
+    return {field: getattr(item, field) for field in QUEUE_FIELDS}
+
+
+class QueueStore:
+    """
+    Extraction queue backed by SQLite in WAL mode.
+
+    Every mutation is a single-row statement in its own transaction, so cost
+    doesn't grow with the queue and a crash can't leave a half-written file.
+    Items are also kept in memory (in queue order) with a per-status index,
+    which is what the endpoints and the worker read from. Each change bumps
+    `version` and is passed to `listeners`, and changes_since() answers
+    "what changed after version N" for delta polling.
+    """
+
+    def __init__(self, db_path, item_cls, legacy_json=None):
+        self.db_path = db_path
+        self.item_cls = item_cls
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS queue ("
+            " seq INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " product_id TEXT NOT NULL,"
+            " image_filename TEXT NOT NULL,"
+            " status TEXT NOT NULL,"
+            " processed_image_path TEXT,"
+            " is_cropped INTEGER NOT NULL DEFAULT 0,"
+            " UNIQUE (product_id, image_filename))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS queue_status ON queue (status)")
+        self._conn.commit()
+
+        self._items = {}      # (product_id, image_filename) -> item, in queue order
+        self._by_status = {}  # status -> ordered set of keys
+        # Every mutation bumps the version. Versions start from the boot time in ms,
+        # so they keep increasing across restarts and a client's old version is
+        # always below `_floor` (which forces a full resync).
+        self.version = int(time.time() * 1000)
+        self._floor = self.version
+        self._versions = {}   # key -> version of its last change, oldest change first
+        self._removed = {}    # key -> version it was removed at, oldest first
+        self.listeners = []   # callables(event), called on every change from whichever thread made it
+        if legacy_json:
+            self._migrate_json(legacy_json)
+        self._load()
+
+    def _migrate_json(self, path):
+        """Import an old queue_data.json once, then move it out of the way."""
+        if not os.path.exists(path):
+            return
+        try:
+            with open(path, 'r') as f:
+                data = json.load(f)
+            with self._conn:
+                for raw in data:
+                    item = self.item_cls(**raw)
+                    self._conn.execute(
+                        "INSERT OR IGNORE INTO queue (product_id, image_filename, status, processed_image_path, is_cropped)"
+                        " VALUES (?, ?, ?, ?, ?)",
+                        (item.product_id, item.image_filename, item.status, item.processed_image_path, int(item.is_cropped)),
+                    )
+            os.replace(path, path + ".migrated")
+            print(f"Migrated {len(data)} queue items from {path}")
+        except Exception as e:
+            print(f"Failed to migrate queue from {path}: {e}")
+
+    def _load(self):
+        rows = self._conn.execute(
+            "SELECT product_id, image_filename, status, processed_image_path, is_cropped FROM queue ORDER BY seq"
+        ).fetchall()
+        for product_id, image_filename, status, processed_image_path, is_cropped in rows:
+            item = self.item_cls(
+                product_id=product_id, image_filename=image_filename, status=status,
+                processed_image_path=processed_image_path, is_cropped=bool(is_cropped),
+            )
+            self._remember(item)
+
+    def _remember(self, item):
+        key = (item.product_id, item.image_filename)
+        self._items[key] = item
+        self._by_status.setdefault(item.status, {})[key] = None
+        self._versions[key] = self.version
+
+    def _forget(self, item):
+        key = (item.product_id, item.image_filename)
+        self._items.pop(key, None)
+        keys = self._by_status.get(item.status)
+        if keys is not None:
+            keys.pop(key, None)
+        self._versions.pop(key, None)
+        self.version += 1
+        self._removed[key] = self.version
+        if len(self._removed) > MAX_TOMBSTONES:
+            # Deltas older than the oldest tombstone we still hold can't be answered any more
+            oldest = next(iter(self._removed))
+            self._floor = self._removed.pop(oldest)
+        self._emit({"type": "remove", "version": self.version, "product_id": key[0], "image_filename": key[1]})
+
+    def _touch(self, item):
+        key = (item.product_id, item.image_filename)
+        self.version += 1
+        self._versions.pop(key, None)
+        self._versions[key] = self.version
+        self._removed.pop(key, None)
+        self._emit({"type": "upsert", "version": self.version, "item": item_dict(item)})
+
+    def _emit(self, event):
+        for listener in self.listeners:
+            try:
+                listener(event)
+            except Exception as e:
+                print(f"Queue listener failed: {e}")
+
+    def changes_since(self, since=None):
+        """
+        What changed after version `since`:
+        {"version", "full", "items": [...], "removed": [{"product_id", "image_filename"}]}.
+        Without a usable `since` (None, from before a restart, or older than the
+        tombstones we keep) the whole queue comes back with full=True.
+        """
+        with self._lock:
+            if since is None or since < self._floor or since > self.version:
+                return {"version": self.version, "full": True, "items": [item_dict(i) for i in self._items.values()], "removed": []}
+            items = []
+            for key in reversed(self._versions):
+                if self._versions[key] <= since:
+                    break
+                items.append(item_dict(self._items[key]))
+            removed = []
+            for key in reversed(self._removed):
+                if self._removed[key] <= since:
+                    break
+                removed.append({"product_id": key[0], "image_filename": key[1]})
+            return {"version": self.version, "full": False, "items": items[::-1], "removed": removed[::-1]}
+
+    # ─── Reads ─────────────────────────────────────────────────────
+    def all(self):
+        with self._lock:
+            return list(self._items.values())
+
+    def get(self, product_id, image_filename):
+        return self._items.get((product_id, image_filename))
+
+    def with_status(self, status):
+        with self._lock:
+            return [self._items[k] for k in self._by_status.get(status, ())]
+
+    def __len__(self):
+        return len(self._items)
+
+    # ─── Writes ────────────────────────────────────────────────────
+    def add(self, item):
+        """Append an item. Returns False if (product_id, image_filename) is already queued."""
+        with self._lock:
+            if (item.product_id, item.image_filename) in self._items:
+                return False
+            with self._conn:
+                self._conn.execute(
+                    "INSERT INTO queue (product_id, image_filename, status, processed_image_path, is_cropped)"
+                    " VALUES (?, ?, ?, ?, ?)",
+                    (item.product_id, item.image_filename, item.status, item.processed_image_path, int(item.is_cropped)),
+                )
+            self._remember(item)
+            self._touch(item)
+            return True
+
+    def update(self, item, **changes):
+        """Set fields on a queued item and persist just that row."""
+        with self._lock:
+            key = (item.product_id, item.image_filename)
+            if self._items.get(key) is not item:
+                # Item was removed from the queue meanwhile; nothing to persist
+                for field, value in changes.items():
+                    setattr(item, field, value)
+                return
+            old_status = item.status
+            for field, value in changes.items():
+                setattr(item, field, value)
+            with self._conn:
+                self._conn.execute(
+                    "UPDATE queue SET status = ?, processed_image_path = ?, is_cropped = ?"
+                    " WHERE product_id = ? AND image_filename = ?",
+                    (item.status, item.processed_image_path, int(item.is_cropped), item.product_id, item.image_filename),
+                )
+            if item.status != old_status:
+                self._by_status.get(old_status, {}).pop(key, None)
+                self._by_status.setdefault(item.status, {})[key] = None
+            self._touch(item)
+
+    def remove(self, product_id, image_filename):
+        """Remove one item. Returns the removed item, or None if it wasn't queued."""
+        with self._lock:
+            item = self._items.get((product_id, image_filename))
+            if item is None:
+                return None
+            with self._conn:
+                self._conn.execute(
+                    "DELETE FROM queue WHERE product_id = ? AND image_filename = ?", (product_id, image_filename)
+                )
+            self._forget(item)
+            return item
+
+    def remove_with_status(self, status):
+        """Remove every item with the given status. Returns the removed items."""
+        with self._lock:
+            items = self.with_status(status)
+            with self._conn:
+                self._conn.execute("DELETE FROM queue WHERE status = ?", (status,))
+            for item in items:
+                self._forget(item)
+            return items
@@ -0,0 +1,139 @@
+import hashlib
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+from botocore.exceptions import ClientError, NoCredentialsError
+from s3transfer.utils import ChunksizeAdjuster
+
+MB = 1024 * 1024
+
+
+def local_etag(path, size, multipart_threshold, chunk_size):
+    """
+    The ETag S3 would give this file if uploaded by boto3 with these transfer
+    settings: the plain MD5 below multipart_threshold, otherwise the MD5 of the
+    part MD5s followed by "-<parts>". The chunk size is adjusted the way boto3
+    does it, so very large files match too.
+    """
+    if size < multipart_threshold:
+        h = hashlib.md5()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(MB), b""):
+                h.update(chunk)
+        return h.hexdigest()
+    chunk_size = ChunksizeAdjuster().adjust_chunksize(chunk_size, size)
+    digests = []
+    with open(path, 'rb') as f:
+        for part in iter(lambda: f.read(chunk_size), b""):
+            digests.append(hashlib.md5(part).digest())
+    return f"{hashlib.md5(b''.join(digests)).hexdigest()}-{len(digests)}"
+
+
+class S3Transfer:
+    """
+    Shared S3 upload engine.
+
+    One boto3 client (thread-safe, created on first use) serves a bounded pool
+    of `workers` concurrent uploads. Files over `multipart_threshold` go up in
+    `multipart_chunksize` parts. Unless forced, an upload is skipped when the
+    object already in the bucket has the same size and ETag.
+
+    Every upload produces a result dict:
+    {"key", "path", "status": "uploaded" | "skipped" | "failed", "bytes", "error"}.
+    """
+
+    def __init__(self, workers=8, multipart_threshold=16 * MB, multipart_chunksize=8 * MB,
+                 part_concurrency=4, endpoint_url=None, client=None):
+        self.workers = workers
+        self.multipart_chunksize = multipart_chunksize
+        self.endpoint_url = endpoint_url
+        self.transfer_config = TransferConfig(
+            multipart_threshold=multipart_threshold,
+            multipart_chunksize=multipart_chunksize,
+            max_concurrency=part_concurrency,
+        )
+        self._client = client
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="s3-upload")
+        self.stats = {"uploaded": 0, "skipped": 0, "failed": 0, "bytes": 0, "seconds": 0.0}
+
+    @property
+    def client(self):
+        with self._lock:
+            if self._client is None:
+                # Enough connections for every worker plus the part threads of the multipart ones
+                pool = self.workers * max(self.transfer_config.max_request_concurrency, 1)
+                self._client = boto3.client(
+                    's3',
+                    endpoint_url=self.endpoint_url,
+                    config=Config(max_pool_connections=pool, retries={"max_attempts": 5, "mode": "adaptive"}),
+                )
+            return self._client
+
+    def _unchanged(self, path, size, bucket, key):
+        try:
+            head = self.client.head_object(Bucket=bucket, Key=key)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+        if head.get("ContentLength") != size:
+            return False
+        return head.get("ETag", "").strip('"') == local_etag(path, size, self.transfer_config.multipart_threshold, self.multipart_chunksize)
+
+    def upload(self, path, bucket, key, force=False):
+        """Upload one file and return its result dict. Never raises."""
+        result = {"key": key, "path": path, "status": "failed", "bytes": 0, "error": None}
+        start = time.perf_counter()
+        try:
+            size = os.path.getsize(path)
+            if not force and self._unchanged(path, size, bucket, key):
+                result["status"] = "skipped"
+            else:
+                self.client.upload_file(path, bucket, key, Config=self.transfer_config)
+                result["status"] = "uploaded"
+                result["bytes"] = size
+        except NoCredentialsError:
+            result["error"] = "S3 credentials not available"
+        except Exception as e:
+            result["error"] = str(e)
+        with self._lock:
+            self.stats[result["status"]] += 1
+            self.stats["bytes"] += result["bytes"]
+            self.stats["seconds"] += time.perf_counter() - start
+        if result["error"]:
+            print(f"S3 upload of {path} to {key} failed: {result['error']}")
+        return result
+
+    def submit(self, path, bucket, key, force=False):
+        """Queue one upload on the pool; returns a concurrent Future for its result dict."""
+        return self._executor.submit(self.upload, path, bucket, key, force)
+
+    def upload_many(self, items, force=False, on_result=None):
+        """
+        Upload (path, bucket, key) items concurrently. Blocks until done; results
+        come back in input order. on_result(result) is called as each one finishes.
+        """
+        futures = [self.submit(path, bucket, key, force) for path, bucket, key in items]
+        if on_result:
+            for future in as_completed(futures):
+                on_result(future.result())
+        return [f.result() for f in futures]
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def summarize(results):
+    """Counts per status plus the failed uploads, for API responses."""
+    summary = {"uploaded": 0, "skipped": 0, "failed": 0, "errors": []}
+    for r in results:
+        summary[r["status"]] += 1
+        if r["status"] == "failed":
+            summary["errors"].append({"key": r["key"], "error": r["error"]})
+    return summary
@@ -0,0 +1,64 @@
+"""
+Local stand-in for the GPU inference server, for testing and benchmarking
+without a GPU.
+
+    python stub_inference_server.py [--port 29894] [--overhead-ms 300] [--per-image-ms 100] [--no-batch]
+
+POST /infer takes one `image` and echoes its bytes back. POST /infer_batch takes
+several `images` and returns {"results": [{"image": base64}, ...]}. Requests are
+served one at a time (like a single GPU) and each costs
+overhead + per_image * batch_size, so batching amortises the fixed overhead.
+Point the backend at it with INFERENCE_URL=http://127.0.0.1:29894/infer.
+"""
+import argparse
+import asyncio
+import base64
+from typing import List
+
+from fastapi import FastAPI, File, Form, HTTPException, UploadFile
+from fastapi.responses import Response
+
+
+def create_app(overhead_ms=300, per_image_ms=100, batch=True):
+    app = FastAPI()
+    gpu = asyncio.Lock()
+    app.state.stats = {"requests": 0, "images": 0}
+
+    async def run_on_gpu(n):
+        async with gpu:
+            await asyncio.sleep((overhead_ms + per_image_ms * n) / 1000)
+        app.state.stats["requests"] += 1
+        app.state.stats["images"] += n
+
+    @app.post("/infer")
+    async def infer(image: UploadFile = File(...), category: str = Form("dress"),
+                    seed: int = Form(42), steps: int = Form(10), cfg: float = Form(1.0)):
+        content = await image.read()
+        await run_on_gpu(1)
+        return Response(content, media_type=image.content_type or "image/png")
+
+    @app.post("/infer_batch")
+    async def infer_batch(images: List[UploadFile] = File(...), category: str = Form("dress"),
+                          seed: int = Form(42), steps: int = Form(10), cfg: float = Form(1.0)):
+        if not batch:
+            raise HTTPException(status_code=404, detail="Not Found")
+        contents = [await image.read() for image in images]
+        await run_on_gpu(len(contents))
+        return {"results": [{"image": base64.b64encode(c).decode()} for c in contents]}
+
+    @app.get("/stats")
+    async def stats():
+        return app.state.stats
+
+    return app
+
+
+if __name__ == "__main__":
+    import uvicorn
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=29894)
+    parser.add_argument("--overhead-ms", type=int, default=300)
+    parser.add_argument("--per-image-ms", type=int, default=100)
+    parser.add_argument("--no-batch", action="store_true", help="behave like a server without /infer_batch")
+    args = parser.parse_args()
+    uvicorn.run(create_app(args.overhead_ms, args.per_image_ms, not args.no_batch), host="127.0.0.1", port=args.port)
@@ -0,0 +1,97 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import internal_api_standin
+from catalogue_push import MultipartStream, product_row, push_batch, push_catalogue
+
+
+@pytest.fixture
+def standin():
+    for name in internal_api_standin.STATS:
+        internal_api_standin.STATS[name] = 0
+    return TestClient(internal_api_standin.app)
+
+
+def sender(client, fields, sent=None):
+    def send(csv_path, zip_path):
+        if sent is not None:
+            sent.append(csv_path)
+        body = MultipartStream(fields, [
+            ("file", "catalogue.csv", csv_path, "text/csv"),
+            ("images_zip", "images.zip", zip_path, "application/zip"),
+        ])
+        data = body.read()
+        assert len(data) == body.len
+        return client.post("/api/internal/catalogues/upload", content=data, headers={
+            "Content-Type": body.content_type,
+            "Authorization": f"Bearer {internal_api_standin.TOKEN}",
+        })
+    return send
+
+
+def make_entries(tmp_path, count, missing=()):
+    """Products 1..count; the ones in `missing` point the CSV at an image the ZIP doesn't have."""
+    image = tmp_path / "vton.png"
+    image.write_bytes(b"\x89PNG" + b"0" * 100)
+    entries = []
+    for i in range(1, count + 1):
+        pid = str(i)
+        vton = f"{pid}_vton.png"
+        row = product_row({"id": pid, "name": f"Product {pid}"}, vton, None)
+        arcname = f"garments/{pid}/{'other.png' if pid in missing else vton}"
+        entries.append({"product_id": pid, "row": row, "images": [(str(image), arcname)]})
+    return entries
+
+
+def test_uploads_in_chunks(standin, tmp_path):
+    entries = make_entries(tmp_path, 25)
+    outcomes, responses = push_catalogue(sender(standin, {"client_id": "1"}), entries, str(tmp_path / "spool"), max_products=10)
+    assert all(o["status"] == "uploaded" for o in outcomes.values()) and len(outcomes) == 25
+    assert len(responses) == 3
+    assert internal_api_standin.STATS["products"] == 25
+    assert internal_api_standin.STATS["deflated_members"] == 0
+    assert not list((tmp_path / "spool").iterdir())
+
+
+def test_rejected_rows_fail_alone(standin, tmp_path):
+    entries = make_entries(tmp_path, 20, missing={"4", "17"})
+    sent = []
+    outcomes, responses = push_catalogue(sender(standin, {"client_id": "1"}, sent), entries, str(tmp_path / "spool"))
+    failed = {pid for pid, o in outcomes.items() if o["status"] == "failed"}
+    assert failed == {"4", "17"}
+    assert "not found for ID 4" in outcomes["4"]["error"]
+    # One rejected upload, then the other 18 products in one go
+    assert len(sent) == 2
+    assert internal_api_standin.STATS["products"] == 18
+
+
+@pytest.mark.parametrize("fields", [{"client_id": "999"}, {}])
+def test_request_level_error_fails_chunk_once(standin, tmp_path, fields):
+    # Unknown client (400) or missing client_id (422): splitting the chunk can't help
+    entries = make_entries(tmp_path, 16)
+    sent = []
+    outcomes, responses = push_catalogue(sender(standin, fields, sent), entries, str(tmp_path / "spool"))
+    assert all(o["status"] == "failed" for o in outcomes.values()) and len(outcomes) == 16
+    assert responses == []
+    assert len(sent) == 1
+
+
+def test_duplicate_product_in_batch_is_reported(standin, tmp_path):
+    entries = {e["product_id"]: e for e in make_entries(tmp_path, 3)}
+    # Items are just their product ids here; "9" has no image
+    products = [("1", "1"), ("2", "2"), ("1", "1"), ("", ""), ("9", "9")]
+
+    def build_entry(item):
+        if item not in entries:
+            raise LookupError("No VTON image")
+        return entries[item]
+
+    sent = []
+    send = sender(standin, {"client_id": "1"}, sent)
+    outcomes, responses = push_batch(products, build_entry, lambda batch: push_catalogue(send, batch, str(tmp_path / "spool")))
+    assert [o["status"] for o in outcomes] == ["uploaded", "uploaded", "failed", "failed", "failed"]
+    assert outcomes[2]["error"] == "Duplicate product in batch"
+    assert outcomes[3]["error"] == "product.id is required"
+    assert outcomes[4]["error"] == "No VTON image"
+    assert len(sent) == 1
+    assert internal_api_standin.STATS["products"] == 2
@@ -0,0 +1,60 @@
+import boto3
+import pytest
+from moto import mock_aws
+
+from s3_transfer import S3Transfer
+
+MB = 1024 * 1024
+THRESHOLD = 8 * MB
+CHUNK = 5 * MB
+BUCKET = "test-bucket"
+
+
+@pytest.fixture
+def transfer(monkeypatch):
+    for name, value in (("AWS_ACCESS_KEY_ID", "testing"), ("AWS_SECRET_ACCESS_KEY", "testing"),
+                        ("AWS_DEFAULT_REGION", "us-east-1")):
+        monkeypatch.setenv(name, value)
+    with mock_aws():
+        client = boto3.client("s3", region_name="us-east-1")
+        client.create_bucket(Bucket=BUCKET)
+        engine = S3Transfer(workers=2, multipart_threshold=THRESHOLD, multipart_chunksize=CHUNK, client=client)
+        yield engine
+        engine.shutdown()
+
+
+def write(path, size, fill=b"a"):
+    with open(path, "wb") as f:
+        f.write(fill * size)
+    return str(path)
+
+
+@pytest.mark.parametrize("size", [
+    1024,
+    CHUNK + 1,          # above the chunk size but below the threshold: still a single-part upload
+    THRESHOLD - 1,
+    THRESHOLD,          # multipart from here on
+    THRESHOLD + 1,
+    2 * CHUNK + 3,
+])
+def test_unchanged_file_is_skipped(transfer, tmp_path, size):
+    path = write(tmp_path / "f.bin", size)
+    assert transfer.upload(path, BUCKET, "k")["status"] == "uploaded"
+    assert transfer.upload(path, BUCKET, "k")["status"] == "skipped"
+
+
+@pytest.mark.parametrize("size", [1024, CHUNK + 1, THRESHOLD])
+def test_changed_file_is_uploaded(transfer, tmp_path, size):
+    path = write(tmp_path / "f.bin", size)
+    transfer.upload(path, BUCKET, "k")
+    # Same size, different contents: only the ETag can tell
+    write(tmp_path / "f.bin", size, fill=b"b")
+    assert transfer.upload(path, BUCKET, "k")["status"] == "uploaded"
+    assert transfer.upload(path, BUCKET, "k")["status"] == "skipped"
+
+
+def test_force_uploads_unchanged_file(transfer, tmp_path):
+    path = write(tmp_path / "f.bin", 1024)
+    transfer.upload(path, BUCKET, "k")
+    assert transfer.upload(path, BUCKET, "k", force=True)["status"] == "uploaded"
+    assert transfer.stats["uploaded"] == 2
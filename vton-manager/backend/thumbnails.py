@@ -0,0 +1,146 @@
+import io
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from PIL import Image, features
+
+THUMB_SIZES = (200, 400, 800)
+DEFAULT_THUMB_SIZE = 400
+WEBP_SUPPORTED = features.check("webp")
+
+
+def thumb_name(product_id, filename, size=DEFAULT_THUMB_SIZE, fmt="jpeg"):
+    """Name of the thumbnail for one image, size and format in the blob store's "thumbnails" namespace."""
+    return f"{product_id}/{filename}/{size}.{fmt}"
+
+
+def parse_thumb_name(name):
+    """(product_id, filename) back out of a thumb_name()."""
+    image, _, _ = name.rpartition("/")
+    product_id, _, filename = image.partition("/")
+    return product_id, filename
+
+
+def render_thumbnails(source_path, targets):
+    """
+    Decode source_path once and encode every (size, fmt, name) in targets.
+    JPEG sources use draft mode, so the decoder only produces a reduced-size
+    image just big enough for the largest target. Sizes are rendered largest
+    first, each from the previous one. Returns [(name, encoded bytes)].
+    """
+    targets = sorted(targets, key=lambda t: t[0], reverse=True)
+    rendered = []
+    with Image.open(source_path) as img:
+        largest = targets[0][0]
+        if img.format == "JPEG":
+            img.draft("RGB", (largest, largest))
+        if img.mode in ("RGBA", "P", "LA", "I;16", "CMYK"):
+            img = img.convert("RGB")
+        for size, fmt, name in targets:
+            img.thumbnail((size, size))
+            out = io.BytesIO()
+            if fmt == "webp":
+                img.save(out, "WEBP", quality=70, method=4)
+            else:
+                img.save(out, "JPEG", quality=70)
+            rendered.append((name, out.getvalue()))
+    return rendered
+
+
+def _render_job(source_path, targets):
+    try:
+        return render_thumbnails(source_path, targets), None
+    except Exception as e:
+        return [], str(e)
+
+
+class ThumbnailPipeline:
+    """
+    Pre-generates thumbnails in the background on a process pool.
+
+    submit() takes (product_id, filename, source_path) jobs, skips those whose
+    thumbnails all exist already, and renders the rest off the request path.
+    Jobs already in flight are not queued twice. Workers send back the encoded
+    images and they are stored in the blob store's "thumbnails" namespace.
+    """
+
+    def __init__(self, store, sizes=THUMB_SIZES, formats=("jpeg",), workers=2):
+        self.store = store
+        self.sizes = tuple(sizes)
+        self.formats = tuple(f for f in formats if f != "webp" or WEBP_SUPPORTED)
+        self.workers = workers
+        self._executor = None
+        # Checking which thumbnails already exist is a lot of stat() calls; keep it off the caller's thread
+        self._scanner = ThreadPoolExecutor(max_workers=1)
+        self._lock = threading.Lock()
+        self._in_flight = set()
+        self.stats = {"submitted": 0, "skipped": 0, "rendered": 0, "failed": 0}
+
+    def _targets(self, product_id, filename):
+        return [
+            (size, fmt, thumb_name(product_id, filename, size, fmt))
+            for size in self.sizes for fmt in self.formats
+        ]
+
+    def _pool(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+    def submit(self, jobs):
+        """Queue (product_id, filename, source_path) jobs. Safe to call from any thread; returns immediately."""
+        for product_id, filename, source_path in jobs:
+            key = (product_id, filename)
+            targets = [t for t in self._targets(product_id, filename) if not self.store.exists("thumbnails", t[2])]
+            with self._lock:
+                if not targets or not os.path.exists(source_path):
+                    self.stats["skipped"] += 1
+                    continue
+                if key in self._in_flight:
+                    continue
+                self._in_flight.add(key)
+                self.stats["submitted"] += 1
+                try:
+                    future = self._pool().submit(_render_job, source_path, targets)
+                except Exception as e:
+                    self._in_flight.discard(key)
+                    print(f"Thumbnail pipeline unavailable: {e}")
+                    return
+            future.add_done_callback(lambda f, key=key, source_path=source_path: self._done(key, source_path, f))
+
+    def _done(self, key, source_path, future):
+        try:
+            rendered, error = future.result()
+        except Exception as e:
+            rendered, error = [], str(e)
+        try:
+            for name, data in rendered:
+                self.store.put("thumbnails", name, data)
+        except Exception as e:
+            error = str(e)
+        with self._lock:
+            # Only once stored, so a resubmit meanwhile doesn't render the same images again
+            self._in_flight.discard(key)
+            if error:
+                self.stats["failed"] += 1
+                print(f"Thumbnail generation failed for {source_path}: {error}")
+            else:
+                self.stats["rendered"] += len(rendered)
+
+    def submit_products(self, products):
+        """Queue thumbnails for all images of these products, in the background."""
+        products = list(products)
+        self._scanner.submit(lambda: self.submit(self.product_jobs(products)))
+
+    def product_jobs(self, products):
+        """Jobs for every listed image (thumbnail + other images) of the given products."""
+        for p in products:
+            for filename in [p.get("thumbnail_image"), *p.get("other_images", [])]:
+                if filename:
+                    yield p["id"], filename, os.path.join(p["_base_garment_dir"], p["id"], filename)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        self._scanner.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,75 @@
+import asyncio
+import time
+
+
+class AsyncTTLCache:
+    """
+    In-memory cache for slow async lookups (upstream API calls).
+
+    get(key, fetch) returns the cached value while it is younger than `ttl`.
+    Up to `ttl + stale_ttl` the stale value is still returned straight away
+    and a refresh runs in the background. Past that, or on a miss, the caller
+    waits for fetch(). Concurrent loads of the same key share one fetch, and
+    if a fetch fails while an older value exists, that value is served rather
+    than the error. Failures are never cached. Must be used from one event loop.
+    """
+
+    def __init__(self, ttl=300, stale_ttl=3600):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._entries = {}   # key -> (value, fetched_at)
+        self._inflight = {}  # key -> task loading it
+        self.stats = {"hits": 0, "stale_hits": 0, "misses": 0, "coalesced": 0, "refreshes": 0, "errors": 0}
+
+    async def get(self, key, fetch):
+        entry = self._entries.get(key)
+        if entry is not None:
+            age = time.monotonic() - entry[1]
+            if age < self.ttl:
+                self.stats["hits"] += 1
+                return entry[0]
+            if age < self.ttl + self.stale_ttl:
+                self.stats["stale_hits"] += 1
+                self._load(key, fetch)
+                return entry[0]
+        if key in self._inflight:
+            self.stats["coalesced"] += 1
+        else:
+            self.stats["misses"] += 1
+        task = self._load(key, fetch)
+        try:
+            # Shielded so one caller disconnecting doesn't cancel the fetch others wait on
+            return await asyncio.shield(task)
+        except Exception:
+            if entry is not None:
+                return entry[0]
+            raise
+
+    def _load(self, key, fetch):
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch(key, fetch))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._done(key, t))
+        return task
+
+    async def _fetch(self, key, fetch):
+        value = await fetch()
+        self._entries[key] = (value, time.monotonic())
+        self.stats["refreshes"] += 1
+        return value
+
+    def _done(self, key, task):
+        self._inflight.pop(key, None)
+        # Background refreshes have nobody awaiting them; collect their error here
+        if not task.cancelled() and task.exception() is not None:
+            self.stats["errors"] += 1
+            print(f"Cache refresh failed for {key}: {task.exception()}")
+
+    def invalidate(self, key=None):
+        """Drop one key, or everything. Returns the number of entries dropped."""
+        if key is None:
+            dropped = len(self._entries)
+            self._entries.clear()
+            return dropped
+        return int(self._entries.pop(key, None) is not None)
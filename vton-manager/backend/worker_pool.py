@@ -0,0 +1,71 @@
+import asyncio
+
+
+class WorkerPool:
+    """
+    N asyncio workers fed from an in-process queue.
+
+    Work is submitted under a key; while a key is queued, further submits for
+    it return the same future instead of scheduling it again, so the
+    auto-processing path and manual triggers can't double-process an item. A
+    submit with a different item object for the key (e.g. the queue item was
+    deleted and re-added) replaces the queued one, or if the old one is already
+    running, is queued to run after it. Must be used from the event loop thread.
+    """
+
+    def __init__(self, handler, size=2, name="worker"):
+        self.handler = handler  # async callable(item, force)
+        self.size = max(1, size)
+        self.name = name
+        self._queue = None     # keys, in submission order
+        self._queued = {}      # key -> [item, force, future], waiting for a worker
+        self._running = {}     # key -> (item, future)
+        self._tasks = []
+
+    def start(self):
+        self._queue = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._run(i)) for i in range(self.size)]
+        print(f"Started {self.size} {self.name}s.")
+
+    def submit(self, key, item, force=False):
+        """Schedule item unless it is already queued/running. Returns a future for its result."""
+        entry = self._queued.get(key)
+        if entry is not None:
+            entry[0] = item
+            entry[1] = entry[1] or force
+            return entry[2]
+        running = self._running.get(key)
+        if running is not None and running[0] is item:
+            return running[1]
+        future = asyncio.get_running_loop().create_future()
+        self._queued[key] = [item, force, future]
+        # A key that is running is queued again by its worker once it finishes
+        if running is None:
+            self._queue.put_nowait(key)
+        return future
+
+    def stats(self):
+        return {
+            "workers": self.size,
+            "running": len(self._running),
+            "queued": len(self._queued),
+        }
+
+    async def _run(self, index):
+        while True:
+            key = await self._queue.get()
+            item, force, future = self._queued.pop(key)
+            self._running[key] = (item, future)
+            try:
+                result = await self.handler(item, force)
+                if not future.done():
+                    future.set_result(result)
+            except Exception as e:
+                print(f"{self.name} {index} error on {key}: {e}")
+                if not future.done():
+                    future.set_result(None)
+            finally:
+                del self._running[key]
+                if key in self._queued:
+                    self._queue.put_nowait(key)
+                self._queue.task_done()
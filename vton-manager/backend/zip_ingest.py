@@ -0,0 +1,216 @@
+import os
+import shutil
+import zipfile
+
+CHUNK_SIZE = 1024 * 1024
+
+
+class ZipRejected(ValueError):
+    """The archive breaks one of the upload limits or is unsafe to extract."""
+
+
+class UploadSizeLimit:
+    """
+    ASGI middleware that refuses request bodies over a size limit ({path: max
+    bytes}) with a 413 before the form parser has spooled them to disk: up
+    front when Content-Length is over, otherwise (chunked uploads) as soon as
+    the bytes received pass the limit. In that case the app is told the client
+    disconnected, and whatever error it answers with is replaced by the 413.
+    """
+
+    def __init__(self, app, limits):
+        self.app = app
+        self.limits = limits
+
+    async def __call__(self, scope, receive, send):
+        limit = self.limits.get(scope["path"]) if scope["type"] == "http" else None
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+        length = dict(scope["headers"]).get(b"content-length", b"")
+        if length.isdigit() and int(length) > limit:
+            await self._reject(send, limit)
+            return
+
+        received = 0
+        over = False
+        rejected = False
+
+        async def limited_receive():
+            nonlocal received, over
+            if over:
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    over = True
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def limited_send(message):
+            nonlocal rejected
+            if not over:
+                await send(message)
+            elif not rejected:
+                rejected = True
+                await self._reject(send, limit)
+
+        await self.app(scope, limited_receive, limited_send)
+        if over and not rejected:
+            await self._reject(send, limit)
+
+    @staticmethod
+    async def _reject(send, limit):
+        body = f'{{"detail": "Upload exceeds the {limit // (1024 * 1024)} MB limit"}}'.encode()
+        await send({"type": "http.response.start", "status": 413,
+                    "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]})
+        await send({"type": "http.response.body", "body": body})
+
+
+def spool_upload(source, dest_path, max_bytes, chunk_size=CHUNK_SIZE):
+    """Copy a binary file object to dest_path chunk by chunk, refusing anything over max_bytes. Returns bytes written."""
+    written = 0
+    with open(dest_path, "wb") as out:
+        while True:
+            chunk = source.read(chunk_size)
+            if not chunk:
+                break
+            written += len(chunk)
+            if written > max_bytes:
+                raise ZipRejected(f"Upload exceeds the {max_bytes // (1024 * 1024)} MB limit")
+            out.write(chunk)
+    return written
+
+
+def _strip_prefix(members):
+    """The zip's single top-level 'garments' folder, if that's all it contains, else None."""
+    tops = {m.filename.replace("\\", "/").split("/", 1)[0] for m in members}
+    if len(tops) != 1:
+        return None
+    top = tops.pop()
+    if top.lower() != "garments":
+        return None
+    # Only a folder gets flattened, not a lone file called "garments"
+    if not any(m.filename.replace("\\", "/").startswith(top + "/") for m in members):
+        return None
+    return top + "/"
+
+
+def extract_zip(zip_path, extract_path, max_members, max_total_bytes, max_ratio, on_file=None):
+    """
+    Extract zip_path into extract_path one member at a time.
+
+    Rejects archives with more than max_members entries, more than
+    max_total_bytes uncompressed, or any member compressing better than
+    max_ratio:1 (zip bombs). Sizes are enforced on the bytes actually written,
+    not just the headers. A single top-level "garments/" folder is flattened
+    while extracting. on_file(rel_path, abs_path) is called for each file
+    written. Returns the number of files extracted.
+    """
+    root = os.path.abspath(extract_path)
+    extracted = 0
+    total = 0
+    with zipfile.ZipFile(zip_path) as zf:
+        members = zf.infolist()
+        if len(members) > max_members:
+            raise ZipRejected(f"Archive has {len(members)} entries, the limit is {max_members}")
+        declared = sum(m.file_size for m in members)
+        if declared > max_total_bytes:
+            raise ZipRejected(f"Archive expands to {declared} bytes, the limit is {max_total_bytes}")
+        prefix = _strip_prefix(members)
+
+        for member in members:
+            name = member.filename.replace("\\", "/")
+            if prefix and name.startswith(prefix):
+                name = name[len(prefix):]
+            if not name or name.endswith("/"):
+                continue
+            if member.compress_size and member.file_size / member.compress_size > max_ratio:
+                raise ZipRejected(f"{member.filename} has a suspicious compression ratio")
+
+            dest = os.path.abspath(os.path.join(root, *[p for p in name.split("/") if p not in ("", ".")]))
+            if not dest.startswith(root + os.sep):
+                raise ZipRejected(f"Unsafe path in archive: {member.filename}")
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+
+            written = 0
+            with zf.open(member) as src, open(dest, "wb") as out:
+                while True:
+                    chunk = src.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    written += len(chunk)
+                    total += len(chunk)
+                    if written > member.file_size or total > max_total_bytes:
+                        raise ZipRejected(f"{member.filename} is larger than its header claims")
+                    out.write(chunk)
+            extracted += 1
+            if on_file:
+                on_file(os.path.relpath(dest, root), dest)
+    return extracted
+
+
+class FileIndex:
+    """
+    Filename lookup for an extracted image tree, filled via extract_zip's on_file.
+    Images are resolved by their "<product id>/<filename>" path first, then by
+    bare filename anywhere in the tree (the old os.walk behaviour), which is
+    where duplicate names across folders make the match ambiguous.
+    """
+
+    def __init__(self):
+        self.by_rel_path = {}  # "sku/img.jpg" -> abs path
+        self.by_name = {}      # "img.jpg" -> first abs path seen
+        self.duplicates = {}   # "img.jpg" -> every abs path with that name, when there's more than one
+
+    def add(self, rel_path, abs_path):
+        rel_path = rel_path.replace(os.sep, "/")
+        self.by_rel_path[rel_path] = abs_path
+        name = rel_path.rsplit("/", 1)[-1]
+        if name in self.by_name:
+            self.duplicates.setdefault(name, [self.by_name[name]]).append(abs_path)
+        else:
+            self.by_name[name] = abs_path
+
+    def resolve(self, product_id, filename):
+        return self.by_rel_path.get(f"{product_id}/{filename}") or self.by_name.get(filename)
+
+
+def validate_images(df, index, columns=("Thumbnail Image Filename", "Vton Ready Image Filename")):
+    """
+    Check every image referenced by the catalogue against the index, one
+    vectorized pass per column. Returns (errors, warnings, found) where errors
+    keeps the old "Row N: Image X not found for ID Y" messages in row order,
+    warnings lists ambiguous duplicate filenames, and found is a list of
+    (product_id, filename, abs_path) for images that exist, each
+    (product_id, filename) once even if several rows or columns reference it.
+    """
+    ids = df["id"].astype(str)
+    missing = []  # (row, column order, message)
+    warnings = []
+    found = {}  # (product_id, filename) -> abs_path
+    for order, col in enumerate(columns):
+        if col not in df:
+            continue
+        present = df[col].notna()
+        names = df.loc[present, col].astype(str)
+        col_ids = ids[present]
+        rel = col_ids + "/" + names
+        hit_rel = rel.isin(index.by_rel_path.keys())
+        hit_name = names.isin(index.by_name.keys())
+        for idx in names.index[~(hit_rel | hit_name)]:
+            missing.append((idx, order, f"Row {idx+1}: Image {names[idx]} not found for ID {col_ids[idx]}"))
+        for idx in names.index[~hit_rel & hit_name]:
+            if names[idx] in index.duplicates:
+                warnings.append(f"Row {idx+1}: Image {names[idx]} for ID {col_ids[idx]} matches {len(index.duplicates[names[idx]])} files in the archive")
+        for product_id, filename in zip(col_ids[hit_rel | hit_name], names[hit_rel | hit_name]):
+            if (product_id, filename) not in found:
+                found[(product_id, filename)] = index.resolve(product_id, filename)
+    missing.sort(key=lambda m: (m[0], m[1]))
+    return [m[2] for m in missing], warnings, [(pid, name, path) for (pid, name), path in found.items()]
+
+
+def remove_tree(path):
+    if os.path.exists(path):
+        shutil.rmtree(path, ignore_errors=True)
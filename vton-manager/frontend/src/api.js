@@ -2,8 +2,15 @@ import axios from 'axios';
 
 const API_BASE_URL = 'http://localhost:8001';
 
-export const fetchProducts = async (page = 1, limit = 30, pendingOnly = false) => {
-    const response = await axios.get(`${API_BASE_URL}/products?page=${page}&limit=${limit}&pending_only=${pendingOnly}`);
+export const fetchProducts = async (page = 1, limit = 30, pendingOnly = false, options = {}) => {
+    // options: { q, client, category, gender, brand, sort, cursor }; pass the previous
+    // response's next_cursor as `cursor` to continue the same result set.
+    // Returns { total, page, limit, next_cursor, products }
+    const params = { page, limit, pending_only: pendingOnly };
+    for (const [key, value] of Object.entries(options)) {
+        if (value) params[key] = value;
+    }
+    const response = await axios.get(`${API_BASE_URL}/products`, { params });
     return response.data;
 };
 
@@ -12,6 +19,12 @@ export const fetchProduct = async (id) => {
     return response.data;
 };
 
+export const fetchProductsBatch = async (ids) => {
+    // Returns { products: { [id]: product }, missing: [ids] }
+    const response = await axios.get(`${API_BASE_URL}/products/batch`, { params: { ids: ids.join(',') } });
+    return response.data;
+};
+
 export const getImageUrl = (productId, filename) => {
     if (!filename) return null;
     return `${API_BASE_URL}/images/${productId}/${filename}`;
@@ -34,11 +47,21 @@ export const addToQueue = async (productId, filename) => {
     return response.data;
 };
 
-export const fetchQueue = async () => {
-    const response = await axios.get(`${API_BASE_URL}/queue`);
+export const fetchQueue = async ({ withProducts = false } = {}) => {
+    const response = await axios.get(`${API_BASE_URL}/queue`, { params: { with_products: withProducts } });
     return response.data;
 };
 
+// Live queue updates over server-sent events, each item carrying a product summary. onSync gets {version, full, items, removed}
+// on connect (and after any resync), onChange gets each {type: 'upsert'|'remove', ...}.
+// The browser reconnects on its own, resuming from the last event id. Returns a close function.
+export const subscribeQueue = ({ onSync, onChange }) => {
+    const source = new EventSource(`${API_BASE_URL}/queue/stream?with_products=true`);
+    source.addEventListener('sync', (e) => onSync(JSON.parse(e.data)));
+    source.addEventListener('change', (e) => onChange(JSON.parse(e.data)));
+    return () => source.close();
+};
+
 export const processImage = async (productId, filename) => {
     const response = await axios.post(`${API_BASE_URL}/process/${productId}/${filename}`);
     return response.data;
@@ -49,6 +72,12 @@ export const approveImage = async (productId, filename, processedFilename) => {
     return response.data;
 };
 
+export const approveBulk = async (items) => {
+    // items: [{ product_id, filename, processed_filename }]
+    const response = await axios.post(`${API_BASE_URL}/approve/bulk`, { items });
+    return response.data;
+};
+
 export const discardImage = async (productId, filename) => {
     const response = await axios.delete(`${API_BASE_URL}/queue/${productId}/${filename}`);
     return response.data;
@@ -75,6 +104,11 @@ export const uploadCatalogue = async (formData) => {
     return response.data;
 };
 
+export const fetchCatalogueJob = async (jobId) => {
+    const response = await axios.get(`${API_BASE_URL}/catalogues/jobs/${jobId}`);
+    return response.data;
+};
+
 export const fetchClients = async () => {
     const response = await axios.get(`${API_BASE_URL}/clients`);
     return response.data;
@@ -97,3 +131,12 @@ export const uploadSingleProduct = async (payload) => {
     });
     return response.data;
 };
+
+export const uploadProductsBatch = async (payload) => {
+    // payload: { client_id, location_ids, custom_location, products: [{ product, processed_filename, size_chart, size_chart_unit }] }
+    // Returns { uploaded, failed, requests, results: [{ product_id, status, error }] }
+    const response = await axios.post(`${API_BASE_URL}/catalogue/upload-batch`, payload, {
+        timeout: 0, // large batches go out as several uploads; wait for all of them
+    });
+    return response.data;
+};
@@ -9,20 +9,53 @@ const Catalogue = () => {
     const [total, setTotal] = useState(0);
     const [loading, setLoading] = useState(true);
     const [showPendingOnly, setShowPendingOnly] = useState(false);
+    const [searchInput, setSearchInput] = useState('');
+    const [query, setQuery] = useState('');
+    const [sort, setSort] = useState('default');
+    // cursors[n] continues the result set at page n + 1, so paging stays stable while catalogues refresh
+    const [cursors, setCursors] = useState([null]);
     const LIMIT = 30;
 
+    // A new search starts a new result set from the first page
+    const resetPaging = () => {
+        setPage(1);
+        setCursors([null]);
+    };
+
+    // Debounce typing before searching
+    useEffect(() => {
+        const timer = setTimeout(() => {
+            const trimmed = searchInput.trim();
+            if (trimmed !== query) {
+                setQuery(trimmed);
+                resetPaging();
+            }
+        }, 300);
+        return () => clearTimeout(timer);
+    }, [searchInput, query]);
+
     useEffect(() => {
         loadProducts();
-    }, [page, showPendingOnly]);
+    }, [page, query, sort, showPendingOnly]);
 
     const loadProducts = async () => {
         setLoading(true);
         try {
-            // Note: currently fetching based on showPendingOnly state
-            const data = await fetchProducts(page, LIMIT, showPendingOnly);
+            const cursor = cursors[page - 1] || null;
+            const data = await fetchProducts(page, LIMIT, showPendingOnly, { q: query, sort, cursor });
             setProducts(data.products || []);
             setTotal(data.total || 0);
+            setCursors(prev => {
+                const next = prev.slice(0, page);
+                next[page] = data.next_cursor;
+                return next;
+            });
         } catch (error) {
+            if (error.response?.status === 410 && page > 1) {
+                // Result set expired on the server; start again from the first page
+                resetPaging();
+                return;
+            }
             console.error("Failed to load products", error);
             setProducts([]);
         } finally {
@@ -37,11 +70,30 @@ const Catalogue = () => {
             <div className="flex justify-between items-center">
                 <h2 className="text-xl font-semibold text-gray-800">Product Catalogue</h2>
                 <div className="flex items-center gap-4">
+                    <input
+                        type="search"
+                        value={searchInput}
+                        onChange={(e) => setSearchInput(e.target.value)}
+                        placeholder="Search products..."
+                        className="border border-gray-300 px-3 py-2 rounded-md text-sm focus:ring-blue-500 focus:border-blue-500"
+                    />
+                    <select
+                        value={sort}
+                        onChange={(e) => { setSort(e.target.value); resetPaging(); }}
+                        className="border border-gray-300 px-3 py-2 rounded-md text-sm bg-white focus:ring-blue-500 focus:border-blue-500"
+                    >
+                        <option value="default">Catalogue order</option>
+                        <option value="name">Name (A-Z)</option>
+                        <option value="-name">Name (Z-A)</option>
+                        <option value="mrp">MRP (low to high)</option>
+                        <option value="-mrp">MRP (high to low)</option>
+                        <option value="-discount">Biggest discount</option>
+                    </select>
                     <label className="flex items-center gap-2 cursor-pointer bg-white border border-gray-300 px-3 py-2 rounded-md hover:bg-gray-50 transition select-none">
                         <input
                             type="checkbox"
                             checked={!showPendingOnly}
-                            onChange={() => setShowPendingOnly(!showPendingOnly)}
+                            onChange={() => { setShowPendingOnly(!showPendingOnly); resetPaging(); }}
                             className="w-4 h-4 text-blue-600 rounded focus:ring-blue-500"
                         />
                         <span className="text-sm font-medium text-gray-700">Show Processed</span>
@@ -61,7 +113,7 @@ const Catalogue = () => {
                 <>
                     {products.length === 0 ? (
                         <div className="text-center py-12 text-gray-500">
-                            No pending products found. Upload a catalogue to get started.
+                            {query ? `No products match "${query}".` : "No pending products found. Upload a catalogue to get started."}
                         </div>
                     ) : (
                         <div className="grid grid-cols-1 sm:grid-cols-2 md:grid-cols-3 lg:grid-cols-4 xl:grid-cols-5 gap-6">
@@ -88,7 +140,7 @@ const Catalogue = () => {
                     </span>
                     <button
                         onClick={() => setPage(p => Math.min(totalPages, p + 1))}
-                        disabled={page === totalPages}
+                        disabled={page === totalPages || !cursors[page]}
                         className="p-2 rounded-md hover:bg-gray-100 disabled:opacity-50 disabled:cursor-not-allowed"
                     >
                         <ChevronRight size={24} />
@@ -1,6 +1,19 @@
 import React, { useState } from 'react';
 import { X, Upload, CheckCircle, AlertTriangle } from 'lucide-react';
-import { uploadCatalogue } from '../api';
+import { uploadCatalogue, fetchCatalogueJob } from '../api';
+
+const JOB_POLL_INTERVAL = 1000;
+const STAGE_LABELS = {
+    spool: 'Uploading',
+    extract: 'Extracting images',
+    index: 'Indexing images',
+    validate: 'Validating',
+    s3: 'Uploading to S3',
+    thumbnails: 'Queueing thumbnails',
+    merge: 'Adding to catalogue',
+};
+
+const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
 
 const CatalogueUploadModal = ({ isOpen, onClose, onSuccess }) => {
     const [clientId, setClientId] = useState('');
@@ -9,6 +22,7 @@ const CatalogueUploadModal = ({ isOpen, onClose, onSuccess }) => {
     const [zipFile, setZipFile] = useState(null);
     const [isUploading, setIsUploading] = useState(false);
     const [uploadStatus, setUploadStatus] = useState(null); // { success: boolean, message: string, report: object }
+    const [jobProgress, setJobProgress] = useState(null); // { stage, done, total } while the ingestion job runs
 
     if (!isOpen) return null;
 
@@ -29,7 +43,15 @@ const CatalogueUploadModal = ({ isOpen, onClose, onSuccess }) => {
         formData.append('images_zip', zipFile);
 
         try {
-            const result = await uploadCatalogue(formData);
+            const { job_id: jobId } = await uploadCatalogue(formData);
+            // The server ingests the catalogue in the background; poll the job until it finishes
+            let job = await fetchCatalogueJob(jobId);
+            while (job.status !== 'succeeded' && job.status !== 'failed') {
+                if (job.stage) setJobProgress({ stage: job.stage, ...job.stages[job.stage] });
+                await sleep(JOB_POLL_INTERVAL);
+                job = await fetchCatalogueJob(jobId);
+            }
+            const result = job.result;
             setUploadStatus(result);
             if (result.success) {
                 setTimeout(() => {
@@ -46,6 +68,7 @@ const CatalogueUploadModal = ({ isOpen, onClose, onSuccess }) => {
             });
         } finally {
             setIsUploading(false);
+            setJobProgress(null);
         }
     };
 
@@ -166,7 +189,9 @@ const CatalogueUploadModal = ({ isOpen, onClose, onSuccess }) => {
                                     {isUploading ? (
                                         <>
                                             <div className="w-4 h-4 border-2 border-white/30 border-t-white rounded-full animate-spin" />
-                                            Uploading...
+                                            {jobProgress
+                                                ? `${STAGE_LABELS[jobProgress.stage] || jobProgress.stage}${jobProgress.total ? ` ${jobProgress.done}/${jobProgress.total}` : ''}...`
+                                                : 'Uploading...'}
                                         </>
                                     ) : (
                                         <>
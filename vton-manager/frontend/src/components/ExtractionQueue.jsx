@@ -1,5 +1,5 @@
 import React, { useState, useEffect } from 'react';
-import { fetchQueue, fetchProduct, processImage, approveImage, discardImage, getImageUrl, getProcessedImageUrl, clearApprovedQueue } from '../api';
+import { fetchQueue, subscribeQueue, fetchProductsBatch, processImage, approveImage, approveBulk, discardImage, getImageUrl, getProcessedImageUrl, clearApprovedQueue } from '../api';
 import { Play, CheckCircle, Loader2, Check, Trash2, Upload, ExternalLink } from 'lucide-react';
 import UploadModal from './UploadModal';
 
@@ -11,27 +11,43 @@ const ExtractionQueue = () => {
     const [uploadModalItem, setUploadModalItem] = useState(null);
     const [uploadModalProduct, setUploadModalProduct] = useState(null);
 
+    // Applies upserted items (updated in place, new ones appended) and removals to a queue list
+    const applyQueueChanges = (prev, items, removed) => {
+        const key = (i) => `${i.product_id}/${i.image_filename}`;
+        const updates = new Map(items.map(i => [key(i), i]));
+        const gone = new Set(removed.map(key));
+        const next = prev
+            .filter(i => !gone.has(key(i)))
+            .map(i => {
+                const updated = updates.get(key(i));
+                updates.delete(key(i));
+                return updated || i;
+            });
+        return [...next, ...updates.values()];
+    };
+
     useEffect(() => {
-        loadQueue();
-        const interval = setInterval(loadQueue, 5000); // Poll every 5s
-        return () => clearInterval(interval);
+        // The server pushes every queue change as it happens, no polling needed
+        return subscribeQueue({
+            onSync: (state) => setQueue(prev => state.full ? state.items : applyQueueChanges(prev, state.items, state.removed)),
+            onChange: (event) => setQueue(prev => event.type === 'remove'
+                ? applyQueueChanges(prev, [], [event])
+                : applyQueueChanges(prev, [event.item], [])),
+        });
     }, []);
 
+    // Full product records, only fetched when the upload modal needs one. The list
+    // itself shows the summary the server embeds in each queue item.
+    const loadFullProduct = async (id) => {
+        if (products[id]) return products[id];
+        const { products: found } = await fetchProductsBatch([id]);
+        setProducts(prev => ({ ...prev, ...found }));
+        return found[id];
+    };
+
     const loadQueue = async () => {
         try {
-            const data = await fetchQueue();
-            setQueue(data);
-            const userIds = [...new Set(data.map(item => item.product_id))];
-            userIds.forEach(async (id) => {
-                if (!products[id]) {
-                    try {
-                        const prod = await fetchProduct(id);
-                        setProducts(prev => ({ ...prev, [id]: prod }));
-                    } catch (e) {
-                        console.error("Failed to fetch product", id);
-                    }
-                }
-            });
+            setQueue(await fetchQueue({ withProducts: true }));
         } catch (error) {
             console.error("Failed to load queue", error);
         }
@@ -63,9 +79,35 @@ const ExtractionQueue = () => {
         }
     };
 
-    const handleApproveAndUpload = (item) => {
+    const [isBulkApproving, setIsBulkApproving] = useState(false);
+
+    const handleApproveAllCompleted = async () => {
+        const completed = queue.filter(i => i.status === 'completed');
+        if (!confirm(`Approve all ${completed.length} completed items?`)) return;
+        setIsBulkApproving(true);
+        try {
+            const result = await approveBulk(completed.map(item => ({
+                product_id: item.product_id,
+                filename: item.image_filename,
+                processed_filename: item.processed_image_path || `processed_${item.product_id}_${item.image_filename}`,
+            })));
+            if (result.failed > 0) {
+                const failures = result.results.filter(r => r.status !== 'approved');
+                alert(`Approved ${result.approved}, failed ${result.failed}:\n` +
+                    failures.map(r => `${r.product_id}/${r.filename}: ${r.error}`).join('\n'));
+            }
+        } catch (error) {
+            console.error("Bulk approval failed", error);
+            alert("Failed to approve items");
+        } finally {
+            setIsBulkApproving(false);
+            loadQueue();
+        }
+    };
+
+    const handleApproveAndUpload = async (item) => {
         // First approve, then show upload modal
-        const product = products[item.product_id];
+        const product = await loadFullProduct(item.product_id);
         setUploadModalItem(item);
         setUploadModalProduct({
             ...product,
@@ -88,8 +130,8 @@ const ExtractionQueue = () => {
     };
 
     // Open upload modal for already-approved items
-    const handleUploadApproved = (item) => {
-        const product = products[item.product_id];
+    const handleUploadApproved = async (item) => {
+        const product = await loadFullProduct(item.product_id);
         setUploadModalItem(item);
         setUploadModalProduct({
             ...product,
@@ -143,6 +185,16 @@ const ExtractionQueue = () => {
             <div className="flex items-center justify-between">
                 <h2 className="text-xl font-semibold text-gray-800">Extraction Queue</h2>
                 <div className="flex items-center gap-3">
+                    {activeTab === 'queue' && queue.filter(i => i.status === 'completed').length > 0 && (
+                        <button
+                            onClick={handleApproveAllCompleted}
+                            disabled={isBulkApproving}
+                            className="px-4 py-2 bg-green-50 text-green-700 rounded-lg hover:bg-green-100 flex items-center gap-2 text-sm font-medium transition-colors disabled:opacity-50"
+                        >
+                            {isBulkApproving ? <Loader2 size={16} className="animate-spin" /> : <Check size={16} />}
+                            Approve All Completed ({queue.filter(i => i.status === 'completed').length})
+                        </button>
+                    )}
                     {activeTab === 'approved' && queue.filter(i => i.status === 'approved').length > 0 && (
                         <button
                             onClick={async () => {
@@ -190,7 +242,7 @@ const ExtractionQueue = () => {
             ) : (
                 <div className="space-y-6">
                     {filteredQueue.map((item, idx) => {
-                        const product = products[item.product_id];
+                        const product = item.product;
                         const processedUrl = item.status === 'completed' || item.status === 'approved'
                             ? getProcessedImageUrl(item.processed_image_path || `processed_${item.product_id}_${item.image_filename}`)
                             : null;
@@ -237,7 +289,7 @@ const ExtractionQueue = () => {
                                                 {processedUrl ? (
                                                     <img
                                                         className="max-h-[600px] w-auto object-contain"
-                                                        src={`${processedUrl}?t=${Date.now()}`}
+                                                        src={processedUrl}
                                                         alt="Result"
                                                     />
                                                 ) : (